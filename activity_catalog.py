@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+活動代碼索引：將 StudentPerformanceM_item_id 的全部選項保存到本機，
+之後以活動代碼（例如 ACA CMO183）直接取得 (選項 value, 活動全名)。
+
+- 精確代碼查詢為 dict O(1)；前綴搜尋以排序後的代碼 bisect
+- 查無代碼時自動重新擷取選項（HTTP 或已開啟活動頁面的瀏覽器）再查一次
+
+用法：
+  python activity_catalog.py refresh      # 以 HTTP 重新擷取全部活動
+  python activity_catalog.py "ACA CMO18"  # 前綴搜尋
+"""
+import bisect
+import json
+import os
+import re
+import sys
+import threading
+import time
+from typing import Callable, Optional, Dict, List, NamedTuple, Tuple
+
+
+CATALOG_FILE = os.path.join(os.path.dirname(__file__), "activity_catalog.json")
+
+ITEM_OPTIONS_JS = """
+var sel = document.getElementById('StudentPerformanceM_item_id');
+if (!sel) return [];
+return Array.prototype.map.call(sel.options, function (o) { return [o.value, (o.text || '').trim()]; });
+"""
+
+
+class Activity(NamedTuple):
+    code: str
+    value: str
+    name: str
+
+
+def normalize_code(code) -> str:
+    """統一大小寫與空白：' aca  cmo183 ' → 'ACA CMO183'"""
+    return re.sub(r'\s+', ' ', str(code or '')).strip().upper()
+
+
+def code_of(name: str) -> str:
+    """由選項文字取出活動代碼：「ACA CMO183 - Malaysian ...」→ ACA CMO183"""
+    return normalize_code(name.split(' - ', 1)[0])
+
+
+def http_refresher(session) -> Callable[[], List[Tuple[str, str]]]:
+    """以已登入的 sms_http.SmsHttpSession 擷取選項"""
+    return lambda: session.create_page(refresh=True).selects.get('StudentPerformanceM_item_id', [])
+
+
+def driver_refresher(driver) -> Callable[[], List[Tuple[str, str]]]:
+    """以已開啟活動頁面的瀏覽器擷取選項（單次 execute_script）"""
+    return lambda: [tuple(o) for o in driver.execute_script(ITEM_OPTIONS_JS) or []]
+
+
+class ActivityCatalog:
+    """活動代碼 → (value, 全名) 索引"""
+
+    def __init__(self, path: Optional[str] = None,
+                 refresher: Optional[Callable[[], List[Tuple[str, str]]]] = None):
+        self.path = path or CATALOG_FILE
+        self.refresher = refresher
+        self.fetched_at = 0.0
+        self._lock = threading.Lock()
+        self._by_code: Dict[str, Activity] = {}
+        self._codes: List[str] = []
+        self._load()
+
+    def __len__(self):
+        return len(self._by_code)
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        self._index(data.get('options', []))
+        self.fetched_at = data.get('fetched_at', 0.0)
+
+    def _index(self, options: List[Tuple[str, str]]):
+        by_code = {}
+        for value, name in options:
+            if value and name:
+                # 相同代碼以第一個選項為準（與 Select2 搜尋結果一致）
+                by_code.setdefault(code_of(name), Activity(code_of(name), str(value), name))
+        self._by_code = by_code
+        self._codes = sorted(by_code)
+
+    def update(self, options: List[Tuple[str, str]]):
+        """以新擷取的選項取代索引並存檔"""
+        with self._lock:
+            self._index(options)
+            self.fetched_at = time.time()
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({'fetched_at': self.fetched_at,
+                           'options': [[a.value, a.name] for a in self._by_code.values()]},
+                          f, ensure_ascii=False, indent=1)
+            os.replace(tmp, self.path)
+
+    def refresh(self, refresher: Optional[Callable[[], List[Tuple[str, str]]]] = None) -> bool:
+        refresher = refresher or self.refresher
+        if refresher is None:
+            return False
+        options = refresher()
+        if not options:
+            return False
+        self.update(options)
+        return True
+
+    def search(self, prefix: str, limit: int = 20) -> List[Activity]:
+        """前綴搜尋（依代碼排序）"""
+        prefix = normalize_code(prefix)
+        start = bisect.bisect_left(self._codes, prefix)
+        out = []
+        for code in self._codes[start:]:
+            if not code.startswith(prefix) or len(out) >= limit:
+                break
+            out.append(self._by_code[code])
+        return out
+
+    def lookup(self, code, refresh: bool = True,
+               refresher: Optional[Callable[[], List[Tuple[str, str]]]] = None) -> Optional[Activity]:
+        """
+        代碼 → Activity；精確代碼優先，否則取前綴第一筆（與原本 indexOf(code) === 0 的比對相同）
+
+        查無結果且 refresh=True 時重新擷取選項（refresher 優先於建構時指定的）再查一次。
+        """
+        code = code_of(str(code or ''))
+        if not code:
+            return None
+        found = self._by_code.get(code) or next(iter(self.search(code, 1)), None)
+        if found is None and refresh and self.refresh(refresher):
+            found = self._by_code.get(code) or next(iter(self.search(code, 1)), None)
+        return found
+
+
+def main():
+    args = sys.argv[1:]
+    if args and args[0] == 'refresh':
+        import sms_http
+        session = sms_http.SmsHttpSession()
+        if not session.login(os.getenv('SMS_USERNAME', 'schhs334'), os.getenv('SMS_PASSWORD', 'schhs334')):
+            print('✗ 登入失敗')
+            return
+        catalog = ActivityCatalog(refresher=http_refresher(session))
+        catalog.refresh()
+        print(f'✓ 已索引 {len(catalog)} 個活動')
+        return
+    catalog = ActivityCatalog()
+    for a in catalog.search(args[0] if args else ''):
+        print(f'  {a.value:>6}  {a.name}')
+
+
+if __name__ == '__main__':
+    main()
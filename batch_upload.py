@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多活動批次上傳：以多個已登入的瀏覽器同時處理多個活動。
+
+流程：
+1. 讀取多個活動（每個 Upload.xlsx 格式的檔案 / 工作表為一個活動）
+2. 啟動 N 個 worker，各自 setup_driver() + login()
+3. 排程器將活動分派給空閒的 worker，逐一走 run_event() 的填寫/選班/添加/提交步驟
+4. 失敗的活動關閉該瀏覽器，換新的登入 Session 重試
+5. 所有 worker 共用一個 rate_control.AimdController：選班、添加、提交依 SMS 的回應時間
+   自動調整同時進行的數量與間隔，伺服器變慢或出錯時立即減半（--fixed 停用）
+
+用法：
+  python batch_upload.py 活動1.xlsx 活動2.xlsx --workers 3
+  python batch_upload.py 全部活動.xlsx --all-sheets --workers 4 --retries 2
+  python batch_upload.py --season "2025 比赛统整.xlsx" --workers 4
+
+環境變數：
+  SMS_USERNAME, SMS_PASSWORD（預設與 upload.py 相同）
+  HEADLESS=0  # 顯示瀏覽器（批次模式預設為無頭）
+"""
+import argparse
+import os
+import queue
+import threading
+import time
+from typing import Optional, Dict, List
+
+from openpyxl import load_workbook
+
+import preflight
+import rate_control
+import season_ingest
+import upload
+from activity_catalog import ActivityCatalog
+from roster_cache import RosterCache
+from run_report import RunReport, safe_console
+from sms_wait import timer
+from upload_journal import UploadJournal
+from upload_jobs import UploadJob
+
+
+def open_session(headless: bool, username: str, password: str):
+    """建立一個已登入的瀏覽器"""
+    driver = upload.setup_driver(headless=headless)
+    if not upload.login(driver, username, password):
+        driver.quit()
+        raise RuntimeError('登入失敗')
+    return driver
+
+
+def close_session(driver):
+    try:
+        driver.quit()
+    except Exception:
+        pass
+
+
+def run_batch(jobs: List[UploadJob], workers: int = 2, retries: int = 1, headless: bool = True,
+              username: str = 'schhs334', password: str = 'schhs334', roster=None, catalog=None,
+              journal=None, report=None) -> List[Dict]:
+    """
+    以 workers 個瀏覽器平行上傳多個活動（roster / catalog / journal / report 由所有 worker 共用）
+
+    Returns:
+        每個活動的結果 [{'job', 'ok', 'attempts', 'worker', 'found', 'missing', 'seconds', 'error'}]
+    """
+    tasks = queue.Queue()
+    for job in jobs:
+        tasks.put((job, 1))
+    results = []
+    lock = threading.Lock()
+
+    def worker(worker_id: int):
+        driver = None
+        while True:
+            item = tasks.get()
+            if item is None:
+                tasks.task_done()
+                break
+            job, attempt = item
+            started = time.perf_counter()
+            stats, error = {'found': 0, 'missing': 0, 'submitted': False}, ''
+            try:
+                if driver is None:
+                    driver = open_session(headless, username, password)
+                    if report is not None:
+                        report.instrument(driver)
+                print(f'[W{worker_id}] ▶ {job.source or job.key}（第 {attempt} 次）')
+                stats = upload.run_event(driver, job, roster, catalog, journal, report)
+                if not stats['submitted']:
+                    error = '未提交'
+            except Exception as e:
+                error = str(e) or type(e).__name__
+
+            if error:
+                # 丟棄可能已損壞的 Session，下次換新的瀏覽器
+                if driver is not None:
+                    close_session(driver)
+                    driver = None
+                if attempt <= retries:
+                    print(f'[W{worker_id}] ⚠ {job.source or job.key} 失敗（{error}），稍後重試')
+                    tasks.put((job, attempt + 1))
+                    tasks.task_done()
+                    continue
+
+            with lock:
+                results.append({
+                    'job': job.source or job.key,
+                    'ok': not error,
+                    'attempts': attempt,
+                    'worker': worker_id,
+                    'found': stats['found'],
+                    'missing': stats['missing'],
+                    'seconds': round(time.perf_counter() - started, 2),
+                    'error': error,
+                })
+            print(f"[W{worker_id}] {'✓' if not error else '✗'} {job.source or job.key}")
+            tasks.task_done()
+
+        if driver is not None:
+            close_session(driver)
+
+    workers = max(1, min(workers, len(jobs)))
+    threads = [threading.Thread(target=worker, args=(i + 1,), daemon=True) for i in range(workers)]
+    for t in threads:
+        t.start()
+    tasks.join()
+    for _ in threads:
+        tasks.put(None)
+    for t in threads:
+        t.join()
+    return results
+
+
+def load_jobs(paths: List[str], all_sheets: bool = False) -> List[UploadJob]:
+    """讀取 Upload.xlsx 格式的活動（--all-sheets 時每個工作表為一個活動）"""
+    jobs = []
+    for path in paths:
+        sheets = [None]
+        if all_sheets:
+            wb = load_workbook(path, read_only=True)
+            sheets = wb.sheetnames
+            wb.close()
+        for sheet in sheets:
+            job = upload.read_upload_job(path, sheet)
+            if job and job.students:
+                jobs.append(job)
+    return jobs
+
+
+def print_summary(results: List[Dict], wall: float):
+    ok = sum(1 for r in results if r['ok'])
+    print('\n' + '=' * 50)
+    print(f'批次完成: {ok}/{len(results)} 個活動成功，總耗時 {wall:.1f} 秒'
+          f'（逐一執行約 {sum(r["seconds"] for r in results):.1f} 秒）')
+    for r in results:
+        mark = '✓' if r['ok'] else '✗'
+        print(f"  {mark} {r['job']}: 添加 {r['found']}，未找到 {r['missing']}，"
+              f"{r['seconds']}s，第 {r['attempts']} 次，W{r['worker']} {r['error']}")
+
+
+def main(argv: Optional[List[str]] = None):
+    safe_console()
+    parser = argparse.ArgumentParser(description='多活動批次上傳')
+    parser.add_argument('files', nargs='*', help='Upload.xlsx 格式的活動檔案')
+    parser.add_argument('--all-sheets', action='store_true', help='每個工作表視為一個活動')
+    parser.add_argument('--season', action='append', default=[], help='整季比賽統整表（見 season_ingest.py）')
+    parser.add_argument('--workers', type=int, default=2, help='同時使用的瀏覽器數')
+    parser.add_argument('--retries', type=int, default=1, help='失敗後換新 Session 重試次數')
+    parser.add_argument('--force', action='store_true', help='上傳前檢查有錯誤的活動仍然上傳')
+    parser.add_argument('--fixed', action='store_true', help='不依 SMS 回應時間調整並行數（每個 worker 不受限制）')
+    args = parser.parse_args(argv)
+
+    jobs = load_jobs(args.files, args.all_sheets)
+    for path in args.season:
+        for job in season_ingest.iter_season_jobs(path):
+            if not job.code or not job.date:
+                print(f'⚠ 跳過 {job.source}：缺少活動代碼或日期（請在 setting.json 的 season_events 指定）')
+                continue
+            jobs.append(job)
+    roster = RosterCache() if os.getenv('ROSTER_CACHE', '1') != '0' else None
+    catalog = ActivityCatalog()
+
+    # 開啟瀏覽器前檢查全部活動
+    checked = []
+    for job in jobs:
+        result = preflight.check_job(job, roster, catalog)
+        if not result.ok or result.warnings:
+            preflight.print_report(result)
+        if result.ok or args.force:
+            checked.append(job)
+    if len(checked) < len(jobs):
+        print(f'⚠ {len(jobs) - len(checked)} 個活動未通過上傳前檢查，已略過（--force 可強制上傳）')
+    jobs = checked
+
+    if not jobs:
+        print('✗ 沒有可上傳的活動')
+        return
+    print(f'✓ 共 {len(jobs)} 個活動，{args.workers} 個 worker')
+
+    report = RunReport().attach(timer)
+    controller = None
+    if not args.fixed and args.workers > 1:
+        controller = rate_control.install(rate_control.AimdController(max_limit=args.workers))
+    started = time.perf_counter()
+    results = run_batch(
+        jobs, workers=args.workers, retries=args.retries,
+        headless=os.getenv('HEADLESS', '1') != '0',
+        username=os.getenv('SMS_USERNAME', 'schhs334'),
+        password=os.getenv('SMS_PASSWORD', 'schhs334'),
+        roster=roster,
+        catalog=catalog,
+        journal=UploadJournal(),
+        report=report,
+    )
+    print_summary(results, time.perf_counter() - started)
+    for line in report.summary():
+        print(line)
+    print(f'  報告: {report.save()}.json / .csv')
+    if controller is not None:
+        for line in controller.summary():
+            print(line)
+        print(f'  調整紀錄: {controller.save()}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+端對端效能量測：以 fake_sms.py 為後端執行 upload.py 的 main() 流程，
+報告各階段（[0/6]…[6/6]）耗時與每位學生平均耗時。
+
+用法：
+  python bench_upload.py --classes 6 --students 40 --targets 5 --latency 0.05
+  python bench_upload.py --backend http --json bench.json
+  python bench_upload.py --replay captures/run.jsonl.gz --excel Upload.xlsx --scale 0.5
+
+流程：
+1. 啟動假伺服器（隨機埠）
+2. 依班級 × 目標學生數產生暫存 Upload.xlsx
+3. 設定 SMS_BASE_URL / EXCEL_FILE 後呼叫 upload.main()
+4. 由輸出行的時間戳切分階段，並核對伺服器收到的紀錄數
+"""
+import argparse
+import builtins
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+from openpyxl import Workbook
+
+import fake_sms
+
+
+STAGE_RE = re.compile(r'^\s*\[(\d+(?:\.\d+)?)/6\]')
+STUDENT_RE = re.compile(r'✓ (\S+) →')
+
+
+class TimestampTee:
+    """攔截 stdout，為每一行加上時間戳，同時照常輸出"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.lines = []  # [(秒, 文字)]
+        self._buf = ''
+        self._t0 = time.perf_counter()
+
+    def write(self, text):
+        self.stream.write(text)
+        self._buf += text
+        while '\n' in self._buf:
+            line, self._buf = self._buf.split('\n', 1)
+            self.lines.append((time.perf_counter() - self._t0, line))
+        return len(text)
+
+    def flush(self):
+        self.stream.flush()
+
+
+def build_workbook(path: str, state: fake_sms.FakeSmsState, targets: int,
+                   date_str: str = '2025-09-06', code: str = 'ACA CMO183') -> int:
+    """依假資料產生 Upload.xlsx，返回學生數"""
+    wb = Workbook()
+    ws = wb.active
+    ws['A1'] = date_str
+    ws['A2'] = code
+    ws.append([])
+    ws.append(['name', 'class', 'studentId', 'award'])
+    count = 0
+    for value, _, short in state.classes:
+        for s in state.students[value][:targets]:
+            ws.append([s['student_cname'], short, int(s['student_no']), 'GOLD'])
+            count += 1
+    wb.save(path)
+    return count
+
+
+def split_stages(lines: List[Tuple[float, str]], total: float) -> Dict[str, float]:
+    """以 [n/6] 標記切分階段耗時（同一標記重複時以第一次出現為準）"""
+    marks = []
+    for t, line in lines:
+        m = STAGE_RE.match(line)
+        if m and (not marks or marks[-1][0] != m.group(1)):
+            marks.append((m.group(1), t))
+    stages = {}
+    for i, (name, t) in enumerate(marks):
+        end = marks[i + 1][1] if i + 1 < len(marks) else total
+        stages[f'[{name}/6]'] = stages.get(f'[{name}/6]', 0.0) + (end - t)
+    return stages
+
+
+def student_intervals(lines: List[Tuple[float, str]]) -> List[float]:
+    """相鄰兩位學生「✓ 學號 →」輸出之間的間隔"""
+    times = [t for t, line in lines if STUDENT_RE.search(line)]
+    return [b - a for a, b in zip(times, times[1:])]
+
+
+def run_upload(base_url: str, backend: str, prepare_excel) -> Tuple[float, List[Tuple[float, str]], int]:
+    """
+    以 base_url 為伺服器執行一次 upload.main()（日誌、Session 等寫到暫存目錄）
+
+    prepare_excel(path) 產生 Upload.xlsx 並返回預期上傳的學生數；返回 (總秒數, 帶時間戳的輸出行, 預期學生數)
+    """
+    os.environ['SMS_BASE_URL'] = base_url
+    os.environ['SMS_BACKEND'] = backend
+    os.environ.setdefault('HEADLESS', '1')
+    os.environ.setdefault('ROSTER_CACHE', '0')  # 量測完整流程；ROSTER_CACHE=1 可比較快取命中
+
+    import activity_catalog
+    import roster_cache
+    import timeout_policy
+    import upload
+    import upload_journal
+    import session_store
+    upload.use_base_url(base_url)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        excel = os.path.join(tmp, 'Upload.xlsx')
+        expected = prepare_excel(excel)
+        upload.EXCEL_FILE = excel
+        activity_catalog.CATALOG_FILE = os.path.join(tmp, 'activity_catalog.json')
+        upload_journal.JOURNAL_FILE = os.path.join(tmp, 'upload_journal.jsonl')
+        session_store.SESSION_FILE = os.path.join(tmp, 'sms_sessions.json')
+        roster_cache.ROSTER_DB = os.path.join(tmp, 'roster_cache.sqlite3')
+        # 假伺服器 / 重播的耗時不可寫入正式的等待上限直方圖：改用只存在暫存目錄的新 policy（固定值起算）
+        real_timeouts = upload.timeouts
+        upload.timeouts = timeout_policy.TimeoutPolicy(os.path.join(tmp, 'timeout_policy.json'))
+
+        tee = TimestampTee(sys.stdout)
+        real_stdout, real_input = sys.stdout, builtins.input
+        sys.stdout, builtins.input = tee, (lambda *a, **k: '')
+        started = time.perf_counter()
+        try:
+            upload.main()
+        finally:
+            total = time.perf_counter() - started
+            sys.stdout, builtins.input = real_stdout, real_input
+            upload.timeouts = real_timeouts
+    return total, tee.lines, expected
+
+
+def run_benchmark(classes: int, students: int, targets: int, latency: float,
+                  ajax_latency: float, backend: str) -> Dict:
+    state = fake_sms.FakeSmsState(classes, students, latency=latency, ajax_latency=ajax_latency)
+    server = fake_sms.start_server(state)
+    try:
+        total, lines, expected = run_upload(server.base_url, backend,
+                                            lambda path: build_workbook(path, state, targets))
+    finally:
+        server.shutdown()
+
+    intervals = student_intervals(lines)
+    return {
+        'backend': backend,
+        'classes': classes,
+        'students_per_class': students,
+        'targets_per_class': targets,
+        'latency': latency,
+        'ajax_latency': ajax_latency,
+        'total_seconds': round(total, 3),
+        'stages': {k: round(v, 3) for k, v in split_stages(lines, total).items()},
+        'students_expected': expected,
+        'students_submitted': sum(state.submissions),
+        'per_student_seconds': round(total / expected, 4) if expected else None,
+        'student_interval_max': round(max(intervals), 4) if intervals else None,
+        'requests': len(state.requests),
+    }
+
+
+def run_replay(archive: str, excel: str, scale: float, backend: str) -> Dict:
+    """以 sms_capture.py 錄製的封存檔為後端（錄製時使用的 Excel 須一併提供）"""
+    import shutil
+    import sms_capture
+    import upload
+
+    def prepare_excel(path: str) -> int:
+        shutil.copyfile(excel, path)
+        loaded = upload.load_upload_sheet(path)
+        return len(loaded.job.students) if loaded else 0
+
+    server = sms_capture.start_replay(archive, scale)
+    try:
+        total, lines, expected = run_upload(server.base_url, backend, prepare_excel)
+    finally:
+        server.shutdown()
+
+    intervals = student_intervals(lines)
+    stats = server.replay.stats
+    return {
+        'backend': backend,
+        'replay': archive,
+        'scale': scale,
+        'total_seconds': round(total, 3),
+        'stages': {k: round(v, 3) for k, v in split_stages(lines, total).items()},
+        'students_expected': expected,
+        'students_submitted': len(server.replay.submitted),
+        'per_student_seconds': round(total / expected, 4) if expected else None,
+        'student_interval_max': round(max(intervals), 4) if intervals else None,
+        'requests': stats['served'] + stats['missing'],
+        'replay_missing': stats['missing'],
+        'replay_loose': stats['loose'],
+    }
+
+
+def print_report(result: Dict):
+    print('\n' + '=' * 50)
+    if 'replay' in result:
+        print(f"後端: {result['backend']}  重播 {result['replay']}（延遲 ×{result['scale']}）")
+    else:
+        print(f"後端: {result['backend']}  班級 {result['classes']} × 學生 {result['students_per_class']}"
+              f"（每班上傳 {result['targets_per_class']}）")
+    for name, seconds in result['stages'].items():
+        print(f'  {name:<8} {seconds:8.3f} s')
+    print(f"  {'總計':<8} {result['total_seconds']:8.3f} s")
+    print(f"  每位學生 {result['per_student_seconds']} s，最長間隔 {result['student_interval_max']} s")
+    print(f"  伺服器收到 {result['students_submitted']}/{result['students_expected']} 位，"
+          f"請求數 {result['requests']}")
+    if result.get('replay_missing'):
+        print(f"  ⚠ 封存檔中找不到 {result['replay_missing']} 個請求（流程與錄製時不同）")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='upload.py 端對端效能量測')
+    parser.add_argument('--backend', default='selenium', choices=['selenium', 'http'])
+    parser.add_argument('--classes', type=int, default=4)
+    parser.add_argument('--students', type=int, default=40, help='每班學生數')
+    parser.add_argument('--targets', type=int, default=5, help='每班要上傳的學生數')
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--ajax-latency', type=float, default=None)
+    parser.add_argument('--replay', help='以 sms_capture.py 錄製的封存檔取代假伺服器')
+    parser.add_argument('--excel', help='--replay 時使用的 Excel（錄製時上傳的檔案）')
+    parser.add_argument('--scale', type=float, default=1.0, help='--replay 的延遲倍數（0 為不延遲）')
+    parser.add_argument('--json', help='將結果寫入 JSON 檔')
+    args = parser.parse_args()
+
+    if args.replay:
+        if not args.excel:
+            parser.error('--replay 需要 --excel')
+        result = run_replay(args.replay, args.excel, args.scale, args.backend)
+    else:
+        result = run_benchmark(args.classes, args.students, args.targets, args.latency,
+                               args.latency if args.ajax_latency is None else args.ajax_latency,
+                               args.backend)
+    print_report(result)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
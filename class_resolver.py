@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+班級別名表：一次取得 class_id 的全部選項，建立「正規化別名 → option value」的對照表。
+
+每個選項產生的別名（全形轉半形、不分大小寫、忽略空白與連字號）：
+- 完整名稱：高三忠 (S3A)
+- 括號內的簡寫：S3A（s3a、Ｓ３Ａ、S3-A 亦可）
+- 括號前的中文名：高三忠
+同一別名對應到多個班級時視為有歧義，不會解析到任何班級，建立時即可列出。
+
+解析只是一次 dict 查詢；選班以單次 execute_script 依 value 設定並觸發 onchange。
+同一個瀏覽器只取得一次選項（for_driver 以 WeakKeyDictionary 快取）。
+
+用法：
+  python class_resolver.py               # 以名冊快取的班級列出別名數與歧義
+  python class_resolver.py S3A 高三忠     # 解析
+"""
+import re
+import sys
+import unicodedata
+import weakref
+from collections import defaultdict
+from typing import Optional, Dict, Iterable, List, Set, Tuple
+
+from roster_cache import class_short_of
+
+
+CLASS_OPTIONS_JS = """
+var sel = document.getElementById('class_id');
+if (!sel) return [];
+return Array.prototype.map.call(sel.options, function (o) { return [o.value, o.text.trim()]; });
+"""
+
+# 依 value 選班：已是目前班級返回 'same'，沒有該選項返回 'missing'；否則標記表格、設定值並觸發 change，返回 'changed'
+SELECT_CLASS_JS = """
+var sel = document.getElementById('class_id');
+if (!sel) return null;
+var value = arguments[0];
+if (sel.value === value) return 'same';
+if (!Array.prototype.some.call(sel.options, function (o) { return o.value === value; })) return 'missing';
+var grid = document.getElementById(arguments[1]);
+if (grid) grid.setAttribute('data-stale', '1');
+sel.value = value;
+sel.dispatchEvent(new Event('change', {bubbles: true}));
+return 'changed';
+"""
+
+CURRENT_CLASS_JS = "var sel = document.getElementById('class_id'); return sel ? sel.value : null;"
+
+_ALIAS_STRIP = re.compile(r'[\s\-_‐－·.]+')
+
+_driver_resolvers = weakref.WeakKeyDictionary()
+
+
+def normalize_alias(text) -> str:
+    """全形轉半形、轉大寫並去除空白與連字號：「Ｓ３-a」→ S3A"""
+    return _ALIAS_STRIP.sub('', unicodedata.normalize('NFKC', str(text or ''))).upper()
+
+
+def aliases_of(label: str) -> Set[str]:
+    """一個選項文字的所有正規化別名"""
+    aliases = {normalize_alias(label), normalize_alias(class_short_of(label))}
+    m = re.match(r'^(.*?)\s*\([^()]+\)\s*$', label.strip())
+    if m and m.group(1).strip():
+        aliases.add(normalize_alias(m.group(1)))
+    aliases.discard('')
+    return aliases
+
+
+class ClassResolver:
+    """class_id 選項的別名表"""
+
+    def __init__(self, options: Iterable[Tuple[str, str]]):
+        self.options: List[Tuple[str, str]] = [(str(v), str(t)) for v, t in options if v]
+        self.labels: Dict[str, str] = dict(self.options)
+        owners: Dict[str, Set[str]] = defaultdict(set)
+        for value, label in self.options:
+            for alias in aliases_of(label):
+                owners[alias].add(value)
+        self.aliases: Dict[str, str] = {a: next(iter(v)) for a, v in owners.items() if len(v) == 1}
+        self.ambiguous: Dict[str, List[str]] = {
+            a: sorted(self.labels[v] for v in values) for a, values in owners.items() if len(values) > 1
+        }
+
+    def __len__(self):
+        return len(self.options)
+
+    @classmethod
+    def from_driver(cls, driver) -> 'ClassResolver':
+        return cls(tuple(o) for o in driver.execute_script(CLASS_OPTIONS_JS) or [])
+
+    @classmethod
+    def from_cache(cls, roster) -> 'ClassResolver':
+        """以 roster_cache.RosterCache 中的班級建立（不連線）"""
+        return cls(roster.classes().values())
+
+    def resolve(self, text) -> Optional[str]:
+        """工作表中的班級文字 → option value；找不到或有歧義返回 None"""
+        return self.aliases.get(normalize_alias(text))
+
+    def is_ambiguous(self, text) -> bool:
+        return normalize_alias(text) in self.ambiguous
+
+    def canonical(self, text) -> Optional[str]:
+        """工作表中的班級文字 → 班級簡寫（S3A）"""
+        value = self.resolve(text)
+        return class_short_of(self.labels[value]) if value else None
+
+    def report(self) -> List[str]:
+        """有歧義的別名，每個一行"""
+        return [f'  ⚠ 「{alias}」同時符合 {"、".join(labels)}' for alias, labels in sorted(self.ambiguous.items())]
+
+
+def for_driver(driver, timeout: float = 8, refresh: bool = False) -> ClassResolver:
+    """目前瀏覽器的別名表：第一次呼叫時等待 class_id 出現並一次取得所有選項，之後沿用"""
+    resolver = None if refresh else _driver_resolvers.get(driver)
+    if resolver is None:
+        from selenium.webdriver.support.ui import WebDriverWait
+        import sms_wait
+        options = WebDriverWait(driver, timeout, poll_frequency=sms_wait.POLL).until(
+            lambda d: d.execute_script(CLASS_OPTIONS_JS), 'class_id 沒有選項')
+        resolver = ClassResolver(tuple(o) for o in options)
+        for line in resolver.report():
+            print(line)
+        _driver_resolvers[driver] = resolver
+    return resolver
+
+
+def is_selected(driver, value: str) -> bool:
+    """class_id 目前是否已是該班（再選一次不會觸發 AJAX）"""
+    return driver.execute_script(CURRENT_CLASS_JS) == value
+
+
+def select(driver, value: str, timeout: float = 8, grid_id: str = 'student-grid') -> bool:
+    """依 value 選班並等待學生表格更新；已是目前班級時只等待 AJAX 閒置"""
+    from selenium.webdriver.support.ui import WebDriverWait
+    import sms_wait
+    state = WebDriverWait(driver, timeout, poll_frequency=sms_wait.POLL).until(
+        lambda d: d.execute_script(SELECT_CLASS_JS, value, grid_id), 'class_id 未出現')
+    if state == 'missing':
+        return False
+    if state == 'same':
+        sms_wait.wait_for_ajax_idle(driver, timeout)
+    else:
+        sms_wait.wait_for_replaced(driver, grid_id, timeout)
+    return True
+
+
+def main():
+    from roster_cache import RosterCache
+    cache = RosterCache()
+    try:
+        resolver = ClassResolver.from_cache(cache)
+    finally:
+        cache.close()
+    if not len(resolver):
+        print('✗ 名冊快取沒有班級，請先執行 python roster_cache.py warm')
+        return
+    if len(sys.argv) > 1:
+        for text in sys.argv[1:]:
+            value = resolver.resolve(text)
+            if value:
+                print(f'  ✓ {text} → {value}  {resolver.labels[value]}')
+            elif resolver.is_ambiguous(text):
+                print(f'  ⚠ {text} 有歧義：{"、".join(resolver.ambiguous[normalize_alias(text)])}')
+            else:
+                print(f'  ✗ {text} 找不到班級')
+        return
+    print(f'✓ {len(resolver)} 個班級，{len(resolver.aliases)} 個別名，{len(resolver.ambiguous)} 個有歧義')
+    for line in resolver.report():
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
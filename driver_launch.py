@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+瀏覽器啟動：
+1. chromedriver 路徑只解析一次並保存在 driver_cache.json，之後完全離線啟動
+   （優先順序：環境變數 CHROMEDRIVER → 快取 → PATH → webdriver_manager 下載）
+2. 精簡設定：不載入圖片與字型（CSS 預設保留，Select2 / 對話框的顯示判斷依賴 CSS）
+3. 重用 user-data-dir（chrome_profiles/），保留快取與 Cookie；同時執行的多個瀏覽器各自占用一個資料夾
+4. 記錄每次啟動時間，區分冷啟動（首次解析 chromedriver 或新建資料夾）與熱啟動
+
+用法：
+  python driver_launch.py            # 預先解析 chromedriver 並測量冷/熱啟動時間
+  python driver_launch.py --refresh  # 重新下載 chromedriver（Chrome 升級後）
+  python driver_launch.py --stats    # 歷史啟動時間
+
+環境變數：
+  CHROMEDRIVER=路徑       # 指定 chromedriver
+  LEAN_BROWSER=0         # 停用精簡設定
+  BLOCK_CSS=1            # 連 CSS 也不載入
+  BROWSER_PROFILE=none   # 不重用資料夾（每次使用暫存資料夾）
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import threading
+import time
+from typing import Optional, Dict, List, Tuple
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+
+
+DRIVER_CACHE = os.path.join(os.path.dirname(__file__), "driver_cache.json")
+PROFILE_ROOT = os.path.join(os.path.dirname(__file__), "chrome_profiles")
+MAX_STARTUPS = 50
+
+# 以 CDP Network.setBlockedURLs 攔截（圖片同時以偏好設定停用）
+BLOCKED_FONTS = ['*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot']
+BLOCKED_IMAGES = ['*.png', '*.jpg', '*.jpeg', '*.gif', '*.svg', '*.ico', '*.webp']
+BLOCKED_CSS = ['*.css']
+
+_cache_lock = threading.Lock()
+
+
+def _read_cache(path: Optional[str] = None) -> Dict:
+    try:
+        with open(path or DRIVER_CACHE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _update_cache(path: Optional[str] = None, **fields):
+    path = path or DRIVER_CACHE
+    with _cache_lock:
+        data = _read_cache(path)
+        for key, value in fields.items():
+            if key == 'startup':
+                data['startups'] = (data.get('startups', []) + [value])[-MAX_STARTUPS:]
+            else:
+                data[key] = value
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, path)
+
+
+def resolve_chromedriver(refresh: bool = False) -> Tuple[Optional[str], bool]:
+    """
+    返回 (chromedriver 路徑, 是否經過解析)；找不到時路徑為 None，交給 Selenium Manager
+
+    只有快取中沒有可用路徑時才會連網（webdriver_manager），結果會寫回快取。
+    """
+    env = os.getenv('CHROMEDRIVER')
+    if env:
+        return env, False
+    cached = _read_cache().get('chromedriver')
+    if cached and os.path.isfile(cached) and not refresh:
+        return cached, False
+
+    path = None if refresh else shutil.which('chromedriver')
+    if path is None:
+        try:
+            from webdriver_manager.chrome import ChromeDriverManager
+            path = ChromeDriverManager().install()
+        except Exception as e:
+            print(f'  ⚠ 無法下載 chromedriver: {e}')
+            return cached if cached and os.path.isfile(cached) else None, True
+    _update_cache(chromedriver=path, resolved_at=time.time())
+    return path, True
+
+
+def _try_lock(path: str):
+    """以作業系統檔案鎖占用資料夾（程式結束時自動釋放，不會留下失效的鎖）"""
+    handle = open(path, 'a+')
+    try:
+        if os.name == 'nt':
+            import msvcrt
+            msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return None
+    return handle
+
+
+def claim_profile(name: str = 'default', root: Optional[str] = None) -> Tuple[str, object, bool]:
+    """
+    占用一個 user-data-dir（name、name-2、name-3 ...），返回 (資料夾, 鎖, 是否新建)
+
+    Chrome 不允許兩個瀏覽器共用同一資料夾，batch_upload / upload_daemon 的多個 worker 會各自取得一個。
+    """
+    root = root or PROFILE_ROOT
+    os.makedirs(root, exist_ok=True)
+    for n in range(1, 100):
+        folder = os.path.join(root, name if n == 1 else f'{name}-{n}')
+        handle = _try_lock(folder + '.lock')
+        if handle is not None:
+            created = not os.path.isdir(folder)
+            os.makedirs(folder, exist_ok=True)
+            return folder, handle, created
+    raise RuntimeError(f'沒有可用的瀏覽器資料夾: {root}')
+
+
+def lean_options(headless: bool = False, profile_dir: Optional[str] = None, lean: bool = True) -> Options:
+    """與原本 setup_driver 相同的設定，加上精簡與 user-data-dir"""
+    options = Options()
+    if headless:
+        options.add_argument('--headless=new')
+    options.add_argument('--disable-gpu')
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-blink-features=AutomationControlled')
+    options.add_experimental_option("excludeSwitches", ["enable-automation"])
+    options.add_experimental_option('useAutomationExtension', False)
+    if profile_dir:
+        options.add_argument(f'--user-data-dir={profile_dir}')
+    if lean:
+        for arg in ('--disable-extensions', '--disable-background-networking', '--disable-sync',
+                    '--disable-default-apps', '--no-first-run', '--mute-audio'):
+            options.add_argument(arg)
+        options.add_experimental_option('prefs', {
+            'profile.managed_default_content_settings.images': 2,
+            'credentials_enable_service': False,
+            'profile.password_manager_enabled': False,
+        })
+    return options
+
+
+def launch(headless: bool = False, lean: Optional[bool] = None, profile: Optional[str] = None,
+           block_css: Optional[bool] = None):
+    """
+    啟動 Chrome（upload.setup_driver 的實作），返回 WebDriver
+
+    Args:
+        lean: 精簡設定，預設依 LEAN_BROWSER
+        profile: user-data-dir 名稱，預設依 BROWSER_PROFILE（'none' 表示不重用）
+        block_css: 是否連 CSS 也攔截，預設依 BLOCK_CSS
+    """
+    lean = os.getenv('LEAN_BROWSER', '1') != '0' if lean is None else lean
+    profile = os.getenv('BROWSER_PROFILE', 'default') if profile is None else profile
+    block_css = os.getenv('BLOCK_CSS', '0') == '1' if block_css is None else block_css
+
+    started = time.perf_counter()
+    path, resolved = resolve_chromedriver()
+    profile_dir, lock, created = (None, None, False)
+    if profile and profile != 'none':
+        profile_dir, lock, created = claim_profile(profile)
+
+    try:
+        driver = webdriver.Chrome(service=Service(path) if path else Service(),
+                                  options=lean_options(headless, profile_dir, lean))
+    except Exception:
+        if lock is not None:
+            lock.close()
+        raise
+    # 鎖跟隨 driver，driver 被回收或程式結束時釋放
+    driver._profile_lock = lock
+    if lean:
+        blocked = BLOCKED_FONTS + BLOCKED_IMAGES + (BLOCKED_CSS if block_css else [])
+        try:
+            driver.execute_cdp_cmd('Network.enable', {})
+            driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': blocked})
+        except Exception as e:
+            print(f'  ⚠ 無法攔截資源: {e}')
+    driver.set_window_size(1200, 900)
+
+    seconds = round(time.perf_counter() - started, 3)
+    _update_cache(startup={'at': time.time(), 'seconds': seconds, 'cold': resolved or created,
+                           'lean': lean, 'headless': headless})
+    return driver
+
+
+def startup_stats() -> Dict[str, Dict]:
+    """返回 {'cold': {...}, 'warm': {...}}，各含次數與中位數秒數"""
+    startups = _read_cache().get('startups', [])
+    out = {}
+    for kind, cold in (('cold', True), ('warm', False)):
+        seconds = [s['seconds'] for s in startups if bool(s.get('cold')) == cold]
+        out[kind] = {'runs': len(seconds), 'median': round(statistics.median(seconds), 3) if seconds else None}
+    return out
+
+
+def print_stats():
+    stats = startup_stats()
+    cache = _read_cache()
+    print(f"  chromedriver: {cache.get('chromedriver') or '（未解析）'}")
+    for kind, label in (('cold', '冷啟動'), ('warm', '熱啟動')):
+        s = stats[kind]
+        median = f"{s['median']:.2f} 秒" if s['median'] is not None else '-'
+        print(f"  {label}: {s['runs']} 次，中位數 {median}")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='預先解析 chromedriver 並測量啟動時間')
+    parser.add_argument('--refresh', action='store_true', help='重新解析 chromedriver')
+    parser.add_argument('--stats', action='store_true', help='只顯示歷史啟動時間')
+    parser.add_argument('--runs', type=int, default=2)
+    args = parser.parse_args(argv)
+
+    if args.stats:
+        print_stats()
+        return
+    path, _ = resolve_chromedriver(refresh=args.refresh)
+    print(f"✓ chromedriver: {path or '（交給 Selenium Manager）'}")
+    headless = os.getenv('HEADLESS', '1') != '0'
+    for i in range(args.runs):
+        started = time.perf_counter()
+        driver = launch(headless=headless)
+        driver.quit()
+        print(f'  第 {i + 1} 次啟動: {time.perf_counter() - started:.2f} 秒')
+    print_stats()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+WebDriver 指令分析：包裝 driver.execute，依指令類型（findElements、getElementText、executeScript …）
+與呼叫位置（本專案中的函式與行號）統計次數與耗時，結束時輸出火焰圖式的呼叫樹，
+並可設定「每位學生最多 N 個指令」的預算。
+
+  profiler = DriverProfiler()
+  driver = profiler.wrap(driver)
+  ...
+  for line in profiler.report():
+      print(line)
+  profiler.write_folded('stacks.folded')   # 可交給 flamegraph.pl / speedscope
+  profiler.assert_budget(students=12, per_student=15)
+
+upload.py：DRIVER_PROFILE=1 開啟，DRIVER_BUDGET=15 設定每位學生的指令上限。
+
+  python driver_profiler.py stacks.folded   # 重新印出呼叫樹
+"""
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import Optional, Dict, List, Tuple
+
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+FOLDED_FILE = os.path.join(PROJECT_DIR, "run_reports", "driver_stacks.folded")
+
+
+class BudgetExceeded(AssertionError):
+    """WebDriver 指令數超過預算"""
+
+
+def _project_stack(skip: int = 2) -> Tuple[str, ...]:
+    """返回本專案內的呼叫堆疊（外層在前），略過 selenium 與本模組"""
+    frames = []
+    frame = sys._getframe(skip)
+    this_file = os.path.abspath(__file__)
+    while frame is not None:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if filename.startswith(PROJECT_DIR) and filename != this_file:
+            frames.append(f'{os.path.basename(filename)[:-3]}.{frame.f_code.co_name}:{frame.f_lineno}')
+        frame = frame.f_back
+    return tuple(reversed(frames))
+
+
+class DriverProfiler:
+    """統計每個 WebDriver 指令（可由多個執行緒共用）"""
+
+    def __init__(self):
+        self.by_command: Dict[str, List[float]] = defaultdict(lambda: [0, 0.0])
+        self.by_site: Dict[str, List[float]] = defaultdict(lambda: [0, 0.0])
+        self.stacks: Dict[Tuple[str, ...], List[float]] = defaultdict(lambda: [0, 0.0])
+        self._lock = threading.Lock()
+
+    def wrap(self, driver):
+        execute = driver.execute
+
+        def profiled_execute(driver_command, params=None):
+            stack = _project_stack()
+            started = time.perf_counter()
+            try:
+                return execute(driver_command, params)
+            finally:
+                self.record(str(driver_command), stack, time.perf_counter() - started)
+
+        driver.execute = profiled_execute
+        return driver
+
+    def record(self, command: str, stack: Tuple[str, ...], seconds: float):
+        # 呼叫位置以行號區分，呼叫樹以函式區分（去掉行號，避免同一函式被拆成多支）
+        site = stack[-1] if stack else '(外部)'
+        funcs = tuple(f.rsplit(':', 1)[0] for f in stack) + (command,)
+        with self._lock:
+            for table, key in ((self.by_command, command), (self.by_site, site), (self.stacks, funcs)):
+                table[key][0] += 1
+                table[key][1] += seconds
+
+    @property
+    def total(self) -> int:
+        return int(sum(c for c, _ in self.by_command.values()))
+
+    @property
+    def seconds(self) -> float:
+        return sum(s for _, s in self.by_command.values())
+
+    # ---- 預算 ----------------------------------------------------------
+
+    def over_budget(self, students: int, per_student: float) -> Optional[str]:
+        """超過預算時返回說明，否則返回 None"""
+        limit = per_student * max(students, 1)
+        if self.total > limit:
+            return (f'WebDriver 指令 {self.total} 次，超過預算 {per_student:g} × {max(students, 1)} 位 = {limit:g}'
+                    f'（每位 {self.total / max(students, 1):.1f}）')
+        return None
+
+    def assert_budget(self, students: int, per_student: float):
+        message = self.over_budget(students, per_student)
+        if message:
+            raise BudgetExceeded(message)
+
+    # ---- 輸出 ----------------------------------------------------------
+
+    def report(self, top: int = 10) -> List[str]:
+        lines = [f'  WebDriver 指令 {self.total} 次，共 {self.seconds:.2f}s', f"  {'指令':<28}{'次數':>7}{'總耗時':>10}{'平均':>9}"]
+        for command, (count, seconds) in sorted(self.by_command.items(), key=lambda kv: -kv[1][1]):
+            lines.append(f'  {command:<28}{count:>7}{seconds:>9.2f}s{seconds / count * 1000:>7.1f}ms')
+        lines.append(f'  呼叫位置（前 {top}）:')
+        for site, (count, seconds) in sorted(self.by_site.items(), key=lambda kv: -kv[1][1])[:top]:
+            lines.append(f'    {site:<44}{count:>6}{seconds:>9.2f}s')
+        lines.append('  呼叫樹:')
+        lines.extend(flame_lines({k: v for k, v in self.stacks.items()}))
+        return lines
+
+    def folded(self) -> List[str]:
+        """Brendan Gregg 的 folded stacks 格式（值為微秒）"""
+        return [f"{';'.join(stack)} {int(seconds * 1e6)}" for stack, (_, seconds) in sorted(self.stacks.items())]
+
+    def write_folded(self, path: Optional[str] = None) -> str:
+        path = path or FOLDED_FILE
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(self.folded()) + '\n')
+        return path
+
+
+def flame_lines(stacks: Dict[Tuple[str, ...], List[float]], width: int = 30, min_share: float = 0.01) -> List[str]:
+    """把 {堆疊: [次數, 秒]} 合併為樹狀，以長條表示耗時佔比（佔比低於 min_share 的分支省略）"""
+    tree: Dict = {}
+    for stack, (count, seconds) in stacks.items():
+        node = tree
+        for name in stack:
+            entry = node.setdefault(name, {'count': 0, 'seconds': 0.0, 'children': {}})
+            entry['count'] += count
+            entry['seconds'] += seconds
+            node = entry['children']
+    total = sum(e['seconds'] for e in tree.values()) or 1.0
+
+    lines = []
+
+    def walk(node: Dict, depth: int):
+        for name, entry in sorted(node.items(), key=lambda kv: -kv[1]['seconds']):
+            share = entry['seconds'] / total
+            if share < min_share:
+                continue
+            bar = '█' * max(1, round(share * width))
+            count = f"{entry['count']} 次，" if entry['count'] else ''
+            lines.append(f"    {'  ' * depth}{name}  {bar} {share:.0%}（{count}{entry['seconds']:.2f}s）")
+            walk(entry['children'], depth + 1)
+
+    walk(tree, 0)
+    return lines
+
+
+def read_folded(path: str) -> Dict[Tuple[str, ...], List[float]]:
+    stacks = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            stack, _, micros = line.strip().rpartition(' ')
+            if stack:
+                stacks[tuple(stack.split(';'))] = [0, int(micros) / 1e6]
+    return stacks
+
+
+def main():
+    from run_report import safe_console
+    safe_console()
+    path = sys.argv[1] if len(sys.argv) > 1 else FOLDED_FILE
+    for line in flame_lines(read_folded(path)):
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+英文名補全：為 Upload.xlsx 格式工作表中的每位學生查出英文名，最後只寫入磁碟一次。
+
+查詢順序：名冊快取（roster_cache）→ 以 HTTP 一次抓取整班表格（每班最多一次，結果回寫快取）。
+英文名寫入標題列中的 name_en 欄，沒有時寫在最後一個欄位之後。
+
+兩種寫入方式：
+- 原檔：先串流讀取並查出全部英文名，再開啟一次活頁簿寫入並存檔
+- 副本（--output）：來源以唯讀模式逐列串流，輸出以 write_only 逐列寫出，
+  上萬列的整季表格也只佔用固定的記憶體（副本不保留儲存格格式）
+
+用法：
+  python enrich_names.py                         # Upload.xlsx，只用名冊快取
+  python enrich_names.py 活動.xlsx --online       # 快取沒有的班級以 HTTP 抓取
+  python enrich_names.py 整季.xlsx --sheet 工作表 --output 整季_英文名.xlsx --online
+"""
+import argparse
+import os
+from typing import Iterable, Iterator, Optional, Dict, List, Tuple
+
+from openpyxl import Workbook, load_workbook
+
+import sms_http
+from class_resolver import ClassResolver
+from upload_jobs import normalize_student_id
+
+
+NAME_HEADER = 'name_en'
+MAX_MISSING_LINES = 20
+
+
+class NameResolver:
+    """學號 → 英文名：名冊快取優先，未命中時每班最多抓取一次整班表格"""
+
+    def __init__(self, cache=None, session: Optional[sms_http.SmsHttpSession] = None):
+        self.cache = cache
+        self.session = session
+        self.fetches = 0
+        self._classes: Dict[str, Dict[str, str]] = {}
+        self._options: Optional[ClassResolver] = None
+        self._item_id: Optional[str] = None
+
+    def resolve(self, class_short: str, student_id: str) -> Optional[str]:
+        if self.cache is not None:
+            info = self.cache.student(student_id)
+            if info and info[1]:
+                return info[1]
+        if self.session is None:
+            return None
+        resolver = self._resolver(class_short)
+        key = resolver.canonical(class_short) or class_short
+        if key not in self._classes:
+            self._classes[key] = self._fetch_class(resolver, class_short)
+        return self._classes[key].get(student_id)
+
+    def _resolver(self, class_short: str) -> ClassResolver:
+        """能解析 class_short 的別名表：名冊快取優先，沒有該班時以 HTTP 取得選項（一次）並寫回快取"""
+        if self.cache is not None:
+            resolver = self.cache.resolver()
+            if resolver.resolve(class_short):
+                return resolver
+        if self._options is None:
+            self._options = ClassResolver(self.session.class_options())
+            if self.cache is not None:
+                self.cache.put_classes(self._options.options)
+        return self._options
+
+    def _fetch_class(self, resolver: ClassResolver, class_short: str) -> Dict[str, str]:
+        value = resolver.resolve(class_short)
+        if not value:
+            print(f'  ⚠ 找不到班級: {class_short}')
+            return {}
+        if self._item_id is None:
+            self._item_id = next((v for v, _ in self.session.activity_options() if v), '')
+        students = self.session.fetch_class_students(value, self._item_id)
+        self.fetches += 1
+        if self.cache is not None and students:
+            # 與 upload.run_event / sms_http.build_entries 相同，以班級簡寫為鍵
+            first = next(iter(students.values()))
+            self.cache.put_roster(resolver.canonical(class_short), {
+                no: (s.get('student_name', ''), s.get('student_cname', ''), s.get('student_id', ''))
+                for no, s in students.items() if no
+            }, (self._item_id, first.get('mark_item', '')))
+        return {no: s.get('student_name', '') for no, s in students.items()}
+
+
+def name_column(field_map: Dict[str, int]) -> int:
+    """英文名欄（1 起算）：已有 name_en 欄時沿用，否則為最後一個欄位之後"""
+    return field_map.get(NAME_HEADER) or max(field_map.values(), default=0) + 1
+
+
+def iter_students(rows: Iterable[tuple], field_map: Dict[str, int]) -> Iterator[Tuple[int, str, str]]:
+    """由第 5 行起的列（values_only）產生 (行號, 班級, 學號)，略過缺少班級或學號的列"""
+    class_idx = field_map.get('class', 1) - 1
+    id_idx = field_map.get('studentid', field_map.get('student_id', 2)) - 1
+    for row_idx, row in enumerate(rows, start=5):
+        class_val = row[class_idx] if class_idx < len(row) else None
+        id_val = row[id_idx] if id_idx < len(row) else None
+        student_id = normalize_student_id(id_val)
+        if class_val and student_id:
+            yield row_idx, str(class_val).strip(), student_id
+
+
+def enrich(students: Iterable[Tuple[int, str, str]], resolver: NameResolver) -> Iterator[Tuple[int, str, str, Optional[str]]]:
+    """逐位查詢，產生 (行號, 班級, 學號, 英文名或 None)"""
+    for row_idx, class_short, student_id in students:
+        yield row_idx, class_short, student_id, resolver.resolve(class_short, student_id)
+
+
+class _Counter:
+    def __init__(self):
+        self.found = self.missing = 0
+
+    def add(self, class_short: str, student_id: str, name_en: Optional[str]):
+        if name_en:
+            self.found += 1
+            return
+        self.missing += 1
+        if self.missing <= MAX_MISSING_LINES:
+            print(f'  ⚠ {class_short} {student_id} 未找到英文名')
+        elif self.missing == MAX_MISSING_LINES + 1:
+            print('  ⚠ ……（其餘未找到的學生不再逐一列出）')
+
+
+def _header_map(header: tuple) -> Dict[str, int]:
+    import upload  # 避免循環匯入
+    return upload.load_field_mapping(header_row=header)
+
+
+def enrich_workbook(excel_file: str, resolver: NameResolver, sheet_name: Optional[str] = None,
+                    output: Optional[str] = None) -> Tuple[int, int]:
+    """
+    補全英文名並只存檔一次；output 為另一個檔案時以串流方式寫出副本
+
+    Returns:
+        (寫入數, 未找到數)
+    """
+    if output and os.path.abspath(output) != os.path.abspath(excel_file):
+        return _enrich_copy(excel_file, resolver, sheet_name, output)
+
+    counter = _Counter()
+    names: Dict[int, str] = {}
+    src = load_workbook(excel_file, read_only=True)
+    try:
+        rows = (src[sheet_name] if sheet_name else src.active).iter_rows(values_only=True)
+        head = [next(rows, ()) for _ in range(4)]
+        field_map = _header_map(head[3])
+        column = name_column(field_map)
+        for row_idx, class_short, student_id, name_en in enrich(iter_students(rows, field_map), resolver):
+            counter.add(class_short, student_id, name_en)
+            if name_en:
+                names[row_idx] = name_en
+    finally:
+        src.close()
+
+    wb = load_workbook(excel_file)
+    ws = wb[sheet_name] if sheet_name else wb.active
+    if NAME_HEADER not in field_map:
+        ws.cell(row=4, column=column, value=NAME_HEADER)
+    for row_idx, name_en in names.items():
+        ws.cell(row=row_idx, column=column, value=name_en)
+    wb.save(excel_file)
+    return counter.found, counter.missing
+
+
+def _enrich_copy(excel_file: str, resolver: NameResolver, sheet_name: Optional[str], output: str) -> Tuple[int, int]:
+    counter = _Counter()
+    src = load_workbook(excel_file, read_only=True)
+    dst = Workbook(write_only=True)
+    try:
+        target = sheet_name or src.active.title
+        for ws in src.worksheets:
+            out = dst.create_sheet(ws.title)
+            rows = ws.iter_rows(values_only=True)
+            if ws.title != target:
+                for row in rows:
+                    out.append(row)
+                continue
+            head = [next(rows, ()) for _ in range(4)]
+            field_map = _header_map(head[3])
+            column = name_column(field_map)
+            for row in head[:3]:
+                out.append(row)
+            header = list(head[3]) + [None] * max(0, column - len(head[3]))
+            header[column - 1] = NAME_HEADER
+            out.append(header)
+
+            for row_idx, row in enumerate(rows, start=5):
+                values = list(row) + [None] * max(0, column - len(row))
+                student = next(iter_students([row], field_map), None)
+                if student is not None:
+                    _, class_short, student_id = student
+                    name_en = resolver.resolve(class_short, student_id)
+                    counter.add(class_short, student_id, name_en)
+                    if name_en:
+                        values[column - 1] = name_en
+                out.append(values)
+        dst.save(output)
+    finally:
+        src.close()
+    return counter.found, counter.missing
+
+
+def main(argv: Optional[List[str]] = None):
+    import upload
+    from roster_cache import RosterCache
+    from run_report import safe_console
+
+    safe_console()
+    parser = argparse.ArgumentParser(description='補全英文名並一次寫回 Excel')
+    parser.add_argument('excel', nargs='?', default=upload.EXCEL_FILE)
+    parser.add_argument('--sheet', help='工作表名稱（預設為使用中的工作表）')
+    parser.add_argument('--output', help='寫入副本（串流，適合大型工作表）')
+    parser.add_argument('--online', action='store_true', help='快取沒有的班級以 HTTP 抓取整班表格')
+    args = parser.parse_args(argv)
+
+    cache = RosterCache()
+    session = None
+    if args.online:
+        from session_store import SessionStore
+        username = os.getenv('SMS_USERNAME', 'schhs334')
+        store = SessionStore()
+        session = sms_http.SmsHttpSession(upload.SMS_BASE_URL)
+        if not store.restore_http(session, username):
+            if not session.login(username, os.getenv('SMS_PASSWORD', 'schhs334')):
+                print('✗ 登入失敗')
+                return
+            store.save_http(session, username)
+    try:
+        resolver = NameResolver(cache, session)
+        found, missing = enrich_workbook(args.excel, resolver, args.sheet, args.output)
+    finally:
+        cache.close()
+    print(f'✓ 已寫入 {found} 位英文名，未找到 {missing} 位（抓取 {resolver.fetches} 個班級）→ '
+          f'{args.output or args.excel}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,498 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本機假 SMS 伺服器（模擬 Yii 頁面），供離線測試與效能量測：
+- site/login：LoginForm_username / LoginForm_password 登入表單
+- transaction/studentPerformance/create：日期、Select2 活動選單 StudentPerformanceM_item_id、
+  學生名單按鈕 yw4、#studentModal（class_id + student-grid + addToEkstra）、
+  返回後的 type_of_bonus / remark 列，以及創建按鈕 yw7
+- ajax=student-grid / ajax=student-performance-m-grid：班級學生表與既有紀錄表
+- transaction/studentPerformance/delete：刪除既有紀錄
+
+用法：
+  python fake_sms.py --port 8765 --classes 12 --students 40 --latency 0.05
+  $env:SMS_BASE_URL = "http://127.0.0.1:8765/sms/index.php"; python upload.py
+
+頁面使用內建的迷你 jQuery / Select2 替身（無需外部資源），並提供 jQuery.active。
+"""
+import argparse
+import html
+import re
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Dict, List
+from urllib.parse import urlparse, parse_qsl
+
+
+SMS_PATH = '/sms/index.php'
+GRADES = [('初一', 'J1'), ('初二', 'J2'), ('初三', 'J3'), ('高一', 'S1'), ('高二', 'S2'), ('高三', 'S3')]
+SECTIONS = ['忠', '孝', '仁', '爱', '信', '义', '和', '平', '勤', '勉', '诚']
+BONUS_TYPES = {'1': '校外学艺', '2': '特殊表现'}
+DEFAULT_ACTIVITIES = [
+    ('2207', 'ACA CMO183 - Malaysian Physics Olympiad (OFM) 2025'),
+    ('2208', 'ACA CMO184 - 第六届（2025年度）全国母亲节颂文比赛'),
+]
+
+
+class FakeSmsState:
+    """假伺服器的資料與設定（執行緒安全）"""
+
+    def __init__(self, classes: int = 6, students: int = 40, activities: int = 50,
+                 latency: float = 0.0, ajax_latency: Optional[float] = None,
+                 username: str = 'schhs334', password: str = 'schhs334'):
+        self.latency = latency
+        self.ajax_latency = latency if ajax_latency is None else ajax_latency
+        self.username = username
+        self.password = password
+        self.lock = threading.Lock()
+        self.sessions = set()
+        self.records = {}      # record_id -> dict
+        self.submissions = []  # 每次成功 POST 的學生數
+        self.requests = []     # (method, route, 秒)
+        self.connections = 0   # 已接受的 TCP 連線數
+        self._next_record = 1
+
+        # 班級與學生
+        self.classes = []      # [(value, label, short)]
+        self.students = {}     # class value -> [dict]
+        for i in range(classes):
+            grade, code = GRADES[(i // len(SECTIONS)) % len(GRADES)]
+            section = i % len(SECTIONS)
+            short = f'{code}{chr(ord("A") + section)}'
+            value = str(600 + i)
+            self.classes.append((value, f'{grade}{SECTIONS[section]} ({short})', short))
+            rows = []
+            for k in range(students):
+                n = i * students + k
+                rows.append({
+                    'student_id': str(4000 + n),
+                    'student_no': str(20000 + n),
+                    'student_name': f'STUDENT {n:04d}',
+                    'student_cname': f'学生{n:04d}',
+                    'class_name': short,
+                    'class_id': value,
+                    'mark_item': '0.00',
+                })
+            self.students[value] = rows
+        self.by_internal_id = {s['student_id']: s for rows in self.students.values() for s in rows}
+
+        # 活動選項
+        self.activities = list(DEFAULT_ACTIVITIES)
+        for j in range(activities):
+            self.activities.append((str(3000 + j), f'FAKE CMO{j:03d} - 測試活動 {j}'))
+
+    def add_records(self, date: str, item_id: str, rows: Dict[str, Dict]) -> int:
+        with self.lock:
+            for sid, fields in rows.items():
+                stu = self.by_internal_id.get(sid, {})
+                self.records[self._next_record] = {
+                    'id': self._next_record, 'date': date, 'item_id': item_id,
+                    'student_id': sid, 'student_no': stu.get('student_no', ''),
+                    'student_name': stu.get('student_name', ''),
+                    'student_cname': stu.get('student_cname', ''),
+                    'class_name': stu.get('class_name', ''),
+                    'type_of_bonus': fields.get('type_of_bonus', ''),
+                    'remark': fields.get('remark', ''),
+                    'mark': fields.get('mark', '0.00'),
+                }
+                self._next_record += 1
+            self.submissions.append(len(rows))
+        return len(rows)
+
+    def find_records(self, date: str, item_id: str) -> List[Dict]:
+        with self.lock:
+            return [r for r in self.records.values() if r['date'] == date and r['item_id'] == item_id]
+
+
+# ----------------------------------------------------------------------------
+# 頁面範本
+# ----------------------------------------------------------------------------
+
+LAYOUT = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>SMS</title>
+<style>.modal{{position:fixed;top:40px;left:50%;background:#fff;border:1px solid #999;padding:8px;max-height:80%;overflow:auto}}
+.select2-drop{{border:1px solid #999;background:#fff}}.select2-offscreen{{position:absolute;left:-10000px}}</style>
+<script>{shim}</script></head>
+<body>{body}</body></html>"""
+
+# 迷你 jQuery / Select2 / yiiGridView 替身：只實作 upload.py 會呼叫的部分
+JQUERY_SHIM = r"""
+(function () {
+  function Q(els) { this.els = els; this.length = els.length; for (var i = 0; i < els.length; i++) this[i] = els[i]; }
+  var $ = function (sel) {
+    if (typeof sel === 'string') return new Q(Array.prototype.slice.call(document.querySelectorAll(sel)));
+    if (sel && sel.nodeType) return new Q([sel]);
+    return new Q([]);
+  };
+  $.active = 0;
+  $.ajaxGet = function (url, done) {
+    $.active++;
+    var xhr = new XMLHttpRequest();
+    xhr.open('GET', url);
+    xhr.setRequestHeader('X-Requested-With', 'XMLHttpRequest');
+    xhr.onloadend = function () { try { done(xhr.responseText); } finally { $.active--; } };
+    xhr.send();
+  };
+  Q.prototype.find = function (sel) {
+    var out = [];
+    this.els.forEach(function (e) { out = out.concat(Array.prototype.slice.call(e.querySelectorAll(sel))); });
+    return new Q(out);
+  };
+  Q.prototype.val = function (v) {
+    if (v === undefined) return this.els[0] ? this.els[0].value : undefined;
+    this.els.forEach(function (e) { e.value = v; });
+    return this;
+  };
+  Q.prototype.data = function (k) { return this.els[0] ? this.els[0].getAttribute('data-' + k) : undefined; };
+  Q.prototype.on = function (evt, fn) { this.els.forEach(function (e) { e.addEventListener(evt, fn); }); return this; };
+  Q.prototype.trigger = function (evt) {
+    this.els.forEach(function (e) { e.dispatchEvent(new Event(evt, {bubbles: true})); });
+    return this;
+  };
+  Q.prototype.modal = function (cmd) {
+    this.els.forEach(function (e) { e.style.display = cmd === 'show' ? 'block' : 'none'; });
+    return this;
+  };
+  Q.prototype.yiiGridView = function (cmd, opts) {
+    var id = this.els[0].id;
+    var url = location.pathname + '?r=transaction/studentPerformance/create&' + (opts.data || '') + '&ajax=' + id;
+    $.ajaxGet(url, function (text) {
+      var box = document.createElement('div');
+      box.innerHTML = text;
+      var fresh = box.querySelector('#' + id);
+      var old = document.getElementById(id);
+      if (fresh && old) old.parentNode.replaceChild(fresh, old);
+      if (opts.complete) opts.complete();
+    });
+    return this;
+  };
+  Q.prototype.select2 = function (cmd, data) {
+    var select = this.els[0];
+    var box = document.getElementById('s2id_' + select.id);
+    var chosen = box.querySelector('.select2-chosen');
+    var close = function () { var d = document.querySelector('.select2-drop'); if (d) d.parentNode.removeChild(d); };
+    var choose = function (value, text) {
+      select.value = value;
+      chosen.textContent = text;
+      select.dataset.select2Id = value;
+      close();
+    };
+    if (cmd === 'open') {
+      close();
+      var drop = document.createElement('div');
+      drop.className = 'select2-drop';
+      drop.innerHTML = '<input type="text" class="select2-input"><ul class="select2-results"></ul>';
+      box.appendChild(drop);
+      var input = drop.querySelector('.select2-input');
+      var results = drop.querySelector('.select2-results');
+      input.addEventListener('input', function () {
+        var term = input.value.toLowerCase();
+        results.innerHTML = '';
+        if (!term) return;
+        Array.prototype.forEach.call(select.options, function (o) {
+          if (!o.value || o.text.toLowerCase().indexOf(term) < 0) return;
+          var li = document.createElement('li');
+          li.className = 'select2-result';
+          li.innerHTML = '<div class="select2-result-label"></div>';
+          li.firstChild.textContent = o.text;
+          li.firstChild.addEventListener('click', function () {
+            choose(o.value, o.text);
+            $(select).trigger('change');
+          });
+          results.appendChild(li);
+        });
+      });
+    } else if (cmd === 'data') {
+      if (data === undefined) return select.value ? {id: select.value, text: chosen.textContent} : null;
+      choose(data.id, data.text);
+    }
+    return this;
+  };
+  window.jQuery = window.$ = $;
+})();
+"""
+
+PAGE_SCRIPT = r"""
+var changeGridStudent = function () {
+  var dataString = 'StudentPerformanceM[date]=' + encodeURIComponent($('#StudentPerformanceM_date').val()) +
+    '&StudentPerformanceM[item_id]=' + $('#StudentPerformanceM_item_id').val();
+  $('#student-performance-m-grid').yiiGridView('update', {data: dataString});
+};
+var changeGridStudentList = function () {
+  var stringData = 'StudentPerformanceM[class_id]=' + $('#class_id').val() +
+    '&StudentPerformanceM[item_id]=' + $('#StudentPerformanceM_item_id').val();
+  $('#student-grid').yiiGridView('update', {data: stringData});
+};
+var showModal = function () {
+  if ($('#StudentPerformanceM_item_id').val()) {
+    changeGridStudentList();
+    $('#studentModal').modal('show');
+  } else {
+    alert('请选择项目！');
+  }
+};
+var addToEkstra = function (obj) {
+  document.querySelectorAll('#student-performance-m-grid table tbody tr td.empty').forEach(function (td) {
+    td.parentNode.parentNode.removeChild(td.parentNode);
+  });
+  var d = function (k) { return obj.getAttribute('data-' + k); };
+  var sid = d('student_id');
+  var tbody = document.querySelector('#student-performance-m-grid table tbody');
+  if (tbody.querySelector('tr[class="' + sid + '"]')) { return; }
+  var tr = document.createElement('tr');
+  tr.className = sid;
+  var p = 'StudentPerformanceM[inputperformance][' + sid + ']';
+  tr.innerHTML = '<td style="text-align:center">' + d('student_no') + '</td>' +
+    '<td><input class="span2" type="hidden" name="' + p + '[class_id]" value="' + d('class_id') + '">' + d('student_name') + '</td>' +
+    '<td style="text-align:center">' + d('student_cname') + '</td>' +
+    '<td style="text-align:center">' + d('class_name') + '</td>' +
+    '<td><select class="span12" required name="' + p + '[type_of_bonus]" data-student_id="' + sid + '">' +
+    '<option value=""></option><option value="1">校外学艺</option><option value="2">特殊表现</option></select></td>' +
+    '<td><textarea id="StudentPerformanceM_inputperformance_' + sid + '_remark" name="' + p + '[remark]"></textarea></td>' +
+    '<td><input class="span12" id="StudentPerformanceM_inputperformance_' + sid + '_mark" name="' + p + '[mark]" type="text" value="' + d('mark_item') + '"></td>' +
+    '<td><a onclick="delItem(this);return false;" class="buttonEdit btn" href="#">-</a></td>';
+  tbody.appendChild(tr);
+};
+var delItem = function (a) { var tr = a.parentNode.parentNode; tr.parentNode.removeChild(tr); };
+$('#StudentPerformanceM_item_id').on('change', function () { changeGridStudent(); });
+document.querySelector('#studentModal a.close').addEventListener('click', function () { $('#studentModal').modal('hide'); });
+document.body.addEventListener('keydown', function (e) { if (e.key === 'Escape') $('#studentModal').modal('hide'); });
+"""
+
+
+def _e(value) -> str:
+    return html.escape(str(value), quote=True)
+
+
+def render_login(error: bool = False) -> str:
+    msg = '<div class="errorSummary">用户名或密码错误</div>' if error else ''
+    return LAYOUT.format(shim='', body=f"""
+<form id="login-form" action="{SMS_PATH}?r=site/login" method="post">{msg}
+<div><label for="LoginForm_username">用户名</label><input name="LoginForm[username]" id="LoginForm_username" type="text"></div>
+<div><label for="LoginForm_password">密码</label><input name="LoginForm[password]" id="LoginForm_password" type="password"></div>
+<div><div><button type="submit">登入</button></div></div>
+</form>""")
+
+
+def render_student_grid(state: FakeSmsState, class_value: str) -> str:
+    rows = []
+    for i, s in enumerate(state.students.get(class_value, [])):
+        attrs = ' '.join(f'data-{k}="{_e(v)}"' for k, v in s.items())
+        rows.append(
+            f'<tr class="{"odd" if i % 2 == 0 else "even"}">'
+            f'<td class="span2" style="text-align:center">{_e(s["student_no"])}</td>'
+            f'<td class="span4">{_e(s["student_name"])}</td>'
+            f'<td class="span2" style="text-align:center">{_e(s["student_cname"])}</td>'
+            f'<td class="span2" style="text-align:center">{_e(s["class_name"])}</td>'
+            f'<td><div class="btn-group"></div><a onclick="addToEkstra(this);return false;" {attrs} class="btn" href="#">'
+            f'<icon class="icon-ok"></icon></a></td></tr>'
+        )
+    if not rows:
+        rows.append('<tr><td colspan="5" class="empty"><span class="empty">没有找到数据.</span></td></tr>')
+    return (
+        '<div id="student-grid" class="grid-view">'
+        '<table class="table table-striped table-bordered table-condensed table">'
+        '<thead><tr><th>学号</th><th>姓名(英)</th><th>姓名(中)</th><th>班级</th><th>&nbsp;</th></tr></thead>'
+        f'<tbody>{"".join(rows)}</tbody></table></div>'
+    )
+
+
+def render_performance_grid(state: FakeSmsState, date: str, item_id: str) -> str:
+    rows = []
+    for r in (state.find_records(date, item_id) if date and item_id else []):
+        rows.append(
+            f'<tr class="odd"><td style="text-align:center">{_e(r["student_no"])}</td>'
+            f'<td>{_e(r["student_name"])}</td><td style="text-align:center">{_e(r["student_cname"])}</td>'
+            f'<td style="text-align:center">{_e(r["class_name"])}</td>'
+            f'<td>{_e(BONUS_TYPES.get(r["type_of_bonus"], ""))}</td><td>{_e(r["remark"])}</td>'
+            f'<td>{_e(r["mark"])}</td>'
+            f'<td><a onclick="delValue({r["id"]}, {r["student_id"]});return false;" class="btn" href="#">x</a></td></tr>'
+        )
+    if not rows:
+        rows.append('<tr><td colspan="8" class="empty"><span class="empty">没有找到数据.</span></td></tr>')
+    return (
+        '<div style="overflow:auto;" id="student-performance-m-grid" class="grid-view">'
+        '<table class="table table-striped table-bordered table-condensed table">'
+        '<thead><tr><th>学号</th><th>姓名(英)</th><th>姓名(中)</th><th>班级</th>'
+        '<th>奖励分数类型</th><th>备注</th><th>分数</th><th></th></tr></thead>'
+        f'<tbody>{"".join(rows)}</tbody></table></div>'
+    )
+
+
+def render_create(state: FakeSmsState, error: str = '') -> str:
+    activity_opts = '<option value=""></option>' + ''.join(
+        f'<option value="{_e(v)}">{_e(t)}</option>' for v, t in state.activities)
+    class_opts = ''.join(f'<option value="{_e(v)}">{_e(label)}</option>' for v, label, _ in state.classes)
+    first_class = state.classes[0][0] if state.classes else ''
+    err = f'<div class="errorSummary">{_e(error)}</div>' if error else ''
+    body = f"""
+<form class="form-horizontal" id="student-performance-m-form" action="{SMS_PATH}?r=transaction/studentPerformance/create" method="post">{err}
+<input class="span4" readonly="readonly" name="StudentPerformanceM[year]" id="StudentPerformanceM_year" type="text" value="2025">
+<input class="span4" readonly="readonly" name="StudentPerformanceM[semester]" id="StudentPerformanceM_semester" type="text" value="2">
+<input required="required" class="span6" onchange="changeGridStudent()" type="text" autocomplete="off" name="StudentPerformanceM[date]" id="StudentPerformanceM_date" value="">
+<div class="select2-container span8" id="s2id_StudentPerformanceM_item_id"><a href="javascript:void(0)" class="select2-choice"><span class="select2-chosen"></span></a></div>
+<select class="span8 select2-offscreen" name="StudentPerformanceM[item_id]" id="StudentPerformanceM_item_id">{activity_opts}</select>
+<button onclick="showModal();" class="btn btn-primary" id="yw4" name="yt0" type="button">学生名单</button>
+<div class="summary"></div>
+{render_performance_grid(state, '', '')}
+<div id="StudentList"><div style="display:none" id="studentModal" class="modal">
+<div class="modal-header"><a class="close" data-dismiss="modal">×</a><h4>学生名单</h4>
+<input type="hidden" id="filter" value="class">
+<select onchange="changeGridStudentList();" name="class_id" id="class_id">{class_opts}</select></div>
+<div class="modal-body">{render_student_grid(state, first_class)}</div></div></div>
+<div class="form-actions"><button class="btn btn-primary" id="yw7" type="submit" name="yt1">创建</button></div>
+</form><script>{PAGE_SCRIPT}</script>"""
+    return LAYOUT.format(shim=JQUERY_SHIM, body=body)
+
+
+# ----------------------------------------------------------------------------
+# HTTP 處理
+# ----------------------------------------------------------------------------
+
+class FakeSmsHandler(BaseHTTPRequestHandler):
+    server_version = 'FakeSMS/1.0'
+    protocol_version = 'HTTP/1.1'  # 所有回應都有 Content-Length，可 keep-alive
+
+    def setup(self):
+        super().setup()
+        with self.server.state.lock:
+            self.server.state.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def state(self) -> FakeSmsState:
+        return self.server.state
+
+    def _session(self) -> Optional[str]:
+        for part in (self.headers.get('Cookie') or '').split(';'):
+            name, _, value = part.strip().partition('=')
+            if name == 'PHPSESSID' and value in self.state.sessions:
+                return value
+        return None
+
+    def _send(self, body: str, status: int = 200, headers: Optional[Dict] = None):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _redirect(self, route: str, headers: Optional[Dict] = None):
+        self._send('', 302, dict(headers or {}, Location=f'{SMS_PATH}?r={route}'))
+
+    def _dispatch(self, method: str):
+        started = time.perf_counter()
+        url = urlparse(self.path)
+        query = dict(parse_qsl(url.query))
+        route = query.get('r', 'site/index')
+        form = {}
+        if method == 'POST':
+            length = int(self.headers.get('Content-Length') or 0)
+            form = parse_qsl(self.rfile.read(length).decode('utf-8'), keep_blank_values=True)
+
+        is_ajax = 'ajax' in query
+        time.sleep(self.state.ajax_latency if is_ajax else self.state.latency)
+
+        if route == 'site/login':
+            self._login(method, dict(form))
+        elif self._session() is None:
+            self._redirect('site/login')
+        elif route == 'transaction/studentPerformance/create':
+            self._create(method, query, form)
+        elif route == 'transaction/studentPerformance/delete':
+            with self.state.lock:
+                self.state.records.pop(int(query.get('id', 0) or 0), None)
+            self._send('OK')
+        else:
+            self._send(LAYOUT.format(shim='', body=f'<h1>SMS</h1><p>{_e(route)}</p>'))
+        with self.state.lock:
+            self.state.requests.append((method, route + (f"#{query['ajax']}" if is_ajax else ''),
+                                        time.perf_counter() - started))
+
+    def _login(self, method: str, form: Dict):
+        if method == 'GET':
+            self._send(render_login())
+        elif (form.get('LoginForm[username]') == self.state.username
+              and form.get('LoginForm[password]') == self.state.password):
+            token = secrets.token_hex(8)
+            with self.state.lock:
+                self.state.sessions.add(token)
+            self._redirect('site/index', {'Set-Cookie': f'PHPSESSID={token}; Path=/'})
+        else:
+            self._send(render_login(error=True))
+
+    def _create(self, method: str, query: Dict, form: List):
+        if method == 'GET':
+            ajax = query.get('ajax')
+            if ajax == 'student-grid':
+                self._send(render_student_grid(self.state, query.get('StudentPerformanceM[class_id]', '')))
+            elif ajax == 'student-performance-m-grid':
+                self._send(render_performance_grid(self.state, query.get('StudentPerformanceM[date]', ''),
+                                                   query.get('StudentPerformanceM[item_id]', '')))
+            else:
+                self._send(render_create(self.state))
+            return
+
+        fields = dict(form)
+        rows = {}
+        for name, value in form:
+            m = re.match(r'StudentPerformanceM\[inputperformance\]\[(\w+)\]\[(\w+)\]', name)
+            if m:
+                rows.setdefault(m.group(1), {})[m.group(2)] = value
+        date = fields.get('StudentPerformanceM[date]', '')
+        item_id = fields.get('StudentPerformanceM[item_id]', '')
+        if not date or not item_id:
+            self._send(render_create(self.state, '日期与项目不可为空'))
+        elif not rows or any(not r.get('type_of_bonus') for r in rows.values()):
+            self._send(render_create(self.state, '奖励分数类型不可为空'))
+        else:
+            self.state.add_records(date, item_id, rows)
+            self._redirect('transaction/studentPerformance/admin')
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+
+def start_server(state: FakeSmsState, host: str = '127.0.0.1', port: int = 0) -> ThreadingHTTPServer:
+    """在背景執行緒啟動假伺服器，返回 server（server.base_url 為 index.php 網址）"""
+    server = ThreadingHTTPServer((host, port), FakeSmsHandler)
+    server.daemon_threads = True
+    server.state = state
+    server.base_url = f'http://{host}:{server.server_address[1]}{SMS_PATH}'
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本機假 SMS 伺服器')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--classes', type=int, default=6, help='班級數')
+    parser.add_argument('--students', type=int, default=40, help='每班學生數')
+    parser.add_argument('--activities', type=int, default=50, help='額外活動選項數')
+    parser.add_argument('--latency', type=float, default=0.0, help='一般頁面延遲（秒）')
+    parser.add_argument('--ajax-latency', type=float, default=None, help='AJAX 表格延遲（秒）')
+    args = parser.parse_args()
+
+    state = FakeSmsState(args.classes, args.students, args.activities, args.latency, args.ajax_latency)
+    server = start_server(state, args.host, args.port)
+    print(f'✓ 假 SMS 已啟動: {server.base_url}?r=site/login')
+    print(f'  班級 {args.classes} × 學生 {args.students}，延遲 {args.latency}s')
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
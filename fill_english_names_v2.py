@@ -16,6 +16,8 @@
   SMS_USERNAME, SMS_PASSWORD
 可選：
   HEADLESS=1  # 無頭模式
+
+只需要英文名（不上傳）時，enrich_names.py 以名冊快取或每班一次 HTTP 抓取補全，不必開啟瀏覽器。
 """
 import os
 import json
@@ -29,11 +31,12 @@ from openpyxl import load_workbook
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.support.ui import WebDriverWait, Select
+from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
+
+import class_resolver
+import driver_launch
+from session_store import SessionStore
 
 
 SMS_LOGIN = "http://sms.chhsban.edu.my/sms/index.php?r=site/login"
@@ -97,28 +100,18 @@ def load_field_mapping():
 
 
 def setup_driver(headless: bool = False):
-    """初始化 Selenium WebDriver"""
-    options = Options()
-    if headless:
-        options.add_argument('--headless=new')
-    options.add_argument('--disable-gpu')
-    options.add_argument('--no-sandbox')
-    options.add_argument('--disable-blink-features=AutomationControlled')
-    options.add_experimental_option("excludeSwitches", ["enable-automation"])
-    options.add_experimental_option('useAutomationExtension', False)
-
-    driver = webdriver.Chrome(
-        service=Service(ChromeDriverManager().install()), 
-        options=options
-    )
-    driver.set_window_size(1200, 900)
-    return driver
+    """初始化 Selenium WebDriver（離線 chromedriver、精簡設定、重用資料夾，見 driver_launch.py）"""
+    return driver_launch.launch(headless=headless)
 
 
 def login(driver, username: str, password: str, timeout: int = 10) -> bool:
     """登入 SMS"""
     print('[1/6] 連接登入頁面...')
     driver.get(SMS_LOGIN)
+    if 'login' not in driver.current_url.lower():
+        # 重用的瀏覽器資料夾仍保留登入 Cookie，登入頁直接導回首頁
+        print('✓ 已登入（沿用瀏覽器資料夾的 Session）')
+        return True
     try:
         WebDriverWait(driver, timeout).until(
             EC.presence_of_element_located((By.ID, 'LoginForm_username'))
@@ -247,33 +240,22 @@ def click_student_list_button(driver, timeout: int = 8) -> bool:
 
 
 def select_class(driver, class_short: str, timeout: int = 8) -> bool:
-    """選擇班級"""
+    """選擇班級（以 class_resolver 的別名表解析，依 value 單次選擇）"""
     try:
-        sel = WebDriverWait(driver, timeout).until(
-            EC.presence_of_element_located((By.ID, 'class_id'))
-        )
-        select = Select(sel)
-
-        # 匹配班級簡寫（括號內或尾部）
-        matched_value = None
-        for opt in sel.find_elements(By.TAG_NAME, 'option'):
-            text = opt.text.strip()
-            if f'({class_short})' in text or text.endswith(class_short):
-                matched_value = opt.get_attribute('value')
-                break
-
+        resolver = class_resolver.for_driver(driver, timeout)
+        matched_value = resolver.resolve(class_short)
         if not matched_value:
-            print(f'⚠ 找不到班級: {class_short}')
+            reason = '（有歧義）' if resolver.is_ambiguous(class_short) else ''
+            print(f'⚠ 找不到班級: {class_short}{reason}')
             return False
 
-        select.select_by_value(matched_value)
+        class_resolver.select(driver, matched_value, timeout)
         print(f'  已選擇班級: {class_short}')
 
         # 等待表格載入
         WebDriverWait(driver, timeout).until(
             EC.presence_of_element_located((By.CSS_SELECTOR, 'table.table tbody tr'))
         )
-        time.sleep(0.8)
         return True
 
     except Exception as e:
@@ -390,14 +372,22 @@ def main():
 
     print(f'✓ 讀取到 {len(students_by_class)} 個班級，共 {sum(len(v) for v in students_by_class.values())} 位學生')
 
+    # 英文名稱放在最後一個欄位之後（只計算一次）
+    english_name_col = max(field_map.values()) + 1
+
     # 初始化瀏覽器
     driver = setup_driver(headless=headless)
     found_count = 0
     missing_count = 0
 
     try:
-        # 登入
-        if not login(driver, username, password):
+        # 登入（保存的 Session 仍有效時略過）
+        store = SessionStore()
+        if store.restore_driver(driver, username, SMS_LOGIN.split('?')[0]):
+            print('✓ 已還原登入 Session，略過登入')
+        elif login(driver, username, password):
+            store.save_driver(driver, username, SMS_LOGIN.split('?')[0])
+        else:
             return
 
         # 填寫日期與活動
@@ -436,8 +426,7 @@ def main():
                         time.sleep(0.8)  # 延長延遲，讓 JavaScript 完成
                         print(f'      已添加到名單')
                         
-                        # 寫入 Excel（英文名稱放在最後一個欄位之後）
-                        english_name_col = max(field_map.values()) + 1
+                        # 先寫入記憶體中的活頁簿，全部班級完成後一次存檔
                         ws.cell(row=row_idx, column=english_name_col, value=name_en)
                         found_count += 1
                     except Exception as e:
@@ -447,6 +436,13 @@ def main():
                     print(f'    ⚠ {student_id} 未找到')
                     missing_count += 1
 
+        # 英文名一次寫回 Excel
+        try:
+            wb.save(EXCEL_FILE)
+            print(f'\n✓ 已將 {found_count} 位英文名寫入 Excel')
+        except OSError as e:
+            print(f'\n⚠ 無法寫入 Excel（是否仍在 Excel 中開啟？）: {e}')
+
         # [5/6] 關閉 Modal，返回上一頁
         print(f'\n[5/6] 關閉學生名單...')
         try:
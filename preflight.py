@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+上傳前檢查：開啟瀏覽器之前，以名冊快取與活動索引一次檢查整個活動，列出所有問題。
+
+錯誤（預設阻止上傳）：
+- 日期格式不是 yyyy-MM-dd 或不是有效日期
+- 活動代碼不在活動索引中
+- 班級不存在，或班級寫法同時符合多個班級（見 class_resolver.py）
+- 學號不在該班名冊中
+- 學號屬於另一個班級，或同一學號在工作表中出現於不同班級
+警告：
+- 重複的列（讀取時已略過）、備註（award）為空、日期在未來
+- 缺少學號的列（讀取時已略過）
+- 該班名冊尚未快取，無法檢查學號（python roster_cache.py warm 可預先建立）
+
+學號對不上或缺少學號時，以 student_match.StudentIndex 附上最可能的學生（python student_match.py --apply 可改正）。
+
+用法：
+  python preflight.py                    # 檢查 Upload.xlsx
+  python preflight.py 活動.xlsx --sheet 工作表
+
+upload.py / batch_upload.py 在開啟瀏覽器前會自動檢查；PREFLIGHT_FORCE=1（或 --force）可略過錯誤強制上傳。
+"""
+import argparse
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, date
+from typing import Optional, Dict, List, NamedTuple, Tuple
+
+from class_resolver import normalize_alias
+from upload_jobs import StudentRow, UploadJob
+
+
+class Issue(NamedTuple):
+    """一個檢查結果（row_idx 為 Excel 行號，無則為 0）"""
+    level: str          # error | warning
+    kind: str
+    message: str
+    row_idx: int = 0
+    class_short: str = ''
+    student_id: str = ''
+
+
+class PreflightReport(NamedTuple):
+    job_key: str
+    issues: Tuple[Issue, ...]
+    seconds: float
+
+    @property
+    def errors(self) -> List[Issue]:
+        return [i for i in self.issues if i.level == 'error']
+
+    @property
+    def warnings(self) -> List[Issue]:
+        return [i for i in self.issues if i.level == 'warning']
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+
+def check_job(job: UploadJob, roster=None, catalog=None,
+              duplicates: Tuple[Tuple[int, str, str], ...] = (),
+              incomplete: Tuple[StudentRow, ...] = ()) -> PreflightReport:
+    """
+    檢查一個活動（只讀取本機快取，不連線 SMS）
+
+    Args:
+        roster: roster_cache.RosterCache
+        catalog: activity_catalog.ActivityCatalog
+        duplicates: LoadedSheet.duplicates
+        incomplete: LoadedSheet.incomplete
+    """
+    started = time.perf_counter()
+    issues: List[Issue] = []
+
+    def add(level, kind, message, s=None):
+        issues.append(Issue(level, kind, message, s.row_idx if s else 0,
+                            s.class_short if s else '', s.student_id if s else ''))
+
+    index = None
+
+    def suggestion(s) -> str:
+        nonlocal index
+        if roster is None:
+            return ''
+        if index is None:
+            from student_match import StudentIndex
+            index = StudentIndex.from_cache(roster)
+        # 索引以班級簡寫為鍵；工作表寫「高三忠」或「s3a」時先轉為 S3A
+        class_short = roster.canonical_class(s.class_short) or s.class_short
+        best = next(iter(index.match(class_short, s.student_id, s.name, limit=1)), None)
+        if best is None:
+            return ''
+        return f'（可能是 {best.class_short} {best.student_no} {best.name_zh or best.name_en}，信心 {best.confidence:.2f}）'
+
+    # 日期
+    try:
+        day = datetime.strptime(job.date, '%Y-%m-%d').date()
+        if day > date.today():
+            add('warning', 'future_date', f'日期 {job.date} 在未來')
+    except ValueError:
+        add('error', 'bad_date', f'日期格式錯誤: {job.date!r}（應為 yyyy-MM-dd）')
+
+    # 活動代碼
+    if catalog is not None and len(catalog):
+        activity = catalog.lookup(job.code, refresh=False)
+        if activity is None:
+            add('error', 'unknown_activity', f'活動索引中找不到: {job.code}')
+    else:
+        add('warning', 'unverified_activity', f'活動索引為空，無法檢查 {job.code}')
+
+    for row_idx, class_short, student_id in duplicates:
+        issues.append(Issue('warning', 'duplicate', f'重複的 {class_short} - {student_id}（已略過）',
+                            row_idx, class_short, student_id))
+
+    for s in incomplete:
+        missing = '學號' if not s.student_id else '班級'
+        add('warning', 'missing_id', f'{s.class_short or "?"} {s.name} 缺少{missing}（已略過）{suggestion(s)}', s)
+
+    # 班級經 class_resolver 的別名表轉為簡寫（高三忠、s3a → S3A）
+    resolver = roster.resolver() if roster is not None else None
+    known_classes = len(resolver) if resolver is not None else 0
+
+    def short_of(class_short: str) -> str:
+        return (resolver.canonical(class_short) if known_classes else None) or class_short
+
+    # 同一學號出現在不同班級
+    classes_of = defaultdict(set)
+    for s in job.students:
+        classes_of[s.student_id].add(short_of(s.class_short))
+
+    rosters: Dict[str, Optional[Dict]] = {}
+    unverified = set()
+    for s in job.students:
+        if len(classes_of[s.student_id]) > 1:
+            add('error', 'conflict', f'學號 {s.student_id} 同時出現在 {"、".join(sorted(classes_of[s.student_id]))}', s)
+        if not str(s.award or '').strip():
+            add('warning', 'empty_award', f'{s.class_short} {s.student_id} 的備註（award）為空', s)
+        if roster is None:
+            continue
+
+        if known_classes and resolver.is_ambiguous(s.class_short):
+            add('error', 'ambiguous_class', f'班級 {s.class_short} 有歧義：'
+                                            f'{"、".join(resolver.ambiguous[normalize_alias(s.class_short)])}', s)
+            continue
+        if known_classes and resolver.resolve(s.class_short) is None:
+            add('error', 'unknown_class', f'找不到班級: {s.class_short}', s)
+            continue
+        short = short_of(s.class_short)
+        if short not in rosters:
+            rosters[short] = roster.roster(short)
+        members = rosters[short]
+        if members is None:
+            if short not in unverified:
+                unverified.add(short)
+                add('warning', 'unverified_class', f'{short} 的名冊尚未快取，無法檢查學號', s)
+            continue
+        if s.student_id in members:
+            continue
+        other = roster.student(s.student_id)
+        if other is not None and other[0] != short:
+            add('error', 'class_mismatch', f'學號 {s.student_id} 屬於 {other[0]}，不是 {s.class_short}', s)
+        else:
+            add('error', 'unknown_student', f'{s.class_short} 中沒有學號 {s.student_id}{suggestion(s)}', s)
+
+    if roster is not None and not known_classes:
+        add('warning', 'unverified_class', '名冊快取為空，無法檢查班級與學號')
+    return PreflightReport(job.key, tuple(issues), time.perf_counter() - started)
+
+
+def print_report(report: PreflightReport):
+    mark = '✓' if report.ok else '✗'
+    print(f'{mark} 上傳前檢查 {report.job_key}: {len(report.errors)} 個錯誤，{len(report.warnings)} 個警告'
+          f'（{report.seconds * 1000:.1f} ms）')
+    for issue in report.errors + report.warnings:
+        where = f'第 {issue.row_idx} 行 ' if issue.row_idx else ''
+        print(f"  {'✗' if issue.level == 'error' else '⚠'} {where}{issue.message}")
+
+
+def main(argv: Optional[List[str]] = None):
+    import upload
+    from activity_catalog import ActivityCatalog
+    from roster_cache import RosterCache
+    from run_report import safe_console
+
+    safe_console()
+    parser = argparse.ArgumentParser(description='上傳前檢查（不開啟瀏覽器）')
+    parser.add_argument('excel', nargs='?', default=upload.EXCEL_FILE)
+    parser.add_argument('--sheet', help='工作表名稱（預設為使用中的工作表）')
+    args = parser.parse_args(argv)
+
+    loaded = upload.load_upload_sheet(args.excel, args.sheet)
+    if loaded is None:
+        sys.exit(1)
+    roster = RosterCache()
+    try:
+        report = check_job(loaded.job, roster, ActivityCatalog(), loaded.duplicates, loaded.incomplete)
+    finally:
+        roster.close()
+    print_report(report)
+    sys.exit(0 if report.ok else 1)
+
+
+if __name__ == '__main__':
+    main()
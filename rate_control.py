@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+依 SMS 實際回應時間調整並行數與節奏的 AIMD 控制器（所有 worker / 協程共用一個）。
+
+每個對伺服器的操作都包在 slot(op) 中（op 例如 grid、add、submit、page）：
+- 取得 slot 時，進行中的操作數不超過目前上限 limit，且兩次開始之間至少間隔 interval 秒
+- 完成時記錄耗時：與該操作的基準耗時相比沒有明顯變慢 → limit 緩慢加一（每完成約 limit 次加 1），
+  interval 縮短；變慢（超過基準 × tolerance）、逾時或伺服器錯誤 → limit 減半、interval 加倍
+- 基準取近期耗時的低百分位數（預設 P20），累積 min_samples 筆之前不判斷變慢，
+  個別異常快的樣本不會把基準拉到接近 0；沒有送出請求的操作不應包在 slot 中
+- 每次減速後，只有在減速之後才開始的操作能再觸發減速，避免同一波變慢連續減半
+
+current()/snapshot() 顯示目前的上限與各操作統計，history 記錄每次調整的時間與原因。
+
+Selenium 端（upload.py / batch_upload.py）以模組層級的 install() 共用一個控制器；
+sms_async.AsyncSmsClient 可直接傳入 controller，以 async with 使用同一個 slot。
+
+用法：
+  python rate_control.py run_reports/rate-20250906-101500.json   # 顯示已存檔的調整紀錄
+"""
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from datetime import datetime
+from typing import Optional, Deque, Dict, List, NamedTuple
+
+
+REPORT_DIR = os.path.join(os.path.dirname(__file__), 'run_reports')
+
+
+class Change(NamedTuple):
+    """一次上限或節奏的調整"""
+    t: float            # 相對控制器建立的秒數
+    reason: str
+    limit: float
+    interval: float
+
+
+class _OpStats:
+    def __init__(self, window: int):
+        self.count = 0
+        self.errors = 0
+        self.slow = 0
+        self.baseline: Optional[float] = None
+        self.recent: Deque[float] = deque(maxlen=window)
+
+    def percentile(self, p: float) -> float:
+        if not self.recent:
+            return 0.0
+        values = sorted(self.recent)
+        return values[min(len(values) - 1, int(p * len(values)))]
+
+
+class _Slot:
+    """slot(op) 的 context manager（同時支援 with 與 async with）"""
+
+    def __init__(self, controller: 'AimdController', op: str):
+        self.controller = controller
+        self.op = op
+        self.ok = True
+        self.reason = ''
+        self.started = 0.0
+
+    def fail(self, reason: str = ''):
+        """操作沒有拋出例外但失敗（例如伺服器回應 5xx）"""
+        self.ok = False
+        self.reason = reason
+
+    def __enter__(self):
+        delay = self.controller._acquire()
+        if delay > 0:
+            time.sleep(delay)
+        self.started = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        ok = self.ok and exc_type is None
+        self.controller._release(self.op, self.started, ok, self.reason or (exc_type.__name__ if exc_type else ''))
+        return False
+
+    async def __aenter__(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            released = asyncio.Event()
+            delay = self.controller._try_acquire(loop, released)
+            if delay is not None:
+                break
+            await released.wait()   # 等到有 slot 釋放再重試
+        if delay > 0:
+            await asyncio.sleep(delay)
+        self.started = time.monotonic()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
+
+
+class AimdController:
+    """加法增加、乘法減少（AIMD）的並行數與節奏控制器（執行緒安全）"""
+
+    def __init__(self, max_limit: int = 6, min_limit: int = 1, initial: Optional[float] = None,
+                 max_interval: float = 2.0, tolerance: float = 2.0, slack: float = 0.05,
+                 decrease: float = 0.5, window: int = 200, history: int = 500,
+                 baseline_pct: float = 0.2, min_samples: int = 5):
+        """
+        Args:
+            max_limit / min_limit: 並行數上下限
+            initial: 起始並行數（預設為上限的一半）
+            max_interval: 兩次開始之間最長的間隔（秒）
+            tolerance / slack: 耗時超過 基準 × tolerance + slack 秒視為變慢
+            decrease: 變慢或出錯時並行數乘上的倍數
+            baseline_pct: 基準耗時取近期樣本的百分位數
+            min_samples: 該操作累積多少筆後才判斷變慢
+        """
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.limit = float(initial if initial is not None else max(self.min_limit, self.max_limit / 2))
+        self.interval = 0.0
+        self.max_interval = max_interval
+        self.tolerance = tolerance
+        self.slack = slack
+        self.decrease = decrease
+        self.window = window
+        self.baseline_pct = baseline_pct
+        self.min_samples = max(1, min_samples)
+        self.inflight = 0
+        self.increases = 0
+        self.decreases = 0
+        self.ops: Dict[str, _OpStats] = {}
+        self.history: Deque[Change] = deque(maxlen=history)
+        self.created = time.monotonic()
+        self._next_start = 0.0
+        self._last_decrease = float('-inf')
+        self._cond = threading.Condition()
+        self._waiters: List = []   # 等待 slot 的協程：(event loop, asyncio.Event)
+
+    # ---- 取得與釋放 ----------------------------------------------------
+
+    def slot(self, op: str) -> _Slot:
+        return _Slot(self, op)
+
+    def _try_acquire(self, loop=None, released: Optional[asyncio.Event] = None) -> Optional[float]:
+        """
+        有空位時佔用並返回需要等待的秒數（節奏），沒有空位返回 None；
+        傳入 loop 與 released 時，下一次釋放會在該 loop 上 set() 這個 Event
+        """
+        with self._cond:
+            delay = self._reserve()
+            if delay is None and released is not None:
+                self._waiters.append((loop, released))
+            return delay
+
+    def _acquire(self) -> float:
+        with self._cond:
+            while True:
+                delay = self._reserve()
+                if delay is not None:
+                    return delay
+                self._cond.wait()
+
+    def _reserve(self) -> Optional[float]:
+        if self.inflight >= int(self.limit):
+            return None
+        now = time.monotonic()
+        delay = max(0.0, self._next_start - now)
+        self._next_start = max(now, self._next_start) + self.interval
+        self.inflight += 1
+        return delay
+
+    def _release(self, op: str, started: float, ok: bool, reason: str = ''):
+        seconds = time.monotonic() - started
+        with self._cond:
+            self.inflight -= 1
+            stats = self.ops.get(op)
+            if stats is None:
+                stats = self.ops[op] = _OpStats(self.window)
+            stats.count += 1
+            slow = stats.baseline is not None and seconds > stats.baseline * self.tolerance + self.slack
+            stats.recent.append(seconds)
+            # 基準取近期耗時的低百分位數（接近伺服器沒有負載時的回應時間），長期變慢時隨視窗移動
+            if len(stats.recent) >= self.min_samples:
+                stats.baseline = stats.percentile(self.baseline_pct)
+            if not ok:
+                stats.errors += 1
+                self._back_off(started, f'{op} 失敗' + (f'（{reason}）' if reason else ''))
+            elif slow:
+                stats.slow += 1
+                self._back_off(started, f'{op} 變慢 {seconds:.2f}s（基準 {stats.baseline:.2f}s）')
+            else:
+                self._speed_up()
+            self._cond.notify_all()
+            waiters, self._waiters = self._waiters, []
+        for loop, released in waiters:
+            try:
+                loop.call_soon_threadsafe(released.set)
+            except RuntimeError:
+                pass  # event loop 已關閉
+
+    # ---- 調整 ----------------------------------------------------------
+
+    def _speed_up(self):
+        before = int(self.limit)
+        self.limit = min(float(self.max_limit), self.limit + 1.0 / max(self.limit, 1.0))
+        interval = self.interval * 0.8 if self.interval > 0.01 else 0.0
+        changed = int(self.limit) != before or (interval == 0.0) != (self.interval == 0.0)
+        self.interval = interval
+        if changed:
+            self.increases += 1
+            self._record('回應正常，加速')
+
+    def _back_off(self, started: float, reason: str):
+        if started < self._last_decrease:
+            return  # 減速前就開始的操作，已反映在上一次減速
+        self._last_decrease = time.monotonic()
+        self.limit = max(float(self.min_limit), self.limit * self.decrease)
+        self.interval = min(self.max_interval, max(self.interval * 2, 0.1))
+        self.decreases += 1
+        self._record(reason)
+
+    def _record(self, reason: str):
+        self.history.append(Change(round(time.monotonic() - self.created, 3), reason,
+                                   round(self.limit, 2), round(self.interval, 3)))
+
+    # ---- 狀態 ----------------------------------------------------------
+
+    def current(self) -> Dict:
+        """目前的並行上限、節奏與進行中的操作數"""
+        with self._cond:
+            return {'limit': int(self.limit), 'target': round(self.limit, 2),
+                    'interval': round(self.interval, 3), 'inflight': self.inflight}
+
+    def snapshot(self) -> Dict:
+        with self._cond:
+            return {
+                **self.current(),
+                'min_limit': self.min_limit,
+                'max_limit': self.max_limit,
+                'increases': self.increases,
+                'decreases': self.decreases,
+                'ops': {op: {'count': s.count, 'errors': s.errors, 'slow': s.slow,
+                             'baseline': round(s.baseline or 0.0, 3),
+                             'p50': round(s.percentile(0.5), 3), 'p95': round(s.percentile(0.95), 3)}
+                        for op, s in sorted(self.ops.items())},
+                'history': [c._asdict() for c in self.history],
+            }
+
+    def summary(self, last: int = 5) -> List[str]:
+        snap = self.snapshot()
+        lines = [f"  並行上限 {snap['limit']}（{snap['min_limit']}–{snap['max_limit']}），"
+                 f"間隔 {snap['interval']:.2f}s；加速 {snap['increases']} 次，減速 {snap['decreases']} 次"]
+        for op, s in snap['ops'].items():
+            lines.append(f"  {op:<8} {s['count']:>5} 次  p50 {s['p50']:.2f}s  p95 {s['p95']:.2f}s  "
+                         f"基準 {s['baseline']:.2f}s  變慢 {s['slow']}  失敗 {s['errors']}")
+        for c in snap['history'][-last:]:
+            lines.append(f"    +{c['t']:>7.1f}s  上限 {c['limit']:>4}  間隔 {c['interval']:.2f}s  {c['reason']}")
+        return lines
+
+    def save(self, path: Optional[str] = None) -> str:
+        """寫入 JSON，預設為 run_reports/rate-時間.json，返回路徑"""
+        if path is None:
+            os.makedirs(REPORT_DIR, exist_ok=True)
+            path = os.path.join(REPORT_DIR, datetime.now().strftime('rate-%Y%m%d-%H%M%S.json'))
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=1)
+        return path
+
+
+# ---- 模組層級的共用控制器（Selenium 端） --------------------------------
+
+_installed: Optional[AimdController] = None
+
+
+def install(controller: Optional[AimdController]) -> Optional[AimdController]:
+    """設定 slot() 使用的共用控制器（None 為停用）"""
+    global _installed
+    _installed = controller
+    return controller
+
+
+def installed() -> Optional[AimdController]:
+    return _installed
+
+
+def slot(op: str):
+    """共用控制器的 slot(op)；未安裝時不做任何限制"""
+    return _installed.slot(op) if _installed is not None else nullcontext(_NO_SLOT)
+
+
+class _NoSlot:
+    def fail(self, reason: str = ''):
+        pass
+
+
+_NO_SLOT = _NoSlot()
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        return
+    with open(sys.argv[1], encoding='utf-8') as f:
+        snap = json.load(f)
+    print(f"並行上限 {snap['limit']}（{snap['min_limit']}–{snap['max_limit']}），間隔 {snap['interval']}s")
+    for op, s in snap['ops'].items():
+        print(f"  {op:<8} {s['count']:>5} 次  p50 {s['p50']}s  p95 {s['p95']}s  變慢 {s['slow']}  失敗 {s['errors']}")
+    for c in snap['history']:
+        print(f"  +{c['t']:>7.1f}s  上限 {c['limit']:>4}  間隔 {c['interval']:.2f}s  {c['reason']}")
+
+
+if __name__ == '__main__':
+    main()
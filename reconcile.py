@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+與 SMS 既有紀錄對帳，只上傳差異：
+1. 讀取 SMS 上此日期 + 活動（item_id）已有的紀錄（student-performance-m-grid）
+2. 與 Excel 比對：新增（Excel 有、SMS 無）、移除（SMS 有、Excel 無）、備註變更
+3. 只提交新增與變更的學生；變更以「先建立新紀錄、再刪除舊紀錄」完成（SMS 沒有修改單筆紀錄的介面）
+4. 移除的紀錄預設只列出，加 --delete-removed 才會刪除
+
+用法：
+  python reconcile.py                    # 只列出差異（不修改 SMS）
+  python reconcile.py Upload.xlsx --apply
+  python reconcile.py --apply --delete-removed
+"""
+import argparse
+import os
+import re
+import time
+from collections import defaultdict
+from typing import Optional, Dict, List, NamedTuple, Tuple
+
+import sms_http
+from upload_jobs import StudentRow, UploadJob
+
+
+class RecordDiff(NamedTuple):
+    """Excel 與 SMS 既有紀錄的差異"""
+    added: Tuple[StudentRow, ...]                  # 需新增
+    removed: Tuple[Dict, ...]                      # SMS 上多出的紀錄（含同一學生的重複紀錄）
+    changed: Tuple[Tuple[StudentRow, Dict], ...]   # 備註不同：(Excel 列, 舊紀錄)
+    unchanged: int
+
+    @property
+    def empty(self) -> bool:
+        return not (self.added or self.removed or self.changed)
+
+
+def _norm(text) -> str:
+    return re.sub(r'\s+', ' ', str(text or '')).strip()
+
+
+def diff_records(job: UploadJob, records: List[Dict]) -> RecordDiff:
+    """以學號比對 Excel 學生與 SMS 既有紀錄"""
+    by_no = defaultdict(list)
+    for r in records:
+        by_no[r['student_no']].append(r)
+
+    added, changed, removed, unchanged = [], [], [], 0
+    for s in job.students:
+        existing = by_no.pop(s.student_id, [])
+        if not existing:
+            added.append(s)
+            continue
+        # 同一學生有多筆時保留備註相同的那一筆，其餘視為移除
+        keep = next((r for r in existing if _norm(r['remark']) == _norm(s.award)), None)
+        if keep is None:
+            keep = existing[0]
+            changed.append((s, keep))
+        else:
+            unchanged += 1
+        removed.extend(r for r in existing if r is not keep)
+    for extra in by_no.values():
+        removed.extend(extra)
+    return RecordDiff(tuple(added), tuple(removed), tuple(changed), unchanged)
+
+
+def print_diff(diff: RecordDiff):
+    print(f'  未變更 {diff.unchanged} 位，新增 {len(diff.added)}，變更 {len(diff.changed)}，移除 {len(diff.removed)}')
+    for s in diff.added:
+        print(f'    + {s.class_short} {s.student_id} {s.name}  {s.award}')
+    for s, old in diff.changed:
+        print(f'    ~ {s.class_short} {s.student_id} {s.name}  「{old["remark"]}」→「{s.award}」')
+    for r in diff.removed:
+        print(f'    - {r["class_name"]} {r["student_no"]} {r["student_cname"]}  {r["remark"]}（id={r["id"]}）')
+
+
+def apply_diff(session: sms_http.SmsHttpSession, job: UploadJob, item_id: str, diff: RecordDiff,
+               delete_removed: bool = False, bonus_type: str = sms_http.DEFAULT_BONUS_TYPE,
+               roster=None, journal=None) -> Dict:
+    """
+    提交差異，返回 {'created', 'deleted', 'missing', 'submitted'}
+
+    變更的學生先與新增的一起提交，成功後才刪除舊紀錄，失敗時 SMS 上仍保留原資料。
+    """
+    stats = {'created': 0, 'deleted': 0, 'missing': 0, 'submitted': False}
+    to_create = list(diff.added) + [s for s, _ in diff.changed]
+    entries = []
+    if to_create:
+        students_by_class = defaultdict(list)
+        for s in to_create:
+            students_by_class[s.class_short].append((s.row_idx, s.student_id))
+        found = {'found': 0, 'missing': 0}
+        entries = sms_http.build_entries(session, item_id, dict(students_by_class),
+                                         {s.student_id: s.award for s in to_create}, bonus_type, roster, found)
+        stats['missing'] = found['missing']
+
+    if entries:
+        ok, final_url = session.submit_performance(job.date, item_id, entries)
+        if not ok:
+            print(f'⚠ 提交可能失敗: {final_url}')
+            return stats
+        stats['created'] = len(entries)
+        if journal is not None:
+            journal.students(job.key, 'submitted', [e['student_no'] for e in entries])
+    elif to_create:
+        print('⚠ 需新增的學生都找不到，沒有提交')
+    # 需新增的學生全部找不到時沒有提交任何資料
+    stats['submitted'] = bool(entries) or not to_create
+
+    created = {e['student_no'] for e in entries}
+    to_delete = [old for s, old in diff.changed if s.student_id in created]
+    if delete_removed:
+        to_delete.extend(diff.removed)
+    for r in to_delete:
+        if session.delete_record(r['id']):
+            stats['deleted'] += 1
+        else:
+            print(f'⚠ 刪除失敗: {r["student_no"]}（id={r["id"]}）')
+    return stats
+
+
+def reconcile(session: sms_http.SmsHttpSession, job: UploadJob, apply: bool = False,
+              delete_removed: bool = False, roster=None, journal=None) -> Optional[Dict]:
+    """以已登入的 session 對帳一個活動；apply=False 時只列出差異"""
+    activity = session.resolve_activity(job.code)
+    if not activity:
+        print(f'✗ 找不到活動: {job.code}')
+        return None
+    item_id, activity_name = activity
+    print(f'✓ 活動: {activity_name}（item_id={item_id}），日期 {job.date}')
+
+    records = session.fetch_existing_records(job.date, item_id)
+    diff = diff_records(job, records)
+    print(f'  SMS 既有 {len(records)} 筆，Excel {len(job.students)} 位')
+    print_diff(diff)
+    if diff.empty or not apply:
+        return {'created': 0, 'deleted': 0, 'missing': 0, 'submitted': diff.empty}
+    stats = apply_diff(session, job, item_id, diff, delete_removed, roster=roster, journal=journal)
+    print(f"✓ 新增 {stats['created']} 筆，刪除 {stats['deleted']} 筆，未找到 {stats['missing']} 位")
+    return stats
+
+
+def main(argv: Optional[List[str]] = None):
+    import upload
+    from session_store import SessionStore
+    from upload_journal import UploadJournal
+
+    parser = argparse.ArgumentParser(description='與 SMS 既有紀錄對帳，只上傳差異')
+    parser.add_argument('excel', nargs='?', default=upload.EXCEL_FILE)
+    parser.add_argument('--sheet', help='工作表名稱（預設為使用中的工作表）')
+    parser.add_argument('--apply', action='store_true', help='提交差異（預設只列出）')
+    parser.add_argument('--delete-removed', action='store_true', help='刪除 Excel 中已不存在的紀錄')
+    args = parser.parse_args(argv)
+
+    loaded = upload.load_upload_sheet(args.excel, args.sheet)
+    if loaded is None:
+        return
+    session = sms_http.SmsHttpSession(upload.SMS_BASE_URL)
+    if not sms_http.login_with_session(session, os.getenv('SMS_USERNAME', 'schhs334'),
+                                       os.getenv('SMS_PASSWORD', 'schhs334'), SessionStore()):
+        return
+    # 名冊快取（ROSTER_CACHE=0 停用），與 upload.py 相同
+    roster = None
+    if os.getenv('ROSTER_CACHE', '1') != '0':
+        from roster_cache import RosterCache
+        roster = RosterCache()
+    started = time.perf_counter()
+    try:
+        reconcile(session, loaded.job, args.apply, args.delete_removed, roster=roster, journal=UploadJournal())
+    finally:
+        if roster is not None:
+            roster.close()
+    print(f'  耗時 {time.perf_counter() - started:.1f} 秒')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+班級名冊本機快取（SQLite）：
+- classes：班級簡寫 → class_id 選項 value、完整名稱（例如 S3A → 682, 高三忠 (S3A)）；
+  class_value / canonical_class 經 class_resolver 的別名表，高三忠、s3a 等寫法也能查到
+- students：學號 → (英文名, 中文名, 內部 ID data-student_id, 班級)
+- item_marks：活動 item_id → addToEkstra 的 data-mark_item
+
+名冊大約一學期才變動一次，預設有效期 14 天（ROSTER_TTL_DAYS 可調整）。
+
+用法：
+  python roster_cache.py warm            # 以 HTTP 同時爬取所有班級（見 sms_async.py）
+  python roster_cache.py invalidate S3A  # 作廢單一班級（不指定則全部）
+  python roster_cache.py show S3A
+  python roster_cache.py names Upload.xlsx  # 不連線，以快取寫入英文名
+"""
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from typing import Optional, Dict, List, Tuple
+
+
+ROSTER_DB = os.path.join(os.path.dirname(__file__), "roster_cache.sqlite3")
+DEFAULT_TTL = float(os.getenv('ROSTER_TTL_DAYS', '14')) * 86400
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS classes (
+    short TEXT PRIMARY KEY, value TEXT NOT NULL, label TEXT, fetched_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS students (
+    class_short TEXT NOT NULL, student_no TEXT NOT NULL, name_en TEXT, name_zh TEXT,
+    internal_id TEXT NOT NULL, fetched_at REAL NOT NULL,
+    PRIMARY KEY (class_short, student_no)
+);
+CREATE INDEX IF NOT EXISTS students_no ON students (student_no);
+CREATE TABLE IF NOT EXISTS rosters (
+    class_short TEXT PRIMARY KEY, fetched_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS item_marks (
+    item_id TEXT PRIMARY KEY, mark TEXT NOT NULL, fetched_at REAL NOT NULL DEFAULT 0
+);
+"""
+
+
+def class_short_of(label: str) -> str:
+    """由選項文字取出班級簡寫：「高三忠 (S3A)」→ S3A；無括號則返回原文字"""
+    m = re.search(r'\(([^()]+)\)\s*$', label.strip())
+    return m.group(1).strip() if m else label.strip()
+
+
+class RosterCache:
+    """班級名冊快取"""
+
+    def __init__(self, path: Optional[str] = None, ttl: float = DEFAULT_TTL):
+        self.path = path or ROSTER_DB
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        columns = {row[1] for row in self._db.execute('PRAGMA table_info(item_marks)')}
+        if 'fetched_at' not in columns:
+            # 舊版快取沒有 fetched_at，預設 0 即視為過期
+            self._db.execute('ALTER TABLE item_marks ADD COLUMN fetched_at REAL NOT NULL DEFAULT 0')
+        self._resolver = None
+        self._resolver_expires = 0.0
+
+    def close(self):
+        self._db.close()
+
+    def _fresh(self, fetched_at: Optional[float]) -> bool:
+        return fetched_at is not None and time.time() - fetched_at < self.ttl
+
+    # ---- 班級 ----------------------------------------------------------
+
+    def put_classes(self, options: List[Tuple[str, str]]):
+        """寫入 class_id 的 (value, 文字) 選項"""
+        now = time.time()
+        with self._lock, self._db:
+            self._db.executemany(
+                'INSERT OR REPLACE INTO classes (short, value, label, fetched_at) VALUES (?, ?, ?, ?)',
+                [(class_short_of(label), value, label, now) for value, label in options if value],
+            )
+            self._resolver = None
+
+    def class_value(self, class_short: str) -> Optional[str]:
+        """班級簡寫或別名（高三忠、s3a）→ class_id 選項 value（過期返回 None）"""
+        return self.resolver().resolve(class_short)
+
+    def canonical_class(self, text: str) -> Optional[str]:
+        """工作表中的班級文字 → 快取使用的班級簡寫；找不到或有歧義返回 None"""
+        return self.resolver().canonical(text)
+
+    def resolver(self):
+        """以快取班級建立的 class_resolver.ClassResolver（班級變動或最早一筆過期前沿用）"""
+        if self._resolver is None or time.time() >= self._resolver_expires:
+            from class_resolver import ClassResolver  # 避免循環匯入
+            rows = [row for row in self._class_rows() if self._fresh(row[3])]
+            self._resolver = ClassResolver((value, label) for _, value, label, _ in rows)
+            self._resolver_expires = min((t for *_, t in rows), default=time.time()) + self.ttl
+        return self._resolver
+
+    def _class_rows(self) -> List[Tuple[str, str, str, float]]:
+        with self._lock:
+            return self._db.execute('SELECT short, value, label, fetched_at FROM classes').fetchall()
+
+    def classes(self) -> Dict[str, Tuple[str, str]]:
+        """返回 {班級簡寫: (value, 完整名稱)}（僅有效資料）"""
+        return {short: (value, label) for short, value, label, t in self._class_rows() if self._fresh(t)}
+
+    # ---- 學生 ----------------------------------------------------------
+
+    def put_roster(self, class_short: str, roster: Dict[str, tuple], mark: Optional[Tuple[str, str]] = None):
+        """
+        以整班資料取代該班快取
+
+        Args:
+            roster: {學號: (英文名, 中文名, 內部 ID)}（與 upload.snapshot_student_grid 相同）
+            mark: (item_id, data-mark_item)，順便記錄活動分數
+        """
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute('DELETE FROM students WHERE class_short = ?', (class_short,))
+            self._db.executemany(
+                'INSERT OR REPLACE INTO students VALUES (?, ?, ?, ?, ?, ?)',
+                [(class_short, no, v[0], v[1], v[2], now) for no, v in roster.items() if v[2]],
+            )
+            self._db.execute('INSERT OR REPLACE INTO rosters VALUES (?, ?)', (class_short, now))
+            if mark and mark[0]:
+                self._db.execute('INSERT OR REPLACE INTO item_marks (item_id, mark, fetched_at) VALUES (?, ?, ?)',
+                                 (mark[0], mark[1], now))
+
+    def roster(self, class_short: str) -> Optional[Dict[str, tuple]]:
+        """返回 {學號: (英文名, 中文名, 內部 ID)}；未快取或已過期返回 None"""
+        with self._lock:
+            row = self._db.execute('SELECT fetched_at FROM rosters WHERE class_short = ?',
+                                   (class_short,)).fetchone()
+            if not row or not self._fresh(row[0]):
+                return None
+            rows = self._db.execute(
+                'SELECT student_no, name_en, name_zh, internal_id FROM students WHERE class_short = ?',
+                (class_short,)).fetchall()
+        return {no: (en, zh, iid) for no, en, zh, iid in rows}
+
+    def student(self, student_no: str) -> Optional[Tuple[str, str, str, str]]:
+        """學號 → (班級簡寫, 英文名, 中文名, 內部 ID)"""
+        with self._lock:
+            row = self._db.execute(
+                'SELECT class_short, name_en, name_zh, internal_id, fetched_at FROM students '
+                'WHERE student_no = ? ORDER BY fetched_at DESC LIMIT 1', (str(student_no),)).fetchone()
+        return row[:4] if row and self._fresh(row[4]) else None
+
+    def item_mark(self, item_id: str) -> Optional[str]:
+        """活動 item_id → data-mark_item（與名冊同一有效期，過期返回 None）"""
+        with self._lock:
+            row = self._db.execute('SELECT mark, fetched_at FROM item_marks WHERE item_id = ?',
+                                   (str(item_id),)).fetchone()
+        return row[0] if row and self._fresh(row[1]) else None
+
+    # ---- 維護 ----------------------------------------------------------
+
+    def invalidate(self, class_short: Optional[str] = None):
+        """作廢單一班級或全部快取"""
+        with self._lock, self._db:
+            if class_short:
+                self._db.execute('DELETE FROM rosters WHERE class_short = ?', (class_short,))
+                self._db.execute('DELETE FROM students WHERE class_short = ?', (class_short,))
+                self._db.execute('DELETE FROM classes WHERE short = ?', (class_short,))
+            else:
+                for table in ('rosters', 'students', 'classes', 'item_marks'):
+                    self._db.execute(f'DELETE FROM {table}')
+            self._resolver = None
+
+    def warm_up_http(self, session, item_id: Optional[str] = None) -> int:
+        """以已登入的 sms_http.SmsHttpSession 一次爬取所有班級，返回學生數"""
+        options = session.class_options()
+        self.put_classes(options)
+        if item_id is None:
+            item_id = next((v for v, _ in session.activity_options() if v), '')
+        total = 0
+        for value, label in options:
+            if not value:
+                continue
+            students = session.fetch_class_students(value, item_id)
+            roster = {no: (s.get('student_name', ''), s.get('student_cname', ''), s.get('student_id', ''))
+                      for no, s in students.items() if no}
+            first = next(iter(students.values()), {})
+            self.put_roster(class_short_of(label), roster, (item_id, first.get('mark_item', '')))
+            total += len(roster)
+        return total
+
+    def warm_up_driver(self, driver) -> int:
+        """以已開啟學生名單 Modal 的瀏覽器逐班爬取（無 HTTP 後端時使用），返回學生數"""
+        import upload  # 避免循環匯入
+        from class_resolver import CLASS_OPTIONS_JS
+        options = driver.execute_script(CLASS_OPTIONS_JS) or []
+        self.put_classes([tuple(o) for o in options])
+        item_id = driver.execute_script(
+            "var el = document.getElementById('StudentPerformanceM_item_id'); return el ? el.value : '';") or ''
+        total = 0
+        for value, label in options:
+            short = class_short_of(label)
+            if value and upload.select_class(driver, short):
+                roster = upload.snapshot_student_grid(driver)
+                self.put_roster(short, roster, (item_id, driver.execute_script(upload.GRID_MARK_JS) or ''))
+                total += len(roster)
+        return total
+
+
+def fill_english_names(excel_file: str, cache: RosterCache) -> Tuple[int, int]:
+    """
+    不連線 SMS，以名冊快取將英文名寫入 Excel，只存檔一次（見 enrich_names.py）
+
+    Returns:
+        (寫入數, 未找到數)
+    """
+    from enrich_names import NameResolver, enrich_workbook  # 避免循環匯入
+    return enrich_workbook(excel_file, NameResolver(cache))
+
+
+def main():
+    args = sys.argv[1:] or ['show']
+    cache = RosterCache()
+    try:
+        if args[0] == 'warm':
+            # 以 sms_async 同時抓取全部班級
+            import asyncio
+            import sms_async
+
+            async def warm():
+                async with sms_async.AsyncSmsClient() as client:
+                    if not await client.login(os.getenv('SMS_USERNAME', 'schhs334'),
+                                              os.getenv('SMS_PASSWORD', 'schhs334')):
+                        return None
+                    return await sms_async.refresh_caches(client, cache)
+
+            stats = asyncio.run(warm())
+            if stats is None:
+                print('✗ 登入失敗')
+                return
+            print(f"✓ 已快取 {stats['classes']} 個班級、{stats['students']} 位學生（{stats['seconds']} 秒）")
+        elif args[0] == 'names':
+            excel_file = args[1] if len(args) > 1 else os.path.join(os.path.dirname(__file__), 'Upload.xlsx')
+            found, missing = fill_english_names(excel_file, cache)
+            print(f'✓ 已寫入 {found} 位英文名，未找到 {missing} 位')
+        elif args[0] == 'invalidate':
+            cache.invalidate(args[1] if len(args) > 1 else None)
+            print('✓ 已作廢快取')
+        elif args[0] == 'show':
+            if len(args) > 1:
+                for no, (en, zh, iid) in sorted((cache.roster(args[1]) or {}).items()):
+                    print(f'  {no}  {iid:>6}  {zh}  {en}')
+            else:
+                for short, (value, label) in sorted(cache.classes().items()):
+                    count = len(cache.roster(short) or {})
+                    print(f'  {short:<8} {value:>5}  {label}  {count} 位')
+        else:
+            print(__doc__)
+    finally:
+        cache.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+執行報告：記錄每個階段、班級與學生的 span，輸出 JSON / CSV 與最慢項目摘要。
+
+每個 span 記錄：
+- wall：總耗時
+- wait：花在 sms_wait 等待（AJAX / 表格更新）的時間，work = wall - wait
+- commands / command_seconds：WebDriver 指令（HTTP 往返）次數與耗時
+- outcome：ok / error / skipped / partial，學生則為 added / missing / existing / submitted ...
+  （學生的 detail 為填寫備註的結果，提交後仍保留）
+
+學生在 run_event 中是整班批次添加的，學生的耗時為所屬班級 span 平均分攤（amortized）。
+
+  report = RunReport()
+  report.attach(sms_wait.timer)          # 階段 span 跟隨 timer.start()
+  driver = report.instrument(driver)     # 計算 WebDriver 指令
+  ...
+  report.save('run_reports/run')         # run.json + run.csv
+
+  python run_report.py run_reports/run-20250906-101500.json   # 重新印出摘要
+"""
+import csv
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Optional, Dict, List
+
+
+REPORT_DIR = os.path.join(os.path.dirname(__file__), "run_reports")
+CSV_FIELDS = ['kind', 'job', 'name', 'parent', 'outcome', 'wall', 'wait', 'work',
+              'commands', 'command_seconds', 'students', 'detail']
+
+
+def safe_console():
+    """
+    無法編碼的字元（✓、⚠ 等）以 ? 取代，避免在 cp950 等主控台 print 時拋出 UnicodeEncodeError
+    """
+    for stream in (sys.stdout, sys.stderr):
+        encoding = (getattr(stream, 'encoding', '') or '').lower().replace('-', '')
+        if encoding != 'utf8' and hasattr(stream, 'reconfigure'):
+            try:
+                stream.reconfigure(errors='replace')
+            except (ValueError, OSError):
+                pass
+
+
+class RunReport:
+    """收集 span（各執行緒各自維護巢狀堆疊，可供 batch_upload 多個 worker 共用）"""
+
+    def __init__(self):
+        self.spans: List[Dict] = []
+        self.students: Dict[tuple, Dict] = {}
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    # ---- span ----------------------------------------------------------
+
+    def _stack(self) -> List[Dict]:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    @property
+    def job(self) -> str:
+        return getattr(self._local, 'job', '')
+
+    @job.setter
+    def job(self, key: str):
+        self._local.job = key
+
+    def begin(self, kind: str, name: str, **attrs) -> Dict:
+        stack = self._stack()
+        span = {'kind': kind, 'job': self.job, 'name': name, 'parent': stack[-1]['name'] if stack else '',
+                'outcome': 'ok', 'wait': 0.0, 'commands': 0, 'command_seconds': 0.0,
+                '_t0': time.perf_counter(), **attrs}
+        stack.append(span)
+        return span
+
+    def end(self, span: Dict, outcome: Optional[str] = None):
+        stack = self._stack()
+        if span in stack:
+            # 一併結束尚未結束的子 span
+            while stack:
+                top = stack.pop()
+                self._finish(top)
+                if top is span:
+                    break
+        if outcome is not None:
+            span['outcome'] = outcome
+
+    def _finish(self, span: Dict):
+        span['wall'] = time.perf_counter() - span.pop('_t0')
+        span['work'] = max(0.0, span['wall'] - span['wait'])
+        with self._lock:
+            self.spans.append(span)
+
+    @contextmanager
+    def span(self, kind: str, name: str, **attrs):
+        span = self.begin(kind, name, **attrs)
+        try:
+            yield span
+        except BaseException:
+            span['outcome'] = 'error'
+            raise
+        finally:
+            self.end(span)
+
+    def current(self, kind: str) -> Optional[Dict]:
+        return next((s for s in reversed(self._stack()) if s['kind'] == kind), None)
+
+    # ---- 階段（跟隨 sms_wait.StageTimer）--------------------------------
+
+    def attach(self, timer):
+        """讓 timer.start(name) 同時開啟階段 span，timer.add_wait() 計入所有進行中的 span"""
+        timer.recorder = self
+        return self
+
+    def stage_started(self, name: str):
+        self.stage_stopped()
+        self.begin('stage', name)
+
+    def stage_stopped(self):
+        stage = self.current('stage')
+        if stage is not None:
+            self.end(stage)
+
+    def add_wait(self, seconds: float):
+        for span in self._stack():
+            span['wait'] += seconds
+
+    # ---- WebDriver 指令 ------------------------------------------------
+
+    def add_command(self, seconds: float):
+        for span in self._stack():
+            span['commands'] += 1
+            span['command_seconds'] += seconds
+
+    def instrument(self, driver):
+        """
+        包裝 driver.execute：WebElement 的 .text、get_attribute、click 等也都經由 driver.execute，
+        因此每一個 WebDriver HTTP 往返都會被計入
+        """
+        execute = driver.execute
+
+        def timed_execute(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return execute(*args, **kwargs)
+            finally:
+                self.add_command(time.perf_counter() - started)
+
+        driver.execute = timed_execute
+        return driver
+
+    # ---- 學生 ----------------------------------------------------------
+
+    def student(self, class_short: str, student_id: str, outcome: str, **attrs):
+        """記錄或更新學生的結果（同一活動中以學號為鍵）"""
+        key = (self.job, str(student_id))
+        with self._lock:
+            entry = self.students.setdefault(key, {'kind': 'student', 'job': self.job, 'name': str(student_id),
+                                                   'parent': class_short, 'outcome': outcome})
+            entry['outcome'] = outcome
+            entry.update(attrs)
+
+    def amortize(self, class_span: Dict, student_ids: List[str]):
+        """班級 span 結束後，把耗時平均分攤給該班學生"""
+        n = len(student_ids) or 1
+        for sid in student_ids:
+            entry = self.students.get((class_span['job'], str(sid)))
+            if entry is not None:
+                for field in ('wall', 'wait', 'work', 'commands', 'command_seconds'):
+                    entry[field] = class_span.get(field, 0) / n
+
+    # ---- 輸出 ----------------------------------------------------------
+
+    def rows(self) -> List[Dict]:
+        rows = []
+        for span in self.spans + list(self.students.values()):
+            row = {k: span.get(k, '') for k in CSV_FIELDS}
+            for k in ('wall', 'wait', 'work', 'command_seconds', 'commands'):
+                if isinstance(row[k], float):
+                    row[k] = round(row[k], 4)
+            rows.append(row)
+        return rows
+
+    def to_dict(self) -> Dict:
+        stages = [r for r in self.rows() if r['kind'] == 'stage']
+        return {
+            'started': datetime.fromtimestamp(self.started).isoformat(timespec='seconds'),
+            'wall': round(sum(r['wall'] or 0 for r in stages), 4),
+            'commands': sum(r['commands'] or 0 for r in stages),
+            'spans': self.rows(),
+        }
+
+    def save(self, prefix: Optional[str] = None) -> str:
+        """寫入 <prefix>.json 與 <prefix>.csv，預設為 run_reports/run-時間，返回 prefix"""
+        if prefix is None:
+            os.makedirs(REPORT_DIR, exist_ok=True)
+            prefix = os.path.join(REPORT_DIR, datetime.fromtimestamp(self.started).strftime('run-%Y%m%d-%H%M%S'))
+        with open(prefix + '.json', 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=1)
+        with open(prefix + '.csv', 'w', encoding='utf-8-sig', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+            writer.writeheader()
+            writer.writerows(self.rows())
+        return prefix
+
+    def summary(self, top: int = 5) -> List[str]:
+        return summarize(self.rows(), top)
+
+
+def summarize(rows: List[Dict], top: int = 5) -> List[str]:
+    """各階段耗時、等待與指令數，以及最慢的班級與學生"""
+    def num(v):
+        return float(v or 0)
+
+    lines = [f"  {'階段':<20}{'總耗時':>9}{'等待':>9}{'工作':>9}{'指令':>7}"]
+    for r in (r for r in rows if r['kind'] == 'stage'):
+        lines.append(f"  {r['name']:<20}{num(r['wall']):>8.2f}s{num(r['wait']):>8.2f}s"
+                     f"{num(r['work']):>8.2f}s{int(num(r['commands'])):>7}")
+    for kind, label in (('class', '最慢的班級'), ('student', '最慢的學生')):
+        items = sorted((r for r in rows if r['kind'] == kind), key=lambda r: num(r['wall']), reverse=True)[:top]
+        if items:
+            lines.append(f'  {label}:')
+            for r in items:
+                where = f"{r['parent']} " if kind == 'student' else ''
+                lines.append(f"    {where}{r['name']:<10}{num(r['wall']):>7.2f}s  等待 {num(r['wait']):.2f}s  "
+                             f"指令 {num(r['commands']):.0f}  {r['outcome']}")
+    return lines
+
+
+def main():
+    safe_console()
+    if len(sys.argv) < 2:
+        print('用法: python run_report.py 報告.json')
+        return
+    with open(sys.argv[1], 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    print(f"執行於 {data['started']}，總耗時 {data['wall']:.2f}s，WebDriver 指令 {data['commands']} 次")
+    for line in summarize(data['spans']):
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
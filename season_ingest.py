@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+讀取整季的比賽統整表（例如「2025 比赛统整.xlsx」），直接產生上傳工作（UploadJob），
+不需再手動複製到 Upload.xlsx。
+
+- 以 openpyxl read_only 模式逐列串流讀取，每個工作表只掃描一次；
+  讀完一個比賽（之後的工作表不會再併入）就立即產生工作，不必等整本讀完
+- 每個工作表為一個比賽：第一個文字為比賽名稱，「日期：dd/mm/yyyy」為日期
+- 欄位依標題（姓名 / 班级 / 学号 / 奖项）判斷，班級與學號另以內容格式辨識（標題錯位也能讀）；
+  學號經 upload_jobs.normalize_student_id 正規化（全形數字、20071.0）
+- 活動代碼與日期可在 setting.json 的 season_events 指定：
+    "season_events": {"2025 SASMO数学比赛得奖名单": {"code": "ACA CMO190", "date": "2025-03-08"}}
+- 相同活動代碼 + 日期的列合併為同一個工作
+
+用法：
+  python season_ingest.py "2025 比赛统整.xlsx"
+"""
+import json
+import os
+import re
+import sys
+from datetime import date, datetime
+from typing import Optional, Dict, Iterator, List, Tuple
+
+from openpyxl import load_workbook
+
+from upload_jobs import StudentRow, UploadJob, format_date, normalize_student_id
+
+
+SETTING_FILE = os.path.join(os.path.dirname(__file__), "setting.json")
+
+CLASS_RE = re.compile(r'^[JS][0-9][A-Z]$', re.IGNORECASE | re.ASCII)
+STUDENT_ID_RE = re.compile(r'^[0-9]{5}(\.0+)?$')
+DATE_RE = re.compile(r'(\d{1,2})/(\d{1,2})/(\d{4})')
+CJK_RE = re.compile(r'[一-鿿]')
+
+HEADER_ROLES = {
+    '姓名': 'name', '名字': 'name',
+    '班级': 'class', '班級': 'class',
+    '学号': 'studentId', '學號': 'studentId',
+    '奖项': 'award', '獎項': 'award', '成绩': 'award', '備註': 'award', '备注': 'award',
+    'name': 'name_en', '序': 'seq',
+}
+
+
+def load_season_events(setting_file: str = SETTING_FILE) -> Dict[str, Dict]:
+    """讀取 setting.json 的 season_events（工作表名稱 → {code, date}）"""
+    try:
+        with open(setting_file, 'r', encoding='utf-8') as f:
+            return json.load(f).get('season_events', {}) or {}
+    except Exception:
+        return {}
+
+
+def _text(value) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _parse_date(value) -> str:
+    if isinstance(value, (datetime, date)):
+        return format_date(value)
+    m = DATE_RE.search(_text(value))
+    if m:
+        day, month, year = m.groups()
+        return f'{year}-{int(month):02d}-{int(day):02d}'
+    return ''
+
+
+def _header_roles(row: Tuple) -> Dict[int, str]:
+    """若此列為標題列，返回 {欄索引: 角色}"""
+    roles = {}
+    for i, value in enumerate(row):
+        role = HEADER_ROLES.get(_text(value).lower()) or HEADER_ROLES.get(_text(value))
+        if role:
+            roles[i] = role
+    return roles if 'name' in roles.values() else {}
+
+
+def _parse_student(row: Tuple, roles: Dict[int, str]) -> Optional[Tuple[str, str, str, str]]:
+    """由一列資料取出 (班級, 學號, 姓名, 獎項)；班級與學號以內容格式辨識"""
+    texts = [_text(v) for v in row]
+    ids = [normalize_student_id(v) for v in row]
+    class_idx = next((i for i, t in enumerate(texts) if CLASS_RE.match(t)), None)
+    id_idx = next((i for i, t in enumerate(ids) if STUDENT_ID_RE.match(t)), None)
+    if class_idx is None or id_idx is None:
+        return None
+    used = {class_idx, id_idx}
+
+    name_idx = next((i for i, r in roles.items() if r == 'name'), None)
+    if name_idx is None or not texts[name_idx]:
+        name_idx = next((i for i, t in enumerate(texts) if i not in used and CJK_RE.search(t)), None)
+    if name_idx is not None:
+        used.add(name_idx)
+
+    award_idx = next((i for i, r in roles.items() if r == 'award'), None)
+    award = texts[award_idx] if award_idx is not None else ''
+    if not award:
+        # 獎項常放在沒有標題的欄位
+        award = next((t for i, t in enumerate(texts)
+                      if t and i not in used and i not in roles and not t.isdigit()), '')
+
+    return (texts[class_idx].upper(), ids[id_idx].split('.')[0],
+            texts[name_idx] if name_idx is not None else '', award)
+
+
+def iter_sheet(ws) -> Tuple[str, str, List[StudentRow]]:
+    """串流讀取一個工作表，返回 (比賽名稱, 日期, 學生列)"""
+    title, event_date, roles = '', '', {}
+    students, seen = [], set()
+    for row_idx, row in enumerate(ws.iter_rows(values_only=True), start=1):
+        if not any(v is not None for v in row):
+            continue
+        student = _parse_student(row, roles)
+        if student is None:
+            texts = [_text(v) for v in row if _text(v)]
+            if not title and texts:
+                title = texts[0]
+            if not event_date:
+                event_date = next((d for d in map(_parse_date, row) if d), '')
+            roles = _header_roles(row) or roles
+            continue
+        class_short, student_id, name, award = student
+        if (class_short, student_id) in seen:
+            continue
+        seen.add((class_short, student_id))
+        students.append(StudentRow(class_short, student_id, name, award, row_idx))
+    return title or ws.title, event_date, students
+
+
+def iter_season_jobs(path: str, events: Optional[Dict[str, Dict]] = None) -> Iterator[UploadJob]:
+    """
+    以單次串流讀取整季統整表，依（活動代碼, 日期）分組產生 UploadJob
+
+    每讀完一個工作表，之後的工作表不可能再併入的活動立即產生（未指定代碼的比賽各自一個工作）；
+    沒有在 season_events 指定代碼的比賽，code 為空字串（上傳前須補上）。
+    """
+    events = load_season_events() if events is None else events
+    groups = {}  # (code, date) -> [name, [StudentRow], [來源工作表]]
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        titles = wb.sheetnames
+        # 以比賽名稱（而非工作表名稱）指定的活動，可能出現在任何一個工作表
+        floating = {_text(meta.get('code')) for key, meta in events.items() if key not in titles}
+        for n, ws in enumerate(wb.worksheets):
+            title, event_date, students = iter_sheet(ws)
+            meta = events.get(ws.title) or events.get(title) or {}
+            code = _text(meta.get('code'))
+            event_date = _text(meta.get('date')) or event_date
+            key = (code or f'?{ws.title}', event_date)
+            group = groups.setdefault(key, [meta.get('name') or title, [], []])
+            group[1].extend(students)
+            group[2].append(ws.title)
+
+            later = floating | {_text(events.get(t, {}).get('code')) for t in titles[n + 1:]}
+            for done in [k for k in groups if k[0] not in later]:
+                yield _group_job(path, done, groups.pop(done))
+        for done in list(groups):
+            yield _group_job(path, done, groups.pop(done))
+    finally:
+        wb.close()
+
+
+def _group_job(path: str, key: Tuple[str, str], group: List) -> UploadJob:
+    (code, event_date), (name, students, sheets) = key, group
+    seen, unique = set(), []
+    for s in students:
+        if (s.class_short, s.student_id) not in seen:
+            seen.add((s.class_short, s.student_id))
+            unique.append(s)
+    source = f"{os.path.basename(path)}!{'+'.join(sheets)}"
+    return UploadJob(event_date, '' if code.startswith('?') else code, name, tuple(unique), source)
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(__file__), '2025 比赛统整.xlsx')
+    total = 0
+    for job in iter_season_jobs(path):
+        total += len(job.students)
+        code = job.code or '（未指定代碼）'
+        print(f'  {job.date or "（無日期）"}  {code:<14} {len(job.students):>4} 位  {job.name}')
+    print(f'✓ 共 {total} 位學生')
+
+
+if __name__ == '__main__':
+    main()
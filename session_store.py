@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+登入 Session 保存：登入後把 Cookie（PHPSESSID 等）存到本機，下次執行先還原並以一個輕量請求驗證，
+仍有效就跳過整個登入流程，過期才重新登入。
+
+Selenium 與 sms_http 共用同一份 Cookie（同一個 SMS Session），任一方登入後另一方都能直接使用。
+
+  store = SessionStore()
+  if not store.restore_driver(driver, username):
+      login(driver, username, password)
+      store.save_driver(driver, username)
+
+Cookie 檔（sms_sessions.json）等同登入憑證，只保存在本機且不加入版本控制。
+"""
+import json
+import os
+import threading
+import time
+from http.cookiejar import Cookie
+from typing import Optional, Dict, List
+from urllib.parse import urlsplit
+
+
+SESSION_FILE = os.path.join(os.path.dirname(__file__), "sms_sessions.json")
+# 驗證用頁面：必須登入才能開啟（未登入時重導到 site/login）
+PROBE_ROUTE = "transaction/studentPerformance/create"
+
+
+def _is_login_url(url: str) -> bool:
+    return 'login' in (url or '').lower()
+
+
+class SessionStore:
+    """以 (SMS 網址, 帳號) 為鍵保存 Cookie"""
+
+    def __init__(self, path: Optional[str] = None, max_age: float = 8 * 3600):
+        self.path = path or SESSION_FILE
+        self.max_age = max_age
+        self._lock = threading.Lock()
+
+    def _read(self) -> Dict:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, data: Dict):
+        tmp = self.path + '.tmp'
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.path)
+
+    @staticmethod
+    def _key(base_url: str, username: str) -> str:
+        return f'{base_url}|{username}'
+
+    def load(self, base_url: str, username: str) -> List[Dict]:
+        """返回未超過 max_age 的 Cookie [{name, value, path, domain}]"""
+        with self._lock:
+            entry = self._read().get(self._key(base_url, username))
+        if not entry or time.time() - entry.get('saved_at', 0) > self.max_age:
+            return []
+        return entry.get('cookies', [])
+
+    def save(self, base_url: str, username: str, cookies: List[Dict]):
+        with self._lock:
+            data = self._read()
+            data[self._key(base_url, username)] = {
+                'saved_at': time.time(),
+                'cookies': [{k: c[k] for k in ('name', 'value', 'path', 'domain') if c.get(k) is not None}
+                            for c in cookies],
+            }
+            self._write(data)
+
+    def forget(self, base_url: str, username: str):
+        with self._lock:
+            data = self._read()
+            if data.pop(self._key(base_url, username), None) is not None:
+                self._write(data)
+
+    # ---- sms_http ------------------------------------------------------
+
+    def save_http(self, session, username: str):
+        self.save(session.base_url, username,
+                  [{'name': c.name, 'value': c.value, 'path': c.path, 'domain': c.domain}
+                   for c in session.cookies])
+
+    def restore_http(self, session, username: str) -> bool:
+        """把保存的 Cookie 放回 sms_http.SmsHttpSession，並以一個 GET（活動頁）驗證是否仍登入"""
+        cookies = self.load(session.base_url, username)
+        if not cookies:
+            return False
+        host = urlsplit(session.base_url).hostname or ''
+        for c in cookies:
+            domain = c.get('domain') or host
+            session.cookies.set_cookie(Cookie(
+                0, c['name'], c['value'], None, False, domain, True, domain.startswith('.'),
+                c.get('path') or '/', True, False, None, False, None, None, {}))
+        try:
+            # 驗證的同時快取活動頁，之後的 create_page() 不必再請求
+            logged_in = session.probe()
+        except OSError:
+            return False
+        if not logged_in:
+            session.cookies.clear()
+            self.forget(session.base_url, username)
+            return False
+        return True
+
+    # ---- Selenium ------------------------------------------------------
+
+    def save_driver(self, driver, username: str, base_url: Optional[str] = None):
+        import upload
+        self.save(base_url or upload.SMS_BASE_URL, username, driver.get_cookies())
+
+    def restore_driver(self, driver, username: str, base_url: Optional[str] = None) -> bool:
+        """
+        把保存的 Cookie 加回瀏覽器，並開啟活動頁驗證（取代整個登入流程）
+
+        瀏覽器只能替目前網域加入 Cookie，因此先開啟一次活動頁（未登入時會被導到登入頁）。
+        """
+        import upload
+        base_url = base_url or upload.SMS_BASE_URL
+        cookies = self.load(base_url, username)
+        if not cookies:
+            return False
+        try:
+            driver.get(f'{base_url}?r={PROBE_ROUTE}')
+            if not _is_login_url(driver.current_url):
+                return True  # 同一個瀏覽器已登入
+            for c in cookies:
+                driver.add_cookie({k: v for k, v in c.items() if k != 'domain'})
+            driver.get(f'{base_url}?r={PROBE_ROUTE}')
+        except Exception:
+            return False
+        if _is_login_url(driver.current_url):
+            self.forget(base_url, username)
+            return False
+        return True
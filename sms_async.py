@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+asyncio HTTP 用戶端：以一組已登入的 Cookie、有上限的 keep-alive 連線池，
+同時抓取所有班級名冊（student-grid AJAX）與活動選項，用於更新 roster_cache / activity_catalog。
+
+- concurrency：同時進行的請求數（亦即連線池上限）
+- rate：每秒最多發出的請求數（0 為不限制），避免對學校伺服器造成壓力
+- controller：rate_control.AimdController；設定時並行數與節奏依回應時間自動調整（最多 concurrency），
+  rate 仍是每秒請求數的上限。請求依種類記為 grid（學生表格 AJAX）、submit（POST）、page（其他頁面）
+
+用法：
+  python sms_async.py                       # 更新名冊快取與活動索引
+  python sms_async.py --concurrency 4 --rate 10 --fixed   # 固定並行數與速率，不自動調整
+
+只使用標準函式庫（asyncio streams），解析沿用 sms_http.parse_page。
+"""
+import argparse
+import asyncio
+import os
+import time
+from http.cookies import SimpleCookie
+from typing import Optional, Dict, List, Tuple
+from urllib.parse import urlencode, urljoin, urlsplit
+
+import sms_http
+from rate_control import AimdController
+from roster_cache import class_short_of
+
+
+DEFAULT_CONCURRENCY = 6
+DEFAULT_RATE = 20.0
+
+
+class AsyncSmsClient:
+    """共用 Cookie 與 keep-alive 連線池的 SMS 非同步用戶端"""
+
+    def __init__(self, base_url: str = sms_http.SMS_INDEX, concurrency: int = DEFAULT_CONCURRENCY,
+                 rate: float = DEFAULT_RATE, timeout: float = 15, controller: Optional[AimdController] = None):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.rate = rate
+        self.controller = controller
+        self.cookies: Dict[str, str] = {}
+        self.requests = 0
+        self.connections = 0
+        parts = urlsplit(base_url)
+        self._host = parts.hostname
+        self._port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self._ssl = parts.scheme == 'https'
+        self._slots = asyncio.Semaphore(concurrency)
+        self._idle: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+        self._rate_lock = asyncio.Lock()
+        self._next_start = 0.0
+
+    @classmethod
+    def from_session(cls, session: sms_http.SmsHttpSession, **kwargs) -> 'AsyncSmsClient':
+        """沿用 sms_http.SmsHttpSession 已登入的 Cookie"""
+        client = cls(session.base_url, **kwargs)
+        client.cookies = {c.name: c.value for c in session.cookies}
+        return client
+
+    def url(self, route: str, **params) -> str:
+        query = [('r', route)] + [(k, v) for k, v in params.items() if v is not None]
+        return f'{self.base_url}?{urlencode(query)}'
+
+    async def close(self):
+        idle, self._idle = self._idle, []
+        for _, writer in idle:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    # ---- 連線與請求 ----------------------------------------------------
+
+    async def _throttle(self):
+        if self.rate <= 0:
+            return
+        async with self._rate_lock:
+            now = time.monotonic()
+            wait = self._next_start - now
+            self._next_start = max(now, self._next_start) + 1.0 / self.rate
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    async def _connect(self, fresh: bool = False):
+        if self._idle and not fresh:
+            return self._idle.pop()
+        self.connections += 1
+        return await asyncio.open_connection(self._host, self._port, ssl=self._ssl or None)
+
+    async def _read_response(self, reader: asyncio.StreamReader) -> Tuple[int, List[Tuple[str, str]], bytes, bool]:
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError('連線已被伺服器關閉')
+        version, status = status_line.decode('latin-1').split()[:2]
+        headers = []
+        while True:
+            line = (await reader.readline()).decode('latin-1').rstrip('\r\n')
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            headers.append((name.strip().lower(), value.strip()))
+        h = dict(headers)
+        if h.get('transfer-encoding', '').lower() == 'chunked':
+            body = bytearray()
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    await reader.readline()
+                    break
+                body += await reader.readexactly(size)
+                await reader.readline()
+            body = bytes(body)
+        elif 'content-length' in h:
+            body = await reader.readexactly(int(h['content-length']))
+        else:
+            body = await reader.read()
+            return int(status), headers, body, False
+        keep_alive = (h.get('connection', '').lower() != 'close'
+                      and (version != 'HTTP/1.0' or h.get('connection', '').lower() == 'keep-alive'))
+        return int(status), headers, body, keep_alive
+
+    async def request(self, method: str, url: str, fields: Optional[List[Tuple[str, str]]] = None,
+                      ajax: bool = False) -> Tuple[int, Dict[str, str], str]:
+        """發出一個請求（不自動跟隨重導），返回 (狀態碼, 標頭, 內容)"""
+        parts = urlsplit(url)
+        path = parts.path + (f'?{parts.query}' if parts.query else '')
+        body = urlencode(fields or []).encode('utf-8') if method == 'POST' else b''
+        lines = [f'{method} {path} HTTP/1.1', f'Host: {parts.netloc}',
+                 'User-Agent: Mozilla/5.0 (uploadSMS)', 'Connection: keep-alive']
+        if self.cookies:
+            lines.append('Cookie: ' + '; '.join(f'{k}={v}' for k, v in self.cookies.items()))
+        if ajax:
+            lines.append('X-Requested-With: XMLHttpRequest')
+        if method == 'POST':
+            lines += ['Content-Type: application/x-www-form-urlencoded', f'Content-Length: {len(body)}']
+        raw = ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body
+
+        if self.controller is None:
+            async with self._slots:
+                await self._throttle()
+                return self._finish(*await self._send(raw))
+        op = 'submit' if method == 'POST' else 'grid' if ajax else 'page'
+        async with self.controller.slot(op) as slot, self._slots:
+            await self._throttle()
+            status, headers, data = await self._send(raw)
+            if status >= 500 or status == 429:
+                slot.fail(f'HTTP {status}')
+        return self._finish(status, headers, data)
+
+    async def _send(self, raw: bytes) -> Tuple[int, List[Tuple[str, str]], bytes]:
+        for attempt in (1, 2):
+            reader, writer = await self._connect(fresh=attempt > 1)
+            try:
+                writer.write(raw)
+                await writer.drain()
+                status, headers, data, keep_alive = await asyncio.wait_for(
+                    self._read_response(reader), self.timeout)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                # 閒置的 keep-alive 連線可能已被伺服器關閉，換新連線重送一次
+                writer.close()
+                if attempt == 2:
+                    raise
+                continue
+            except BaseException:
+                writer.close()
+                raise
+            break
+        if keep_alive:
+            self._idle.append((reader, writer))
+        else:
+            writer.close()
+        return status, headers, data
+
+    def _finish(self, status: int, headers: List[Tuple[str, str]], data: bytes) -> Tuple[int, Dict[str, str], str]:
+        self.requests += 1
+        for name, value in headers:
+            if name == 'set-cookie':
+                for morsel in SimpleCookie(value).values():
+                    self.cookies[morsel.key] = morsel.value
+        return status, dict(headers), data.decode('utf-8', errors='replace')
+
+    async def get(self, url: str, ajax: bool = False, follow: int = 5) -> Tuple[str, str]:
+        """GET 並跟隨重導，返回 (最終網址, HTML)"""
+        for _ in range(follow + 1):
+            status, headers, html = await self.request('GET', url, ajax=ajax)
+            if status not in (301, 302, 303, 307) or 'location' not in headers:
+                return url, html
+            url = urljoin(url, headers['location'])
+        return url, html
+
+    # ---- SMS -----------------------------------------------------------
+
+    async def login(self, username: str, password: str) -> bool:
+        login_url = self.url(sms_http.LOGIN_ROUTE)
+        _, html = await self.get(login_url)
+        page = sms_http.parse_page(html)
+        fields = page.fields.get('login-form') or next(iter(page.fields.values()), [])
+        data = [(n, v) for n, v in fields
+                if v is not None and n not in ('LoginForm[username]', 'LoginForm[password]')]
+        data += [('LoginForm[username]', username), ('LoginForm[password]', password)]
+        status, headers, _ = await self.request('POST', login_url, data)
+        return status in (301, 302, 303) and 'login' not in headers.get('location', '').lower()
+
+    async def create_page(self):
+        _, html = await self.get(self.url(sms_http.CREATE_ROUTE))
+        return sms_http.parse_page(html)
+
+    async def fetch_class_students(self, class_value: str, item_id: str) -> Dict[str, Dict]:
+        """同 sms_http.SmsHttpSession.fetch_class_students"""
+        url = self.url(sms_http.CREATE_ROUTE, **{
+            'StudentPerformanceM[class_id]': class_value,
+            'StudentPerformanceM[item_id]': item_id,
+            'ajax': 'student-grid',
+        })
+        _, html = await self.get(url, ajax=True)
+        return {s.get('student_no', '').strip(): s for s in sms_http.parse_page(html).student_links}
+
+    async def crawl(self, item_id: Optional[str] = None) -> Tuple[List[Tuple[str, str]], List[Tuple[str, str]],
+                                                                   Dict[str, Dict[str, Dict]], str]:
+        """
+        一次讀取活動頁，之後同時抓取全部班級
+
+        Returns:
+            (活動選項, 班級選項, {班級簡寫: {學號: data-*}}, 使用的 item_id)
+        """
+        page = await self.create_page()
+        activities = page.selects.get('StudentPerformanceM_item_id', [])
+        classes = [(v, t) for v, t in page.selects.get('class_id', []) if v]
+        if item_id is None:
+            item_id = next((v for v, _ in activities if v), '')
+        results = await asyncio.gather(*(self.fetch_class_students(v, item_id) for v, _ in classes))
+        rosters = {class_short_of(label): students for (_, label), students in zip(classes, results)}
+        return activities, classes, rosters, item_id
+
+
+async def refresh_caches(client: AsyncSmsClient, roster=None, catalog=None, item_id: Optional[str] = None) -> Dict:
+    """以 crawl() 的結果更新 roster_cache.RosterCache 與 activity_catalog.ActivityCatalog"""
+    started = time.perf_counter()
+    activities, classes, rosters, item_id = await client.crawl(item_id)
+    if catalog is not None and activities:
+        catalog.update(activities)
+    if roster is not None:
+        roster.put_classes(classes)
+        for class_short, students in rosters.items():
+            first = next(iter(students.values()), {})
+            roster.put_roster(class_short, {
+                no: (s.get('student_name', ''), s.get('student_cname', ''), s.get('student_id', ''))
+                for no, s in students.items() if no
+            }, (item_id, first.get('mark_item', '')))
+    return {
+        'activities': len(activities),
+        'classes': len(classes),
+        'students': sum(len(s) for s in rosters.values()),
+        'requests': client.requests,
+        'connections': client.connections,
+        'seconds': round(time.perf_counter() - started, 2),
+    }
+
+
+async def _main(args):
+    from activity_catalog import ActivityCatalog
+    from roster_cache import RosterCache
+
+    controller = None if args.fixed else AimdController(max_limit=args.concurrency)
+    async with AsyncSmsClient(args.base_url, args.concurrency, args.rate, controller=controller) as client:
+        if not await client.login(os.getenv('SMS_USERNAME', 'schhs334'), os.getenv('SMS_PASSWORD', 'schhs334')):
+            print('✗ 登入失敗')
+            return
+        roster = RosterCache()
+        try:
+            stats = await refresh_caches(client, roster, ActivityCatalog())
+        finally:
+            roster.close()
+    print(f"✓ {stats['classes']} 個班級、{stats['students']} 位學生、{stats['activities']} 個活動，"
+          f"{stats['requests']} 個請求 / {stats['connections']} 條連線，{stats['seconds']} 秒")
+    if controller is not None:
+        for line in controller.summary():
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='同時抓取全部班級名冊與活動選項')
+    parser.add_argument('--base-url', default=sms_http.SMS_INDEX)
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE, help='每秒請求數上限（0 為不限制）')
+    parser.add_argument('--fixed', action='store_true', help='固定並行數與速率，不依回應時間自動調整')
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SMS 流量錄製與重播：把真實伺服器的頁面、AJAX 表格（changeGridStudentList）與表單 POST
+連同回應時間錄成封存檔，之後以重播伺服器原樣（或按比例調整延遲）回放，作為可重現的離線量測資料。
+
+錄製：本機反向代理，把請求轉送到真實 SMS 並記錄
+- 請求：方法、路徑與查詢字串、表單欄位；回應：狀態碼、必要標頭、內容、耗時
+- 清理：不保存 Cookie / Set-Cookie；帳號、密碼與 CSRF token 改為 ***；
+  內容中的伺服器網址改為相對路徑；學生英文名 / 中文名預設以雜湊代號取代（--keep-names 保留）
+- 封存檔為 gzip 壓縮的 JSON Lines（第一行為標頭）
+
+重播：依「方法 + 路徑 + 查詢字串 + 表單欄位（略過帳號密碼等）」比對，同一請求依錄製順序回放，
+用完後重複最後一個；完全比對不到時退回只比對方法 + 路徑 + 路由 r。每個回應依錄製的耗時 × scale 延遲。
+
+用法：
+  SMS_CAPTURE=captures/run.jsonl.gz python upload.py        # 一次上傳同時錄製
+  python sms_capture.py record --out captures/run.jsonl.gz  # 常駐代理，SMS_BASE_URL 指向它
+  python sms_capture.py replay captures/run.jsonl.gz --scale 0.5 --port 8771
+  python sms_capture.py show captures/run.jsonl.gz
+  python bench_upload.py --replay captures/run.jsonl.gz --excel Upload.xlsx --backend http
+"""
+import argparse
+import base64
+import gzip
+import hashlib
+import html
+import http.client
+import json
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Dict, List, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+
+FORMAT_VERSION = 1
+CAPTURE_DIR = os.path.join(os.path.dirname(__file__), 'captures')
+DEFAULT_RECORD_PORT = 8770
+DEFAULT_REPLAY_PORT = 8771
+
+HOP_HEADERS = {'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization', 'te', 'trailers',
+               'transfer-encoding', 'upgrade', 'content-length'}
+KEPT_HEADERS = {'content-type', 'location', 'cache-control', 'expires', 'last-modified'}
+SENSITIVE_RE = re.compile(r'password|username|csrf|token', re.I)
+VOLATILE_QUERY = {'_'}  # jQuery cache: false 加上的時間戳
+NAME_ATTR_RE = re.compile(r'data-student_c?name="([^"]*)"')
+NAME_FIELD_RE = re.compile(r'\[student_c?name\]$')
+CSRF_INPUT_RE = re.compile(r'(<input[^>]*name="[^"]*(?:csrf|token)[^"]*"[^>]*value=")[^"]*', re.I)
+SUBMITTED_RE = re.compile(r'\[inputperformance\]\[([^\]]+)\]')
+TEXT_TYPES = ('text/', 'json', 'javascript', 'xml')
+
+
+def sanitize_form(pairs: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    return [(k, '***' if SENSITIVE_RE.search(k) else v) for k, v in pairs]
+
+
+def request_key(method: str, path: str, form: List[Tuple[str, str]]) -> str:
+    """重播比對用的鍵：略過時間戳查詢參數與帳號、密碼、CSRF token"""
+    parts = urlsplit(path)
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k not in VOLATILE_QUERY)
+    fields = sorted((k, v) for k, v in form if not SENSITIVE_RE.search(k))
+    return f'{method} {parts.path}?{urlencode(query)}#{urlencode(fields)}'
+
+
+def loose_key(method: str, path: str) -> str:
+    parts = urlsplit(path)
+    route = dict(parse_qsl(parts.query)).get('r', '')
+    return f'{method} {parts.path}?r={route}'
+
+
+def is_text(content_type: str) -> bool:
+    return any(t in (content_type or '').lower() for t in TEXT_TYPES)
+
+
+def pseudonym(name: str, cjk: bool) -> str:
+    digest = hashlib.sha1(name.encode('utf-8')).hexdigest()[:6].upper()
+    return f'學生{digest}' if cjk else f'STUDENT {digest}'
+
+
+# ---- 錄製 --------------------------------------------------------------
+
+class Capture:
+    """錄製中的請求（存在記憶體，save() 時清理並寫出）"""
+
+    def __init__(self, path: str, upstream: str, anonymize: bool = True):
+        self.path = path
+        self.upstream = upstream
+        self.anonymize = anonymize
+        self.entries: List[Dict] = []
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    @property
+    def count(self) -> int:
+        return len(self.entries)
+
+    def add(self, method: str, path: str, form: List[Tuple[str, str]], status: int,
+            headers: List[Tuple[str, str]], body: bytes, seconds: float):
+        content_type = next((v for k, v in headers if k.lower() == 'content-type'), '')
+        entry = {
+            'method': method, 'path': path, 'form': sanitize_form(form),
+            'status': status,
+            'headers': [(k, v) for k, v in headers if k.lower() in KEPT_HEADERS],
+            'seconds': round(seconds, 4),
+        }
+        if is_text(content_type):
+            entry['body'] = CSRF_INPUT_RE.sub(r'\1***', body.decode('utf-8', errors='replace'))
+        else:
+            entry['body_b64'] = base64.b64encode(body).decode('ascii')
+        with self._lock:
+            entry['seq'] = len(self.entries)
+            entry['t'] = round(time.time() - self.started, 4)
+            self.entries.append(entry)
+
+    def _name_map(self) -> Dict[str, str]:
+        names = set()
+        for e in self.entries:
+            names.update(html.unescape(n) for n in NAME_ATTR_RE.findall(e.get('body', '')))
+            names.update(v for k, v in e['form'] if NAME_FIELD_RE.search(k))
+        cjk = re.compile(r'[㐀-鿿]')
+        return {n: pseudonym(n, bool(cjk.search(n))) for n in names if n.strip()}
+
+    def save(self) -> str:
+        with self._lock:
+            entries = [dict(e) for e in self.entries]
+        if self.anonymize:
+            mapping = self._name_map()
+            # 長的名字先取代，避免部分重疊
+            order = sorted(mapping, key=len, reverse=True)
+            for e in entries:
+                if 'body' in e:
+                    for name in order:
+                        e['body'] = e['body'].replace(name, mapping[name]).replace(
+                            html.escape(name), mapping[name])
+                e['form'] = [(k, mapping.get(v, v)) for k, v in e['form']]
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        header = {'version': FORMAT_VERSION, 'created': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.started)),
+                  'index_path': urlsplit(self.upstream).path, 'requests': len(entries), 'anonymized': self.anonymize}
+        with gzip.open(self.path, 'wt', encoding='utf-8') as f:
+            f.write(json.dumps(header, ensure_ascii=False) + '\n')
+            for e in entries:
+                f.write(json.dumps(e, ensure_ascii=False) + '\n')
+        return self.path
+
+
+class RecordingHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _upstream(self) -> http.client.HTTPConnection:
+        # 每個連線（執行緒）沿用一條到上游的 keep-alive 連線
+        conn = getattr(self, '_conn', None)
+        if conn is None:
+            up = urlsplit(self.server.upstream)
+            cls = http.client.HTTPSConnection if up.scheme == 'https' else http.client.HTTPConnection
+            conn = self._conn = cls(up.netloc, timeout=60)
+        return conn
+
+    def _forward(self, method: str):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        headers = {k: v for k, v in self.headers.items() if k.lower() not in HOP_HEADERS | {'host', 'accept-encoding'}}
+        headers['Accept-Encoding'] = 'identity'
+        started = time.perf_counter()
+        for attempt in (1, 2):
+            conn = self._upstream()
+            try:
+                conn.request(method, self.path, body, headers)
+                resp = conn.getresponse()
+                data = resp.read()
+                break
+            except (ConnectionError, http.client.HTTPException):
+                conn.close()
+                self._conn = None
+                if attempt == 2:
+                    self.send_error(502)
+                    return
+        seconds = time.perf_counter() - started
+
+        origin = self.server.upstream_origin
+        out_headers = []
+        for k, v in resp.getheaders():
+            lk = k.lower()
+            if lk in HOP_HEADERS:
+                continue
+            if lk == 'location':
+                v = v.replace(origin, '')
+            elif lk == 'set-cookie':
+                v = re.sub(r';\s*domain=[^;]*', '', v, flags=re.I)
+            out_headers.append((k, v))
+        content_type = resp.getheader('Content-Type', '')
+        if is_text(content_type):
+            data = data.replace(origin.encode('utf-8'), b'')
+
+        self.send_response(resp.status)
+        for k, v in out_headers:
+            self.send_header(k, v)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        if method != 'HEAD':
+            self.wfile.write(data)
+
+        form = []
+        if body and 'x-www-form-urlencoded' in self.headers.get('Content-Type', ''):
+            form = parse_qsl(body.decode('utf-8', errors='replace'), keep_blank_values=True)
+        self.server.capture.add(method, self.path, form, resp.status, out_headers, data, seconds)
+
+    def do_GET(self):
+        self._forward('GET')
+
+    def do_POST(self):
+        self._forward('POST')
+
+    def do_HEAD(self):
+        self._forward('HEAD')
+
+
+def start_recorder(path: str, upstream_base_url: str, anonymize: bool = True,
+                   host: str = '127.0.0.1', port: int = 0) -> ThreadingHTTPServer:
+    """
+    在背景執行緒啟動錄製代理，返回 server：
+    server.base_url 為經代理的 index.php 網址，server.capture.save() 寫出封存檔
+    """
+    up = urlsplit(upstream_base_url)
+    server = ThreadingHTTPServer((host, port), RecordingHandler)
+    server.daemon_threads = True
+    server.upstream = upstream_base_url
+    server.upstream_origin = f'{up.scheme}://{up.netloc}'
+    server.capture = Capture(path, upstream_base_url, anonymize)
+    server.base_url = f'http://{host}:{server.server_address[1]}{up.path}'
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ---- 重播 --------------------------------------------------------------
+
+def load_archive(path: str) -> Tuple[Dict, List[Dict]]:
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        header = json.loads(f.readline())
+        entries = [json.loads(line) for line in f if line.strip()]
+    if header.get('version') != FORMAT_VERSION:
+        raise ValueError(f'不支援的封存格式版本: {header.get("version")}')
+    return header, entries
+
+
+class Replay:
+    """依請求鍵依序取出錄製的回應"""
+
+    def __init__(self, entries: List[Dict]):
+        self._exact: Dict[str, List[Dict]] = defaultdict(list)
+        self._loose: Dict[str, List[Dict]] = defaultdict(list)
+        for e in entries:
+            form = [tuple(p) for p in e['form']]
+            self._exact[request_key(e['method'], e['path'], form)].append(e)
+            self._loose[loose_key(e['method'], e['path'])].append(e)
+        self._next: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+        self.stats = {'served': 0, 'exact': 0, 'loose': 0, 'missing': 0, 'posts': 0}
+        self.submitted = set()   # 表單中出現過的學生內部 ID
+
+    def _take(self, table: Dict[str, List[Dict]], key: str) -> Optional[Dict]:
+        candidates = table.get(key)
+        if not candidates:
+            return None
+        i = self._next[key]
+        self._next[key] = i + 1
+        return candidates[min(i, len(candidates) - 1)]
+
+    def lookup(self, method: str, path: str, form: List[Tuple[str, str]]) -> Optional[Dict]:
+        with self._lock:
+            for k, _ in form:
+                m = SUBMITTED_RE.search(k)
+                if m:
+                    self.submitted.add(m.group(1))
+            entry = self._take(self._exact, request_key(method, path, form))
+            kind = 'exact'
+            if entry is None:
+                entry = self._take(self._loose, loose_key(method, path))
+                kind = 'loose'
+            if entry is None:
+                self.stats['missing'] += 1
+                return None
+            self.stats['served'] += 1
+            self.stats[kind] += 1
+            if method == 'POST':
+                self.stats['posts'] += 1
+            return entry
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _serve(self, method: str):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        form = parse_qsl(body.decode('utf-8', errors='replace'), keep_blank_values=True) if body else []
+        entry = self.server.replay.lookup(method, self.path, form)
+        if entry is None:
+            data = f'重播封存中沒有 {method} {self.path}'.encode('utf-8')
+            self.send_response(404)
+            self.send_header('Content-Type', 'text/plain; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        if self.server.scale > 0:
+            time.sleep(entry['seconds'] * self.server.scale)
+        data = entry['body'].encode('utf-8') if 'body' in entry else base64.b64decode(entry.get('body_b64', ''))
+        self.send_response(entry['status'])
+        for k, v in entry['headers']:
+            self.send_header(k, v)
+        # 錄製時不保存 Cookie；重播給一個固定的 Session
+        self.send_header('Set-Cookie', 'PHPSESSID=replay; path=/')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        if method != 'HEAD':
+            self.wfile.write(data)
+
+    def do_GET(self):
+        self._serve('GET')
+
+    def do_POST(self):
+        self._serve('POST')
+
+    def do_HEAD(self):
+        self._serve('HEAD')
+
+
+def start_replay(path: str, scale: float = 1.0, host: str = '127.0.0.1', port: int = 0) -> ThreadingHTTPServer:
+    """
+    在背景執行緒啟動重播伺服器，返回 server：
+    server.base_url 為 index.php 網址，server.replay.stats 為命中統計
+    """
+    header, entries = load_archive(path)
+    server = ThreadingHTTPServer((host, port), ReplayHandler)
+    server.daemon_threads = True
+    server.header = header
+    server.replay = Replay(entries)
+    server.scale = scale
+    server.base_url = f'http://{host}:{server.server_address[1]}{header.get("index_path") or "/sms/index.php"}'
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ---- CLI ---------------------------------------------------------------
+
+def show(path: str):
+    header, entries = load_archive(path)
+    print(f"✓ {path}: {header['requests']} 個請求，錄製於 {header['created']}"
+          f"{'（已匿名化）' if header.get('anonymized') else ''}")
+    by_route = defaultdict(list)
+    for e in entries:
+        by_route[loose_key(e['method'], e['path'])].append(e['seconds'])
+    for route, times in sorted(by_route.items(), key=lambda kv: -sum(kv[1])):
+        times.sort()
+        print(f'  {len(times):>4} × {route:<60} p50 {times[len(times) // 2]:.3f}s  max {times[-1]:.3f}s')
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='SMS 流量錄製與重播')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_rec = sub.add_parser('record', help='啟動錄製代理')
+    p_rec.add_argument('--out', default=os.path.join(CAPTURE_DIR, time.strftime('sms-%Y%m%d-%H%M%S.jsonl.gz')))
+    p_rec.add_argument('--upstream', default=os.getenv('SMS_BASE_URL', 'http://sms.chhsban.edu.my/sms/index.php'))
+    p_rec.add_argument('--port', type=int, default=DEFAULT_RECORD_PORT)
+    p_rec.add_argument('--keep-names', action='store_true', help='保留學生真實姓名（預設以雜湊代號取代）')
+    p_play = sub.add_parser('replay', help='啟動重播伺服器')
+    p_play.add_argument('archive')
+    p_play.add_argument('--scale', type=float, default=1.0, help='延遲倍數（0 為不延遲）')
+    p_play.add_argument('--port', type=int, default=DEFAULT_REPLAY_PORT)
+    p_show = sub.add_parser('show', help='列出封存檔內容')
+    p_show.add_argument('archive')
+    args = parser.parse_args(argv)
+
+    if args.command == 'show':
+        show(args.archive)
+        return
+    if args.command == 'record':
+        if args.keep_names:
+            print('⚠ --keep-names：封存檔會保留學生真實姓名，請勿分享')
+        server = start_recorder(args.out, args.upstream, not args.keep_names, port=args.port)
+        print(f'✓ 錄製代理已啟動，請設定 SMS_BASE_URL={server.base_url}，Ctrl+C 結束並存檔')
+    else:
+        server = start_replay(args.archive, args.scale, port=args.port)
+        print(f"✓ 重播 {server.header['requests']} 個請求（延遲 ×{args.scale}）: {server.base_url}?r=site/login")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        if args.command == 'record':
+            print(f'✓ 已記錄 {server.capture.count} 個請求 → {server.capture.save()}')
+        else:
+            print(f'  {server.replay.stats}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+無瀏覽器 HTTP 上傳後端：
+1. 以持久 Session 登入 SMS（LoginForm_username / LoginForm_password）
+2. 讀取活動頁面，解析 StudentPerformanceM_item_id 選項取得活動 value
+3. 透過 student-grid 的 AJAX 網址取得各班學生（data-student_id 等屬性）
+4. 直接 POST StudentPerformanceM[inputperformance][<內部 ID>][type_of_bonus|remark]
+
+用法：
+  $env:SMS_BACKEND = "http"; python upload.py
+
+只使用標準函式庫，不需要 Chrome 與 Selenium。
+"""
+import os
+import re
+import time
+from html.parser import HTMLParser
+from http.cookiejar import CookieJar
+from typing import Optional, Dict, List, Tuple
+from urllib.parse import urlencode
+from urllib.request import build_opener, HTTPCookieProcessor, Request
+
+from class_resolver import ClassResolver
+from upload_jobs import UploadJob
+
+
+SMS_INDEX = os.getenv('SMS_BASE_URL', "http://sms.chhsban.edu.my/sms/index.php")
+LOGIN_ROUTE = "site/login"
+CREATE_ROUTE = "transaction/studentPerformance/create"
+DELETE_ROUTE = "transaction/studentPerformance/delete"
+
+# 「校外學藝」
+DEFAULT_BONUS_TYPE = "1"
+
+
+class _PageParser(HTMLParser):
+    """收集頁面中的 <select> 選項、表單欄位、addToEkstra 按鈕屬性與既有紀錄（delValue）列"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.selects = {}        # select id/name -> [(value, text), ...]
+        self.fields = {}         # form id -> [(name, value), ...]
+        self.student_links = []  # [{data-*: value}, ...]
+        self.records = []        # 既有紀錄 [{id, student_id, student_no, ...}, ...]
+        self._row_cells = None
+        self._cell_text = None
+        self._row_del = None
+        self._form_id = None
+        self._select_key = None
+        self._option_value = None
+        self._option_text = []
+        self._textarea_name = None
+        self._textarea_text = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'form':
+            self._form_id = attrs.get('id') or ''
+            self.fields.setdefault(self._form_id, [])
+        elif tag == 'select':
+            self._select_key = attrs.get('id') or attrs.get('name')
+            self.selects.setdefault(self._select_key, [])
+            if self._form_id is not None and attrs.get('name'):
+                self.fields[self._form_id].append((attrs['name'], None))
+        elif tag == 'option' and self._select_key is not None:
+            self._option_value = attrs.get('value', '')
+            self._option_text = []
+        elif tag == 'input' and self._form_id is not None:
+            name = attrs.get('name')
+            if name and attrs.get('type', 'text') not in ('radio', 'checkbox', 'submit', 'button'):
+                self.fields[self._form_id].append((name, attrs.get('value') or ''))
+        elif tag == 'textarea' and self._form_id is not None:
+            self._textarea_name = attrs.get('name')
+            self._textarea_text = []
+        elif tag == 'a' and 'addToEkstra' in (attrs.get('onclick') or ''):
+            self.student_links.append(
+                {k[5:]: (v or '') for k, v in attrs.items() if k.startswith('data-')}
+            )
+        elif tag == 'a' and self._row_cells is not None:
+            m = re.search(r'delValue\(\s*(\w+)\s*,\s*(\w+)\s*\)', attrs.get('onclick') or '')
+            if m:
+                self._row_del = m.groups()
+        elif tag == 'tr':
+            self._row_cells, self._row_del = [], None
+        elif tag == 'td' and self._row_cells is not None:
+            self._cell_text = []
+
+    def handle_endtag(self, tag):
+        if tag == 'td' and self._cell_text is not None:
+            self._row_cells.append(' '.join(''.join(self._cell_text).split()))
+            self._cell_text = None
+        elif tag == 'tr' and self._row_cells is not None:
+            if self._row_del and len(self._row_cells) >= 7:
+                cells = self._row_cells
+                self.records.append({
+                    'id': self._row_del[0], 'student_id': self._row_del[1], 'student_no': cells[0],
+                    'student_name': cells[1], 'student_cname': cells[2], 'class_name': cells[3],
+                    'type_of_bonus': cells[4], 'remark': cells[5], 'mark': cells[6],
+                })
+            self._row_cells = None
+        elif tag == 'form':
+            self._form_id = None
+        elif tag == 'select':
+            self._flush_option()
+            self._select_key = None
+        elif tag == 'option':
+            self._flush_option()
+        elif tag == 'textarea' and self._textarea_name:
+            self.fields[self._form_id].append((self._textarea_name, ''.join(self._textarea_text)))
+            self._textarea_name = None
+
+    def handle_data(self, data):
+        if self._option_value is not None:
+            self._option_text.append(data)
+        elif self._textarea_name:
+            self._textarea_text.append(data)
+        elif self._cell_text is not None:
+            self._cell_text.append(data)
+
+    def _flush_option(self):
+        if self._option_value is not None:
+            text = ''.join(self._option_text).strip()
+            self.selects[self._select_key].append((self._option_value, text))
+            self._option_value = None
+
+
+def parse_page(html: str) -> _PageParser:
+    """解析 HTML，返回收集結果"""
+    parser = _PageParser()
+    parser.feed(html)
+    parser.close()
+    return parser
+
+
+def match_activity_option(options: List[Tuple[str, str]], activity_code: str) -> Optional[Tuple[str, str]]:
+    """以活動代碼前綴匹配 StudentPerformanceM_item_id 選項"""
+    for value, text in options:
+        if value and text.startswith(activity_code):
+            return value, text
+    return None
+
+
+class SmsHttpSession:
+    """持久化 Cookie 的 SMS HTTP 連線"""
+
+    def __init__(self, base_url: str = SMS_INDEX, timeout: float = 15):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.cookies = CookieJar()
+        self.opener = build_opener(HTTPCookieProcessor(self.cookies))
+        self.opener.addheaders = [('User-Agent', 'Mozilla/5.0 (uploadSMS)')]
+        self._create_page = None
+
+    def url(self, route: str, **params) -> str:
+        query = [('r', route)] + [(k, v) for k, v in params.items() if v is not None]
+        return f'{self.base_url}?{urlencode(query)}'
+
+    def get(self, url: str, ajax: bool = False) -> Tuple[str, str]:
+        """GET，返回 (最終網址, HTML)"""
+        req = Request(url)
+        if ajax:
+            req.add_header('X-Requested-With', 'XMLHttpRequest')
+        with self.opener.open(req, timeout=self.timeout) as resp:
+            return resp.geturl(), resp.read().decode('utf-8', errors='replace')
+
+    def post(self, url: str, fields: List[Tuple[str, str]], ajax: bool = False) -> Tuple[str, str]:
+        """POST 表單，返回 (最終網址, HTML)"""
+        body = urlencode(fields).encode('utf-8')
+        req = Request(url, data=body)
+        req.add_header('Content-Type', 'application/x-www-form-urlencoded')
+        if ajax:
+            req.add_header('X-Requested-With', 'XMLHttpRequest')
+        with self.opener.open(req, timeout=self.timeout) as resp:
+            return resp.geturl(), resp.read().decode('utf-8', errors='replace')
+
+    def login(self, username: str, password: str) -> bool:
+        """登入 SMS"""
+        login_url = self.url(LOGIN_ROUTE)
+        _, html = self.get(login_url)
+        page = parse_page(html)
+        fields = page.fields.get('login-form') or next(iter(page.fields.values()), [])
+        data = [(n, v) for n, v in fields
+                if v is not None and n not in ('LoginForm[username]', 'LoginForm[password]')]
+        data += [('LoginForm[username]', username), ('LoginForm[password]', password)]
+        final_url, _ = self.post(login_url, data)
+        return 'login' not in final_url.lower()
+
+    def create_page(self, refresh: bool = False) -> _PageParser:
+        """讀取（並快取）活動新增頁面"""
+        if self._create_page is None or refresh:
+            self.probe()
+        return self._create_page
+
+    def probe(self) -> bool:
+        """讀取活動新增頁面並快取；返回是否仍為登入狀態（未被導回登入頁）"""
+        final_url, html = self.get(self.url(CREATE_ROUTE))
+        self._create_page = parse_page(html)
+        return 'login' not in final_url.lower()
+
+    def activity_options(self) -> List[Tuple[str, str]]:
+        return self.create_page().selects.get('StudentPerformanceM_item_id', [])
+
+    def class_options(self) -> List[Tuple[str, str]]:
+        return self.create_page().selects.get('class_id', [])
+
+    def resolve_activity(self, activity_code: str) -> Optional[Tuple[str, str]]:
+        """返回 (item_id, 活動全名)"""
+        return match_activity_option(self.activity_options(), activity_code)
+
+    def fetch_class_students(self, class_value: str, item_id: str) -> Dict[str, Dict]:
+        """透過 student-grid AJAX 取得整班學生，返回 {學號: data-* 屬性}"""
+        url = self.url(CREATE_ROUTE, **{
+            'StudentPerformanceM[class_id]': class_value,
+            'StudentPerformanceM[item_id]': item_id,
+            'ajax': 'student-grid',
+        })
+        _, html = self.get(url, ajax=True)
+        return {s.get('student_no', '').strip(): s for s in parse_page(html).student_links}
+
+    def fetch_existing_records(self, date_str: str, item_id: str) -> List[Dict]:
+        """透過 student-performance-m-grid AJAX 取得此日期 + 活動在 SMS 上已有的紀錄"""
+        url = self.url(CREATE_ROUTE, **{
+            'StudentPerformanceM[date]': date_str,
+            'StudentPerformanceM[item_id]': item_id,
+            'ajax': 'student-performance-m-grid',
+        })
+        _, html = self.get(url, ajax=True)
+        return parse_page(html).records
+
+    def delete_record(self, record_id: str) -> bool:
+        """刪除一筆既有紀錄（與頁面 delValue() 相同的 AJAX POST）"""
+        final_url, _ = self.post(self.url(DELETE_ROUTE, id=record_id), [], ajax=True)
+        return 'login' not in final_url.lower()
+
+    def submit_performance(self, date_str: str, item_id: str, entries: List[Dict]) -> Tuple[bool, str]:
+        """
+        POST 活動表單
+
+        Args:
+            entries: [{'student_id', 'class_id', 'mark', 'type_of_bonus', 'remark'}, ...]
+
+        Returns:
+            (是否成功, 最終網址)
+        """
+        form = self.create_page().fields.get('student-performance-m-form', [])
+        data = [(n, v) for n, v in form
+                if v is not None and n not in ('StudentPerformanceM[date]', 'StudentPerformanceM[item_id]')
+                and not n.startswith('StudentPerformanceM[inputperformance]')]
+        data += [('StudentPerformanceM[date]', date_str), ('StudentPerformanceM[item_id]', item_id)]
+        for e in entries:
+            prefix = f"StudentPerformanceM[inputperformance][{e['student_id']}]"
+            data += [
+                (f'{prefix}[class_id]', e.get('class_id', '')),
+                (f'{prefix}[type_of_bonus]', e.get('type_of_bonus', DEFAULT_BONUS_TYPE)),
+                (f'{prefix}[remark]', e.get('remark', '')),
+                (f'{prefix}[mark]', e.get('mark', '0.00')),
+            ]
+        data.append(('yt1', ''))
+        final_url, html = self.post(self.url(CREATE_ROUTE), data)
+        ok = 'errorSummary' not in html and not re.search(r'class="[^"]*\berror\b', html)
+        return ok, final_url
+
+
+def build_entries(session: SmsHttpSession, item_id: str, students_by_class: Dict[str, List[Tuple[int, str]]],
+                  remarks: Dict[str, str], bonus_type: str = DEFAULT_BONUS_TYPE, roster=None,
+                  stats: Optional[Dict] = None) -> List[Dict]:
+    """
+    逐班級取得學生內部 ID，返回 submit_performance 的 entries（stats 的 found / missing 會累加）
+
+    roster: roster_cache.RosterCache；已快取的班級不再請求學生表
+    """
+    stats = stats if stats is not None else {'found': 0, 'missing': 0}
+    class_options = session.class_options()
+    resolver = ClassResolver(class_options)
+    for line in resolver.report():
+        print(line)
+    if roster is not None:
+        roster.put_classes(class_options)
+    mark = roster.item_mark(item_id) if roster is not None else None
+
+    entries = []
+    for class_short, class_entries in sorted(students_by_class.items()):
+        class_value = resolver.resolve(class_short)
+        if not class_value:
+            print(f'⚠ 找不到班級: {class_short}')
+            stats['missing'] += len(class_entries)
+            continue
+        cache_key = resolver.canonical(class_short)
+        cached = roster.roster(cache_key) if roster is not None and mark is not None else None
+        if cached is not None:
+            students = {no: {'student_id': v[2], 'student_name': v[0], 'class_id': class_value, 'mark_item': mark}
+                        for no, v in cached.items()}
+        else:
+            students = session.fetch_class_students(class_value, item_id)
+            if roster is not None and students:
+                first = next(iter(students.values()))
+                mark = first.get('mark_item', '')
+                roster.put_roster(cache_key, {
+                    no: (s.get('student_name', ''), s.get('student_cname', ''), s.get('student_id', ''))
+                    for no, s in students.items()
+                }, (item_id, mark))
+        for _, student_id in class_entries:
+            info = students.get(str(student_id))
+            if not info:
+                print(f'    ⚠ {student_id} 未找到')
+                stats['missing'] += 1
+                continue
+            print(f"    ✓ {student_id} → {info.get('student_name', '')}")
+            entries.append({
+                'student_no': str(student_id),
+                'student_id': info['student_id'],
+                'class_id': info.get('class_id', class_value),
+                'mark': info.get('mark_item') or '0.00',
+                'type_of_bonus': bonus_type,
+                'remark': str(remarks.get(str(student_id)) or ''),
+            })
+            stats['found'] += 1
+    return entries
+
+
+def login_with_session(session: SmsHttpSession, username: str, password: str, store=None) -> bool:
+    """先還原保存的登入 Session（session_store.SessionStore），無效時才完整登入並保存"""
+    if store is not None and store.restore_http(session, username):
+        print('✓ 已還原登入 Session')
+        return True
+    if not session.login(username, password):
+        print('✗ 登入失敗')
+        return False
+    if store is not None:
+        store.save_http(session, username)
+    print('✓ 已登入')
+    return True
+
+
+def run_upload(username: str, password: str, job: UploadJob,
+               bonus_type: str = DEFAULT_BONUS_TYPE, session: Optional[SmsHttpSession] = None,
+               roster=None, journal=None, store=None) -> Dict:
+    """
+    以 HTTP 後端完成一個活動（upload_jobs.UploadJob）的上傳，返回統計
+
+    roster: roster_cache.RosterCache；已快取的班級不再請求學生表
+    journal: upload_journal.UploadJournal；已提交或 SMS 上已有紀錄的學生不再提交
+    store: session_store.SessionStore；保存的 Session 仍有效時略過登入
+    """
+    session = session or SmsHttpSession()
+    date_str, activity_code = job.date, job.code
+    students_by_class, remarks = job.by_class(), job.remarks()
+    stats = {'found': 0, 'missing': 0, 'submitted': False}
+    started = time.perf_counter()
+
+    print('[1/6] 登入（HTTP）...')
+    if not login_with_session(session, username, password, store):
+        return stats
+
+    print('[2/6] 解析活動選項...')
+    activity = session.resolve_activity(activity_code)
+    if not activity:
+        print(f'✗ 找不到活動: {activity_code}')
+        return stats
+    item_id, activity_name = activity
+    print(f'✓ 活動: {activity_name}（item_id={item_id}）')
+
+    # 已提交（日誌）或 SMS 上已有紀錄的學生不再提交
+    done = journal.done_students(job.key) if journal is not None else set()
+    existing = {r['student_no'] for r in session.fetch_existing_records(date_str, item_id)}
+    if journal is not None:
+        journal.students(job.key, 'existing', sorted(existing - done))
+    done |= existing
+    if done:
+        before = sum(len(v) for v in students_by_class.values())
+        students_by_class = {c: [e for e in entries if str(e[1]) not in done]
+                             for c, entries in students_by_class.items()}
+        students_by_class = {c: entries for c, entries in students_by_class.items() if entries}
+        skipped = before - sum(len(v) for v in students_by_class.values())
+        if skipped:
+            print(f'  [續傳] 略過已有紀錄 {skipped} 位')
+        if not students_by_class:
+            stats['submitted'] = True
+            return stats
+
+    print('[3/6] 讀取班級清單...')
+    print(f'✓ 共 {len(session.class_options())} 個班級選項')
+
+    print('[4/6] 逐班級取得學生內部 ID...')
+    entries = build_entries(session, item_id, students_by_class, remarks, bonus_type, roster, stats)
+
+    print('[5/6] 組合表單欄位...')
+    print(f'✓ {len(entries)} 位學生')
+
+    print('[6/6] 提交表單...')
+    if not entries:
+        print('⚠ 沒有可提交的學生')
+        return stats
+    ok, final_url = session.submit_performance(date_str, item_id, entries)
+    stats['submitted'] = ok
+    if ok and journal is not None:
+        journal.students(job.key, 'submitted', [e['student_no'] for e in entries])
+    print('✓ 已提交' if ok else f'⚠ 提交可能失敗: {final_url}')
+    print(f'  耗時 {time.perf_counter() - started:.1f} 秒')
+    return stats
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+事件驅動的頁面就緒等待，取代固定的 time.sleep：
+- wait_for_ajax_idle：jQuery.active 歸零且 document.readyState == 'complete'
+- wait_for_grid_refresh：changeGridStudentList() 之後 #student-grid 被 AJAX 結果替換
+- wait_for_rows_added：addToEkstra 之後父頁表格出現 <tr class="內部 ID">
+- wait_for_select2_value：Select2 已設定 StudentPerformanceM_item_id 的值
+
+每次等待的耗時都會記入 timer（StageTimer），流程結束時可印出各階段報告；
+設定 timer.recorder（run_report.RunReport）時，階段與等待也會轉送給它。
+"""
+import threading
+import time
+from typing import List, Callable
+
+from selenium.webdriver.support.ui import WebDriverWait
+
+
+DEFAULT_TIMEOUT = 8
+POLL = 0.05
+
+
+class StageTimer:
+    """記錄每個階段的總耗時與其中花在等待的時間（各執行緒各自計算目前階段，結果累加）"""
+
+    def __init__(self):
+        self.stages = {}  # name -> {'wall': 秒, 'wait': 秒, 'waits': 次數}
+        self.order = []
+        self.recorder = None  # run_report.RunReport
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def start(self, name: str):
+        """開始新階段（自動結束上一個階段）"""
+        self.stop()
+        with self._lock:
+            if name not in self.stages:
+                self.stages[name] = {'wall': 0.0, 'wait': 0.0, 'waits': 0}
+                self.order.append(name)
+        self._local.current = name
+        self._local.started = time.perf_counter()
+        if self.recorder is not None:
+            self.recorder.stage_started(name)
+
+    def stop(self):
+        current = getattr(self._local, 'current', None)
+        if current is not None:
+            with self._lock:
+                self.stages[current]['wall'] += time.perf_counter() - self._local.started
+            self._local.current = None
+            if self.recorder is not None:
+                self.recorder.stage_stopped()
+
+    def add_wait(self, seconds: float):
+        if self.recorder is not None:
+            self.recorder.add_wait(seconds)
+        current = getattr(self._local, 'current', None)
+        if current is not None:
+            with self._lock:
+                self.stages[current]['wait'] += seconds
+                self.stages[current]['waits'] += 1
+
+    def report(self) -> List[str]:
+        self.stop()
+        lines = [f"  {'階段':<20}{'總耗時':>10}{'等待':>10}{'次數':>6}"]
+        for name in self.order:
+            s = self.stages[name]
+            lines.append(f"  {name:<20}{s['wall']:>9.2f}s{s['wait']:>9.2f}s{s['waits']:>6}")
+        total = sum(s['wall'] for s in self.stages.values())
+        lines.append(f"  {'總計':<20}{total:>9.2f}s")
+        return lines
+
+
+timer = StageTimer()
+
+
+def _wait(driver, condition: Callable, timeout: float, message: str = ''):
+    started = time.perf_counter()
+    try:
+        return WebDriverWait(driver, timeout, poll_frequency=POLL).until(condition, message)
+    finally:
+        timer.add_wait(time.perf_counter() - started)
+
+
+AJAX_IDLE_JS = """
+return document.readyState === 'complete' &&
+       (typeof window.jQuery === 'undefined' || window.jQuery.active === 0);
+"""
+
+
+def wait_for_ajax_idle(driver, timeout: float = DEFAULT_TIMEOUT):
+    """等待頁面載入完成且沒有進行中的 jQuery AJAX"""
+    return _wait(driver, lambda d: d.execute_script(AJAX_IDLE_JS), timeout, 'AJAX 未完成')
+
+
+def mark_stale(driver, element_id: str) -> bool:
+    """在目前的元素上做記號，之後可判斷是否已被 AJAX 結果替換"""
+    return bool(driver.execute_script(
+        "var el = document.getElementById(arguments[0]);"
+        "if (!el) return false; el.setAttribute('data-stale', '1'); return true;",
+        element_id,
+    ))
+
+
+def wait_for_replaced(driver, element_id: str, timeout: float = DEFAULT_TIMEOUT):
+    """等待帶記號的元素被新元素取代，且 AJAX 閒置"""
+    js = """
+    var el = document.getElementById(arguments[0]);
+    return !!el && !el.hasAttribute('data-stale') &&
+           (typeof window.jQuery === 'undefined' || window.jQuery.active === 0);
+    """
+    return _wait(driver, lambda d: d.execute_script(js, element_id), timeout, f'#{element_id} 未更新')
+
+
+def wait_for_grid_refresh(driver, trigger: Callable[[], None], grid_id: str = 'student-grid',
+                          timeout: float = DEFAULT_TIMEOUT):
+    """執行 trigger（例如選擇班級），並等待 changeGridStudentList() 的表格更新完成"""
+    mark_stale(driver, grid_id)
+    trigger()
+    return wait_for_replaced(driver, grid_id, timeout)
+
+
+def wait_for_rows_added(driver, internal_ids: List[str], grid_id: str = 'student-performance-m-grid',
+                        timeout: float = DEFAULT_TIMEOUT):
+    """等待 addToEkstra 在父頁表格加入所有 <tr class="內部 ID">"""
+    js = """
+    var grid = document.getElementById(arguments[0]);
+    if (!grid) return false;
+    var have = {};
+    var rows = grid.querySelectorAll('tbody tr');
+    for (var i = 0; i < rows.length; i++) have[rows[i].className.trim()] = true;
+    var ids = arguments[1];
+    for (var j = 0; j < ids.length; j++) if (!have[ids[j]]) return false;
+    return true;
+    """
+    ids = [str(i) for i in internal_ids]
+    return _wait(driver, lambda d: d.execute_script(js, grid_id, ids), timeout,
+                 f'學生 {ids} 未全部加入表格')
+
+
+def wait_for_row_added(driver, internal_id: str, grid_id: str = 'student-performance-m-grid',
+                       timeout: float = DEFAULT_TIMEOUT):
+    """等待 addToEkstra 在父頁表格加入 <tr class="內部 ID">"""
+    return wait_for_rows_added(driver, [internal_id], grid_id, timeout)
+
+
+def wait_for_select2_value(driver, select_id: str = 'StudentPerformanceM_item_id',
+                           timeout: float = DEFAULT_TIMEOUT):
+    """等待 Select2 的隱藏 <select> 已有值，返回該值"""
+    js = "var el = document.getElementById(arguments[0]); return el && el.value ? el.value : null;"
+    return _wait(driver, lambda d: d.execute_script(js, select_id), timeout, f'#{select_id} 未選擇')
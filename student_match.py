@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+學生比對索引：為缺少學號或學號打錯的列找出最可能的學生，並給出信心分數。
+
+索引建立自班級名冊（roster_cache 或 upload.snapshot_student_grid 的 {學號: (英文名, 中文名, 內部 ID)}）：
+- 正規化學號 → 學生（20071.0、全形數字等先經 upload_jobs.normalize_student_id）
+- 學號刪除一個字元的所有變體 → 學生：打錯、漏打、多打或相鄰對調一位數字都能以雜湊查到
+- 姓名字元 n-gram → 學生：中文名取 2-gram，英文名取 3-gram
+
+比對只查詢這些雜湊表，不逐一掃描名冊；上千位學生的名冊每列也只需數毫秒。
+工作表的班級寫法（高三忠、s3a）先經 class_resolver 的別名表轉為名冊使用的簡寫（S3A）再比較。
+
+用法：
+  python student_match.py                     # 列出 Upload.xlsx 中無法直接對上的列與候選
+  python student_match.py 整季.xlsx --apply    # 信心 ≥ 0.85 的列直接改正學號與班級（一次存檔）
+"""
+import argparse
+import re
+import time
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Optional, Dict, Iterable, List, NamedTuple, Set, Tuple
+
+from class_resolver import ClassResolver, normalize_alias
+from upload_jobs import StudentRow, normalize_student_id
+
+
+AUTO_ACCEPT = 0.85   # 自動採用的最低信心
+MIN_MARGIN = 0.1     # 與第二名候選至少相差
+MAX_GRAM_CANDIDATES = 50
+NAME_AGREES = 0.5    # 學號相符時，姓名相似度低於此值視為打錯成別人的學號
+CJK_RE = re.compile(r'[㐀-鿿]')
+
+
+class Candidate(NamedTuple):
+    class_short: str
+    student_no: str
+    name_en: str
+    name_zh: str
+    internal_id: str
+    confidence: float
+    reason: str
+
+
+def normalize_name(name) -> str:
+    return re.sub(r'[\s.,\-_/]+', ' ', unicodedata.normalize('NFKC', str(name or ''))).strip().lower()
+
+
+def name_grams(name) -> Set[str]:
+    """中文取 2-gram（單字名取 1-gram），英文取加上邊界的 3-gram"""
+    text = normalize_name(name)
+    if not text:
+        return set()
+    if CJK_RE.search(text):
+        chars = text.replace(' ', '')
+        return {chars} if len(chars) < 2 else {chars[i:i + 2] for i in range(len(chars) - 1)}
+    grams = set()
+    for word in text.split():
+        padded = f' {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def id_variants(student_id: str) -> Set[str]:
+    """刪除一個字元的所有變體（symmetric delete）"""
+    return {student_id[:i] + student_id[i + 1:] for i in range(len(student_id))}
+
+
+class StudentIndex:
+    """班級名冊的比對索引"""
+
+    def __init__(self, resolver: Optional[ClassResolver] = None):
+        self.resolver = resolver
+        self.entries: List[Tuple[str, str, str, str, str]] = []   # (班級, 學號, 英文名, 中文名, 內部 ID)
+        self.grams: List[Tuple[Set[str], Set[str]]] = []   # (英文名, 中文名)
+        self._by_no: Dict[str, List[int]] = defaultdict(list)
+        self._by_variant: Dict[str, Set[int]] = defaultdict(set)
+        self._by_gram: Dict[str, Set[int]] = defaultdict(set)
+        self._classes: Dict[str, str] = {}   # normalize_alias(班級簡寫) → 班級簡寫
+
+    def __len__(self):
+        return len(self.entries)
+
+    @classmethod
+    def from_rosters(cls, rosters: Dict[str, Dict[str, tuple]],
+                     class_options: Optional[Iterable[Tuple[str, str]]] = None) -> 'StudentIndex':
+        """class_options：class_id 的 (value, 文字) 選項，用於解析中文班名等別名"""
+        index = cls(ClassResolver(class_options) if class_options is not None else None)
+        for class_short, students in rosters.items():
+            for no, (en, zh, iid) in students.items():
+                index.add(class_short, no, en, zh, iid)
+        return index
+
+    @classmethod
+    def from_cache(cls, cache) -> 'StudentIndex':
+        """以 roster_cache.RosterCache 中所有有效的班級名冊建立"""
+        rosters = {}
+        for class_short in cache.classes():
+            roster = cache.roster(class_short)
+            if roster:
+                rosters[class_short] = roster
+        index = cls.from_rosters(rosters)
+        index.resolver = cache.resolver()
+        return index
+
+    def add(self, class_short: str, student_no: str, name_en: str = '', name_zh: str = '', internal_id: str = ''):
+        no = normalize_student_id(student_no)
+        i = len(self.entries)
+        self.entries.append((class_short, no, name_en or '', name_zh or '', internal_id or ''))
+        self._classes.setdefault(normalize_alias(class_short), class_short)
+        names = (name_grams(name_en), name_grams(name_zh))
+        self.grams.append(names)
+        self._by_no[no].append(i)
+        for variant in id_variants(no):
+            self._by_variant[variant].add(i)
+        for gram in names[0] | names[1]:
+            self._by_gram[gram].add(i)
+
+    def canonical(self, class_short: str) -> str:
+        """工作表中的班級文字 → 名冊使用的簡寫；無法解析時原樣返回"""
+        if not class_short:
+            return class_short
+        resolved = self.resolver.canonical(class_short) if self.resolver is not None else None
+        return resolved or self._classes.get(normalize_alias(class_short), class_short)
+
+    def _find(self, class_short: str, student_id) -> Optional[int]:
+        class_short = self.canonical(class_short)
+        for i in self._by_no.get(normalize_student_id(student_id), ()):
+            if self.entries[i][0] == class_short:
+                return i
+        return None
+
+    def lookup(self, class_short: str, student_id) -> Optional[Tuple[str, str, str, str, str]]:
+        """學號完全相符且班級相同時返回該學生"""
+        i = self._find(class_short, student_id)
+        return None if i is None else self.entries[i]
+
+    def confirms(self, row: StudentRow) -> bool:
+        """學號 + 班級相符，且工作表有姓名時姓名也大致相符"""
+        i = self._find(row.class_short, row.student_id)
+        if i is None:
+            return False
+        grams = name_grams(row.name)
+        return not grams or self._name_score(grams, i) >= NAME_AGREES
+
+    def match(self, class_short: str = '', student_id='', name: str = '', limit: int = 5) -> List[Candidate]:
+        """返回依信心排序的候選"""
+        class_short = self.canonical(class_short)
+        sid = normalize_student_id(student_id)
+        id_hits: Dict[int, Tuple[float, str]] = {}
+        if sid:
+            for i in self._by_no.get(sid, ()):
+                id_hits[i] = (1.0, '學號相符')
+            for i in self._by_variant.get(sid, ()):   # 漏打一位
+                id_hits.setdefault(i, (0.7, '學號相差一位'))
+            for variant in id_variants(sid):
+                for i in self._by_no.get(variant, ()):  # 多打一位
+                    id_hits.setdefault(i, (0.7, '學號相差一位'))
+                for i in self._by_variant.get(variant, ()):  # 打錯或對調一位
+                    if len(self.entries[i][1]) == len(sid):
+                        id_hits.setdefault(i, (0.7, '學號相差一位'))
+
+        grams = name_grams(name)
+        name_hits: Dict[int, float] = {}
+        if grams:
+            overlap = Counter(i for g in grams for i in self._by_gram.get(g, ()))
+            for i, _ in overlap.most_common(MAX_GRAM_CANDIDATES):
+                name_hits[i] = self._name_score(grams, i)
+            for i in id_hits:
+                if i not in name_hits:
+                    name_hits[i] = self._name_score(grams, i)
+
+        candidates = []
+        for i in set(id_hits) | set(name_hits):
+            id_score, reason = id_hits.get(i, (0.0, ''))
+            name_score = name_hits.get(i, 0.0)
+            if id_score == 1.0:
+                # 學號相符：有姓名時依姓名相似度調整，避免把打錯成別人學號的列當成相符
+                confidence = 0.6 + 0.4 * name_score if grams else 1.0
+                if grams:
+                    reason = f'{reason}，姓名相似 {name_score:.2f}'
+            elif id_score:
+                confidence = 0.5 + 0.45 * name_score if grams else 0.6
+                if grams:
+                    reason = f'{reason}，姓名相似 {name_score:.2f}'
+            else:
+                confidence = 0.85 * name_score
+                reason = f'姓名相似 {name_score:.2f}'
+            entry = self.entries[i]
+            if class_short and entry[0] != class_short:
+                # 學號與姓名都相符時，視為工作表的班級打錯，不扣分
+                if confidence < 1.0:
+                    confidence *= 0.9
+                reason += f'，班級為 {entry[0]}'
+            candidates.append(Candidate(*entry, round(confidence, 3), reason))
+        candidates.sort(key=lambda c: (-c.confidence, c.class_short, c.student_no))
+        return candidates[:limit]
+
+    def _name_score(self, grams: Set[str], i: int) -> float:
+        """與英文名或中文名較接近者的 Dice 係數"""
+        return max((2 * len(grams & g) / (len(grams) + len(g)) for g in self.grams[i] if g), default=0.0)
+
+    def resolve(self, row: StudentRow, threshold: float = AUTO_ACCEPT) -> Tuple[Optional[Candidate], List[Candidate]]:
+        """返回 (可自動採用的候選或 None, 全部候選)"""
+        candidates = self.match(row.class_short, row.student_id, row.name)
+        if not candidates:
+            return None, candidates
+        best = candidates[0]
+        runner_up = candidates[1].confidence if len(candidates) > 1 else 0.0
+        if best.confidence >= threshold and best.confidence - runner_up >= MIN_MARGIN - 1e-9:
+            return best, candidates
+        return None, candidates
+
+
+def unmatched_rows(loaded, index: StudentIndex) -> List[StudentRow]:
+    """缺少學號的列、學號 + 班級在名冊中對不上的列，以及學號相符但姓名明顯不同的列"""
+    rows = list(loaded.incomplete)
+    rows += [s for s in loaded.job.students if not index.confirms(s)]
+    return sorted(rows, key=lambda s: s.row_idx)
+
+
+def apply_matches(excel_file: str, field_map: Dict[str, int], matches: Iterable[Tuple[StudentRow, Candidate]],
+                  sheet_name: Optional[str] = None) -> int:
+    """把採用的學號與班級寫回工作表，只存檔一次"""
+    from openpyxl import load_workbook
+    matches = list(matches)
+    if not matches:
+        return 0
+    class_col = field_map.get('class', 1)
+    id_col = field_map.get('studentid', field_map.get('student_id', 2))
+    wb = load_workbook(excel_file)
+    ws = wb[sheet_name] if sheet_name else wb.active
+    for row, best in matches:
+        no = best.student_no
+        ws.cell(row=row.row_idx, column=id_col, value=int(no) if no.isdigit() and str(int(no)) == no else no)
+        ws.cell(row=row.row_idx, column=class_col, value=best.class_short)
+    wb.save(excel_file)
+    return len(matches)
+
+
+def main(argv: Optional[List[str]] = None):
+    import upload
+    from roster_cache import RosterCache
+    from run_report import safe_console
+
+    safe_console()
+    parser = argparse.ArgumentParser(description='比對缺少或打錯學號的列')
+    parser.add_argument('excel', nargs='?', default=upload.EXCEL_FILE)
+    parser.add_argument('--sheet', help='工作表名稱（預設為使用中的工作表）')
+    parser.add_argument('--apply', action='store_true', help='把可自動採用的結果寫回 Excel')
+    parser.add_argument('--min-confidence', type=float, default=AUTO_ACCEPT)
+    args = parser.parse_args(argv)
+
+    loaded = upload.load_upload_sheet(args.excel, args.sheet)
+    if loaded is None:
+        return
+    cache = RosterCache()
+    try:
+        index = StudentIndex.from_cache(cache)
+    finally:
+        cache.close()
+    if not len(index):
+        print('✗ 名冊快取為空，請先執行 python roster_cache.py warm')
+        return
+
+    rows = unmatched_rows(loaded, index)
+    started = time.perf_counter()
+    accepted = []
+    for row in rows:
+        best, candidates = index.resolve(row, args.min_confidence)
+        sheet = f'{row.class_short or "?"} {row.student_id or "（無學號）"} {row.name}'.strip()
+        if best is not None:
+            accepted.append((row, best))
+            print(f'  ✓ 第 {row.row_idx} 行 {sheet} → {best.class_short} {best.student_no} '
+                  f'{best.name_zh} {best.name_en}（信心 {best.confidence:.2f}，{best.reason}）')
+        elif candidates:
+            print(f'  ⚠ 第 {row.row_idx} 行 {sheet}：無法確定，候選：')
+            for c in candidates[:3]:
+                print(f'      {c.class_short} {c.student_no} {c.name_zh} {c.name_en}（信心 {c.confidence:.2f}，{c.reason}）')
+        else:
+            print(f'  ✗ 第 {row.row_idx} 行 {sheet}：沒有候選')
+    elapsed = time.perf_counter() - started
+    print(f'✓ 索引 {len(index)} 位學生；{len(rows)} 列需要比對，可自動採用 {len(accepted)} 列'
+          f'（每列 {elapsed / max(len(rows), 1) * 1000:.2f} ms）')
+    if args.apply:
+        written = apply_matches(args.excel, loaded.field_map, accepted, args.sheet)
+        print(f'✓ 已改正 {written} 列並存檔')
+
+
+if __name__ == '__main__':
+    main()
@@ -8,11 +8,12 @@ from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
 from openpyxl import load_workbook
 
+import driver_launch
+from activity_catalog import ActivityCatalog, driver_refresher
+from session_store import SessionStore
+
 # 配置
 SMS_URL = "http://sms.chhsban.edu.my/sms/index.php?r=site/login"
 USERNAME = "schhs334"
@@ -21,7 +22,12 @@ ACTIVITY_PAGE = "http://sms.chhsban.edu.my/sms/index.php?r=transaction/studentPe
 EXCEL_PATH = os.path.join(os.path.dirname(__file__), "Upload.xlsx")
 
 def login_to_sms(driver):
-    """登入 SMS 系统"""
+    """登入 SMS 系统（保存的 Session 仍有效时略过）"""
+    store = SessionStore()
+    if store.restore_driver(driver, USERNAME, SMS_URL.split('?')[0]):
+        print("✓ 已还原登入 Session")
+        return
+    
     print("[1] 连接到登入页面...")
     driver.get(SMS_URL)
     time.sleep(2)
@@ -39,25 +45,33 @@ def login_to_sms(driver):
         lambda d: "login" not in d.current_url.lower()
     )
     time.sleep(2)
+    store.save_driver(driver, USERNAME, SMS_URL.split('?')[0])
     print("✓ 登入成功！")
 
-def get_activity_name(driver, activity_code: str):
+def get_activity_name(driver, activity_code: str, catalog: ActivityCatalog = None):
     """
     导航到活动页面并获取活动名称（使用 Select2 API + 直接 value 设置）
     
     Args:
         driver: Selenium WebDriver
         activity_code: 活动代码（从 Excel A2 读取）
+        catalog: 活动索引；提供时一次抓取全部选项更新索引后直接查找
     
     Returns:
         str: 活动名称，若失败返回 "查無此活動"
     """
     print(f"\n[5] 导航到活动页面...")
     driver.get(ACTIVITY_PAGE)
-    time.sleep(3)
+    WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.ID, "StudentPerformanceM_item_id")))
     
     print(f"[6] 查找活动代码: {activity_code}")
     
+    if catalog is not None:
+        catalog.refresh(driver_refresher(driver))
+        activity = catalog.lookup(activity_code, refresh=False)
+        print(f"✓ 活动索引已更新（{len(catalog)} 个活动）")
+        return activity.name if activity else "查無此活動"
+    
     try:
         # 方法 1: 通过 Select2 搜索 (使用 jQuery 的 select2 API)
         print("    方法 1: 通过 Select2 搜索...")
@@ -198,20 +212,23 @@ def main():
     
     print(f"✓ 从 A2 读取活动代码: {activity_code}")
     
-    # 启动浏览器
-    options = Options()
-    options.add_argument('--disable-blink-features=AutomationControlled')
-    options.add_experimental_option("excludeSwitches", ["enable-automation"])
-    options.add_experimental_option('useAutomationExtension', False)
+    # 活动索引命中时不需要启动浏览器
+    catalog = ActivityCatalog()
+    activity = catalog.lookup(activity_code, refresh=False)
+    if activity:
+        print(f"✓ 活动索引: {activity.name}")
+        write_to_excel(activity.name)
+        return
     
-    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+    # 启动浏览器
+    driver = driver_launch.launch(headless=False)
     
     try:
         # 登入
         login_to_sms(driver)
         
         # 获取活动名称
-        activity_name = get_activity_name(driver, str(activity_code))
+        activity_name = get_activity_name(driver, str(activity_code), catalog)
         
         # 写入 Excel
         write_to_excel(activity_name)
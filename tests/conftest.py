@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+"""測試共用設定：腳本都在專案根目錄，直接以模組名稱匯入"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""activity_catalog.ActivityCatalog：代碼查詢、前綴搜尋與查無時重新擷取"""
+import fake_sms
+import sms_http
+from activity_catalog import ActivityCatalog, code_of, http_refresher, normalize_code
+
+OPTIONS = [
+    ('', '請選擇'),
+    ('2207', 'ACA CMO183 - Malaysian Physics Olympiad (OFM) 2025'),
+    ('2208', 'ACA CMO184 - 第六届（2025年度）全国母亲节颂文比赛'),
+    ('2300', 'ACA CMO1850 - 補充活動'),
+    ('2301', 'ACA CMO184 - 同代碼的第二個選項'),
+]
+
+
+def test_normalize_and_code_of():
+    assert normalize_code(' aca  cmo183 ') == 'ACA CMO183'
+    assert code_of('ACA CMO183 - Malaysian Physics Olympiad') == 'ACA CMO183'
+
+
+def test_exact_code_prefix_fallback_and_persistence(tmp_path):
+    path = str(tmp_path / 'catalog.json')
+    catalog = ActivityCatalog(path)
+    catalog.update(OPTIONS)
+    assert len(catalog) == 3
+    assert catalog.lookup('aca cmo183', refresh=False).value == '2207'
+    assert catalog.lookup('ACA CMO184', refresh=False).value == '2208'     # 同代碼以第一個為準
+    assert catalog.lookup('ACA CMO185', refresh=False).value == '2300'     # 前綴
+    assert [a.code for a in catalog.search('ACA CMO18')] == ['ACA CMO183', 'ACA CMO184', 'ACA CMO1850']
+    assert catalog.lookup('', refresh=False) is None
+
+    reloaded = ActivityCatalog(path)
+    assert reloaded.lookup('ACA CMO183', refresh=False) == catalog.lookup('ACA CMO183', refresh=False)
+    assert reloaded.fetched_at == catalog.fetched_at > 0
+
+
+def test_refresh_only_when_missing(tmp_path):
+    calls = []
+
+    def refresher():
+        calls.append(1)
+        return OPTIONS + [('2400', 'ACA NEW001 - 新活動')]
+
+    catalog = ActivityCatalog(str(tmp_path / 'catalog.json'), refresher=refresher)
+    catalog.update(OPTIONS)
+    assert catalog.lookup('ACA CMO183').value == '2207' and calls == []
+    assert catalog.lookup('ACA NEW001').value == '2400' and calls == [1]
+    assert catalog.lookup('ACA NONE99') is None and calls == [1, 1]
+    assert catalog.lookup('ACA NONE99', refresh=False) is None and calls == [1, 1]
+    assert not catalog.refresh(lambda: [])     # 空結果不覆蓋索引
+    assert len(catalog) == 4
+
+
+def test_http_refresher_against_fake_sms(tmp_path):
+    state = fake_sms.FakeSmsState(classes=1, students=1, activities=5)
+    server = fake_sms.start_server(state)
+    try:
+        session = sms_http.SmsHttpSession(server.base_url)
+        assert session.login('schhs334', 'schhs334')
+        catalog = ActivityCatalog(str(tmp_path / 'catalog.json'))
+        found = catalog.lookup('FAKE CMO003', refresher=http_refresher(session))
+    finally:
+        server.shutdown()
+    assert found is not None and found.value == '3003'
+    assert len(catalog) == len(state.activities)
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""batch_upload.run_batch：以假瀏覽器測試 worker 分派、重試與換新 Session"""
+import threading
+
+import pytest
+
+import batch_upload
+import upload
+from upload_jobs import StudentRow, UploadJob
+
+
+def job(code):
+    return UploadJob('2025-09-06', code, '', (StudentRow('S3A', '20071', '', '佳作', 5),), f'{code}.xlsx')
+
+
+@pytest.fixture
+def browsers(monkeypatch):
+    opened, closed = [], []
+
+    def open_session(headless, username, password):
+        opened.append(object())
+        return opened[-1]
+
+    monkeypatch.setattr(batch_upload, 'open_session', open_session)
+    monkeypatch.setattr(batch_upload, 'close_session', closed.append)
+    return opened, closed
+
+
+def test_jobs_run_in_parallel_with_one_session_per_worker(browsers, monkeypatch):
+    opened, closed = browsers
+    both_running = threading.Barrier(2, timeout=5)
+    drivers = set()
+
+    def run_event(driver, job, roster, catalog, journal, report):
+        drivers.add(id(driver))
+        if job.code in ('A', 'B'):
+            both_running.wait()          # 兩個 worker 同時進行才會通過
+        return {'found': 1, 'missing': 0, 'submitted': True}
+
+    monkeypatch.setattr(upload, 'run_event', run_event)
+    results = batch_upload.run_batch([job('A'), job('B'), job('C'), job('D')], workers=2)
+    assert sorted(r['job'] for r in results) == ['A.xlsx', 'B.xlsx', 'C.xlsx', 'D.xlsx']
+    assert all(r['ok'] and r['attempts'] == 1 for r in results)
+    assert {r['worker'] for r in results} == {1, 2}
+    assert len(opened) == 2 and len(drivers) == 2      # 每個 worker 只登入一次
+    assert len(closed) == 2                            # 結束時關閉
+
+
+def test_failed_job_retries_on_a_fresh_session(browsers, monkeypatch):
+    opened, closed = browsers
+    calls = []
+
+    def run_event(driver, job, roster, catalog, journal, report):
+        calls.append(driver)
+        if len(calls) == 1:
+            raise RuntimeError('Session 已損壞')
+        return {'found': 1, 'missing': 0, 'submitted': True}
+
+    monkeypatch.setattr(upload, 'run_event', run_event)
+    [result] = batch_upload.run_batch([job('A')], workers=1, retries=1)
+    assert result['ok'] and result['attempts'] == 2
+    assert calls[0] is not calls[1] and calls[0] in closed
+
+
+def test_gives_up_after_retries(browsers, monkeypatch):
+    monkeypatch.setattr(upload, 'run_event', lambda *args: {'found': 0, 'missing': 1, 'submitted': False})
+    [result] = batch_upload.run_batch([job('A')], workers=3, retries=2)
+    assert not result['ok'] and result['attempts'] == 3 and result['error'] == '未提交'
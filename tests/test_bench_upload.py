@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""bench_upload：以假 SMS 伺服器跑完整的 HTTP 後端流程，狀態檔只寫暫存目錄"""
+import os
+
+import pytest
+
+import activity_catalog
+import bench_upload
+import roster_cache
+import session_store
+import upload
+import upload_journal
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def isolated(monkeypatch):
+    # run_upload 會改寫環境變數與模組路徑；交給 monkeypatch 在測試後還原
+    for name in ('SMS_BASE_URL', 'SMS_BACKEND', 'HEADLESS', 'ROSTER_CACHE'):
+        monkeypatch.delenv(name, raising=False)
+    for module, attr in ((upload, 'EXCEL_FILE'), (upload, 'SMS_BASE_URL'), (upload, 'SMS_LOGIN'),
+                         (upload, 'SMS_ACTIVITY_PAGE'), (activity_catalog, 'CATALOG_FILE'),
+                         (upload_journal, 'JOURNAL_FILE'), (session_store, 'SESSION_FILE'),
+                         (roster_cache, 'ROSTER_DB')):
+        monkeypatch.setattr(module, attr, getattr(module, attr))
+
+
+def state_files():
+    names = ('timeout_policy.json', 'sms_sessions.json', 'upload_journal.jsonl',
+             'activity_catalog.json', 'roster_cache.sqlite3')
+    return {name: os.path.getmtime(os.path.join(REPO, name))
+            for name in names if os.path.exists(os.path.join(REPO, name))}
+
+
+def test_http_benchmark_submits_every_student(isolated):
+    before = state_files()
+    result = bench_upload.run_benchmark(classes=2, students=6, targets=3, latency=0.0,
+                                        ajax_latency=0.0, backend='http')
+
+    assert result['students_expected'] == 6
+    assert result['students_submitted'] == 6
+    assert result['requests'] > 0
+    assert result['total_seconds'] > 0
+    assert state_files() == before
+
+
+def test_split_stages_and_student_intervals():
+    lines = [(0.5, '[1/6] 載入 Excel'), (1.0, '[2/6] 登入'),
+             (2.0, '  ✓ 20071 → 佳作'), (2.25, '  ✓ 20072 → 金獎')]
+    stages = bench_upload.split_stages(lines, 3.0)
+
+    assert stages == {'[1/6]': pytest.approx(0.5), '[2/6]': pytest.approx(2.0)}
+    assert bench_upload.student_intervals(lines) == [pytest.approx(0.25)]
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+"""class_resolver.ClassResolver：別名正規化與歧義"""
+from class_resolver import ClassResolver, aliases_of, normalize_alias
+
+OPTIONS = [('', '請選擇'), ('682', '高三忠 (S3A)'), ('683', '高三孝 (S3B)'),
+           ('700', '初一忠 (J1A)'), ('701', '初一忠 (J1 A2)')]
+
+
+def test_normalize_alias():
+    assert normalize_alias('Ｓ３-a') == 'S3A'
+    assert normalize_alias(' s3 a ') == 'S3A'
+    assert normalize_alias(None) == ''
+
+
+def test_aliases_of():
+    assert aliases_of('高三忠 (S3A)') == {'高三忠(S3A)', 'S3A', '高三忠'}
+    assert aliases_of('S3A') == {'S3A'}
+
+
+def test_resolve_variants():
+    resolver = ClassResolver(OPTIONS)
+    assert len(resolver) == 4   # 空 value 的「請選擇」不計
+    for text in ('S3A', 's3a', 'Ｓ３Ａ', 'S3-A', '高三忠', '高三忠 (S3A)'):
+        assert resolver.resolve(text) == '682', text
+    assert resolver.canonical('高三孝') == 'S3B'
+    assert resolver.resolve('S9Z') is None
+
+
+def test_ambiguous_alias_resolves_to_nothing():
+    resolver = ClassResolver(OPTIONS)
+    assert resolver.is_ambiguous('初一忠')
+    assert resolver.resolve('初一忠') is None
+    assert resolver.ambiguous['初一忠'] == ['初一忠 (J1 A2)', '初一忠 (J1A)']
+    assert resolver.resolve('j1a2') == '701'
+    assert len(resolver.report()) == 1
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""driver_launch：離線解析 chromedriver、瀏覽器資料夾占用與啟動時間統計（不啟動 Chrome）"""
+import os
+
+import pytest
+
+import driver_launch
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    path = str(tmp_path / 'driver_cache.json')
+    monkeypatch.setattr(driver_launch, 'DRIVER_CACHE', path)
+    monkeypatch.delenv('CHROMEDRIVER', raising=False)
+    return path
+
+
+def test_resolves_once_then_stays_offline(cache, tmp_path, monkeypatch):
+    binary = tmp_path / 'chromedriver'
+    binary.write_text('')
+    lookups = []
+    monkeypatch.setattr(driver_launch.shutil, 'which', lambda name: lookups.append(name) or str(binary))
+
+    assert driver_launch.resolve_chromedriver() == (str(binary), True)
+    assert driver_launch.resolve_chromedriver() == (str(binary), False)   # 由快取取得
+    assert lookups == ['chromedriver']
+
+    monkeypatch.setenv('CHROMEDRIVER', '/opt/chromedriver')
+    assert driver_launch.resolve_chromedriver() == ('/opt/chromedriver', False)
+
+
+def test_stale_cache_is_resolved_again(cache, tmp_path, monkeypatch):
+    driver_launch._update_cache(chromedriver=str(tmp_path / 'gone'))
+    binary = tmp_path / 'chromedriver'
+    binary.write_text('')
+    monkeypatch.setattr(driver_launch.shutil, 'which', lambda name: str(binary))
+    assert driver_launch.resolve_chromedriver() == (str(binary), True)
+
+
+@pytest.mark.skipif(os.name != 'posix', reason='以 fcntl 測試同一行程內的鎖')
+def test_claim_profile_gives_each_browser_its_own_folder(tmp_path):
+    first, lock1, created1 = driver_launch.claim_profile('w', str(tmp_path))
+    second, lock2, created2 = driver_launch.claim_profile('w', str(tmp_path))
+    assert (os.path.basename(first), os.path.basename(second)) == ('w', 'w-2')
+    assert created1 and created2
+    lock1.close()
+    again, lock3, created3 = driver_launch.claim_profile('w', str(tmp_path))
+    assert again == first and not created3
+    lock2.close()
+    lock3.close()
+
+
+def test_lean_options():
+    args = driver_launch.lean_options(headless=True, profile_dir='/tmp/p').arguments
+    assert '--headless=new' in args and '--user-data-dir=/tmp/p' in args and '--disable-extensions' in args
+    assert '--disable-extensions' not in driver_launch.lean_options(lean=False).arguments
+
+
+def test_startup_stats(cache):
+    for seconds, cold in ((3.0, True), (1.0, False), (1.4, False), (1.2, False)):
+        driver_launch._update_cache(startup={'seconds': seconds, 'cold': cold})
+    assert driver_launch.startup_stats() == {'cold': {'runs': 1, 'median': 3.0},
+                                             'warm': {'runs': 3, 'median': 1.2}}
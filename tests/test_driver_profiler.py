@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""driver_profiler.DriverProfiler：指令計數、呼叫位置、folded stacks 與預算"""
+import pytest
+
+from driver_profiler import BudgetExceeded, DriverProfiler, flame_lines, read_folded
+
+
+class Driver:
+    def execute(self, command, params=None):
+        return {'value': None}
+
+
+def find_rows(driver):
+    for _ in range(3):
+        driver.execute('findElements')
+
+
+def snapshot(driver):
+    driver.execute('executeScript')
+
+
+def test_counts_commands_by_type_and_call_site(tmp_path):
+    profiler = DriverProfiler()
+    driver = profiler.wrap(Driver())
+    find_rows(driver)
+    snapshot(driver)
+
+    assert profiler.total == 4
+    assert {k: v[0] for k, v in profiler.by_command.items()} == {'findElements': 3, 'executeScript': 1}
+    sites = {site.rsplit(':', 1)[0]: count for site, (count, _) in profiler.by_site.items()}
+    assert sites == {'test_driver_profiler.find_rows': 3, 'test_driver_profiler.snapshot': 1}
+    # 呼叫樹以函式為節點，最後一層是指令
+    leaf = next(stack for stack in profiler.stacks if stack[-1] == 'findElements')
+    assert leaf[-2:] == ('test_driver_profiler.find_rows', 'findElements')
+
+    path = profiler.write_folded(str(tmp_path / 'stacks.folded'))
+    stacks = read_folded(path)
+    assert set(stacks) == set(profiler.stacks)
+    assert any('find_rows' in line for line in flame_lines(profiler.stacks, min_share=0))
+    assert profiler.report()[0].startswith('  WebDriver 指令 4 次')
+
+
+def test_budget():
+    profiler = DriverProfiler()
+    driver = profiler.wrap(Driver())
+    for _ in range(10):
+        snapshot(driver)
+    assert profiler.over_budget(students=2, per_student=5) is None
+    assert '超過預算' in profiler.over_budget(students=2, per_student=4)
+    with pytest.raises(BudgetExceeded):
+        profiler.assert_budget(students=1, per_student=3)
@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+"""enrich_names：逐列讀取學生"""
+from enrich_names import iter_students
+
+
+def test_iter_students_normalizes_ids():
+    rows = [('陳亞九', 'S3A', 20071.0), ('林美玲', 'S3A', ' ２００７２ '), ('缺學號', 'S3A', None), (None, None, None)]
+    field_map = {'name': 1, 'class': 2, 'studentid': 3}
+    assert list(iter_students(rows, field_map)) == [(5, 'S3A', '20071'), (6, 'S3A', '20072')]
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""preflight.check_job：以名冊快取與活動索引檢查整個活動"""
+import pytest
+
+from activity_catalog import ActivityCatalog
+from preflight import check_job
+from roster_cache import RosterCache
+from upload_jobs import StudentRow, UploadJob
+
+
+@pytest.fixture
+def roster(tmp_path):
+    cache = RosterCache(str(tmp_path / 'roster.sqlite3'))
+    cache.put_classes([('682', '高三忠 (S3A)'), ('683', '高三孝 (S3B)')])
+    cache.put_roster('S3A', {'20071': ('TAN AH KOW', '陳亞九', '101'), '20072': ('LIM MEI LING', '林美玲', '102')})
+    cache.put_roster('S3B', {'20233': ('LEE CHONG WEI', '李宗偉', '201')})
+    yield cache
+    cache.close()
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    c = ActivityCatalog(str(tmp_path / 'catalog.json'))
+    c.update([('2207', 'ACA CMO183 - Malaysian Physics Olympiad (OFM) 2025')])
+    return c
+
+
+def job_of(*students, date='2025-09-06', code='ACA CMO183'):
+    return UploadJob(date, code, '', tuple(StudentRow(*s) for s in students))
+
+
+def kinds(report):
+    return sorted(i.kind for i in report.issues)
+
+
+def test_clean_job_passes(roster, catalog):
+    report = check_job(job_of(('S3A', '20071', '陳亞九', '佳作', 5), ('高三孝', '20233', '', '金獎', 6)), roster, catalog)
+    assert report.ok and report.issues == ()
+
+
+def test_reports_every_problem_at_once(roster, catalog):
+    job = job_of(
+        ('S3A', '20017', '陳亞九', '佳作', 5),   # 學號對調
+        ('S3A', '20233', '', '佳作', 6),         # 屬於 S3B
+        ('S9Z', '20072', '', '佳作', 7),         # 沒有此班
+        ('S3B', '20071', '', '', 8),             # 與 S3A 的列衝突 + 備註為空
+        ('S3A', '20071', '', '佳作', 9),
+        date='2025-13-01', code='ACA XXX')
+    report = check_job(job, roster, catalog)
+    assert not report.ok
+    assert {'bad_date', 'unknown_activity', 'unknown_student', 'class_mismatch',
+            'unknown_class', 'conflict', 'empty_award'} <= set(kinds(report))
+    unknown = next(i for i in report.issues if i.kind == 'unknown_student')
+    assert '可能是 S3A 20071' in unknown.message
+
+
+def test_missing_id_gets_suggestion_through_class_alias(roster, catalog):
+    incomplete = (StudentRow('高三忠', '', '林美玲', '佳作', 9),)
+    report = check_job(job_of(('S3A', '20071', '', '佳作', 5)), roster, catalog, incomplete=incomplete)
+    warning = next(i for i in report.issues if i.kind == 'missing_id')
+    # 別名先轉為 S3A：候選與工作表同班，信心不因「班級不同」而打折（0.85 × 0.9）
+    assert '可能是 S3A 20072 林美玲，信心 0.85' in warning.message
+    assert report.ok   # 缺少學號只是警告
+
+
+def test_ambiguous_class_is_error(roster, catalog):
+    roster.put_classes([('690', '高三忠 (S3A2)')])
+    report = check_job(job_of(('高三忠', '20071', '', '佳作', 5)), roster, catalog)
+    assert kinds(report) == ['ambiguous_class']
+
+
+def test_unverified_class_is_warning(roster, catalog):
+    roster.put_classes([('684', '高三仁 (S3C)')])
+    report = check_job(job_of(('S3C', '20300', '', '佳作', 5)), roster, catalog)
+    assert report.ok and kinds(report) == ['unverified_class']
+
+
+def test_without_caches(tmp_path):
+    report = check_job(job_of(('S3A', '20071', '', '佳作', 5)), None, ActivityCatalog(str(tmp_path / 'none.json')))
+    assert report.ok and kinds(report) == ['unverified_activity']
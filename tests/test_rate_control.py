@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""rate_control.AimdController：加法增加、乘法減少與並行上限"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import rate_control
+from rate_control import AimdController
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # 只替換 rate_control 看到的 time（asyncio 仍使用真正的時鐘）
+    c = Clock()
+    monkeypatch.setattr(rate_control, 'time', SimpleNamespace(
+        monotonic=c, sleep=lambda s: setattr(c, 'now', c.now + s)))
+    return c
+
+
+def run(controller, clock, op='grid', seconds=0.1, ok=True):
+    """佔用一個 slot，經過 seconds 後釋放"""
+    assert controller._try_acquire() is not None
+    started = clock.now
+    clock.now += seconds
+    controller._release(op, started, ok)
+
+
+def test_starts_at_half_and_grows_additively(clock):
+    c = AimdController(max_limit=6)
+    assert c.current()['limit'] == 3
+    for _ in range(3):
+        run(c, clock)
+    assert c.current()['limit'] == 3   # 每次加 1/limit：3 + 1/3 + 1/3.33 + 1/3.63 < 4
+    run(c, clock)
+    assert c.current()['limit'] == 4
+    for _ in range(50):
+        run(c, clock)
+    assert c.current()['limit'] == 6 and c.increases >= 3
+
+
+def test_slow_response_halves_limit_once_per_wave(clock):
+    c = AimdController(max_limit=8, initial=8)
+    for _ in range(5):
+        run(c, clock, seconds=0.1)
+    # 同一波開始的兩個慢操作只減速一次
+    c._try_acquire(), c._try_acquire()
+    started = clock.now
+    clock.now += 2.0
+    c._release('grid', started, True)
+    c._release('grid', started, True)
+    snap = c.snapshot()
+    assert snap['limit'] == 4 and snap['decreases'] == 1
+    assert snap['interval'] == pytest.approx(0.1)
+    assert snap['ops']['grid']['slow'] == 2
+    assert '變慢' in snap['history'][-1]['reason']
+
+
+def test_near_zero_sample_does_not_drag_baseline(clock):
+    c = AimdController(max_limit=8, initial=8)
+    run(c, clock, seconds=0.001)         # 例如沒有送出請求的操作
+    for _ in range(10):
+        run(c, clock, seconds=0.3)
+    assert c.snapshot()['ops']['grid']['baseline'] == pytest.approx(0.3)
+    assert c.decreases == 0 and c.current()['limit'] == 8
+
+
+def test_no_slow_judgement_before_min_samples(clock):
+    c = AimdController(max_limit=8, initial=8, min_samples=3)
+    run(c, clock, seconds=0.01)
+    run(c, clock, seconds=0.5)
+    assert c.decreases == 0
+
+
+def test_async_waiter_wakes_on_release():
+    c = AimdController(max_limit=1, initial=1)
+    order = []
+
+    async def worker(name, hold):
+        async with c.slot('page'):
+            order.append(name)
+            await asyncio.sleep(hold)
+
+    async def main():
+        await asyncio.wait_for(asyncio.gather(worker('a', 0.05), worker('b', 0)), 2)
+
+    asyncio.run(main())
+    assert order == ['a', 'b'] and c.current()['inflight'] == 0 and not c._waiters
+
+
+def test_failure_backs_off_to_min_limit(clock):
+    c = AimdController(max_limit=4, min_limit=1, initial=4)
+    for _ in range(4):
+        run(c, clock, ok=False)
+        clock.now += 1
+    snap = c.snapshot()
+    assert snap['limit'] == 1 and snap['ops']['grid']['errors'] == 4
+    assert snap['interval'] <= c.max_interval
+
+
+def test_inflight_never_exceeds_limit(clock):
+    c = AimdController(max_limit=2, initial=2)
+    assert c._try_acquire() is not None
+    assert c._try_acquire() is not None
+    assert c._try_acquire() is None
+    c._release('grid', clock.now, True)
+    assert c._try_acquire() is not None
+
+
+def test_slot_context_managers(clock):
+    c = AimdController(max_limit=2)
+    with c.slot('submit'):
+        clock.now += 0.2
+    with pytest.raises(RuntimeError):
+        with c.slot('submit'):
+            raise RuntimeError('boom')
+    with c.slot('submit') as s:
+        s.fail('HTTP 503')
+
+    async def use():
+        async with c.slot('page'):
+            pass
+
+    asyncio.run(use())
+    ops = c.snapshot()['ops']
+    assert ops['submit']['count'] == 3 and ops['submit']['errors'] == 2
+    assert ops['page']['count'] == 1
+    assert c.current()['inflight'] == 0
+
+
+def test_module_slot_without_controller():
+    rate_control.install(None)
+    with rate_control.slot('grid') as s:
+        s.fail('ignored')
+    assert rate_control.installed() is None
+
+
+def test_save_snapshot(clock, tmp_path):
+    c = AimdController()
+    run(c, clock)
+    path = c.save(str(tmp_path / 'rate.json'))
+    assert (tmp_path / 'rate.json').exists() and path.endswith('rate.json')
+
+
+def test_reselecting_current_class_is_not_timed(monkeypatch):
+    import class_resolver
+    import upload
+
+    class Driver:
+        current = '682'
+
+        def execute_script(self, script, *args):
+            assert script == class_resolver.CURRENT_CLASS_JS
+            return self.current
+
+    resolver = class_resolver.ClassResolver([('682', '高三忠 (S3A)'), ('683', '高三孝 (S3B)')])
+    monkeypatch.setattr(class_resolver, 'for_driver', lambda driver, timeout=8: resolver)
+    monkeypatch.setattr(class_resolver, 'select', lambda driver, value, timeout=8: True)
+    c = rate_control.install(AimdController())
+    try:
+        assert upload.select_class(Driver(), 'S3A')       # 已是目前班級：不送出請求
+        assert 'grid' not in c.snapshot()['ops']
+        assert upload.select_class(Driver(), '高三孝')
+        assert c.snapshot()['ops']['grid']['count'] == 1
+    finally:
+        rate_control.install(None)
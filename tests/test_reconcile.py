@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""reconcile：Excel 與 SMS 既有紀錄的差異，以及對 fake_sms 提交差異"""
+import pytest
+
+import fake_sms
+import sms_http
+from reconcile import apply_diff, diff_records, reconcile
+from upload_jobs import StudentRow, UploadJob
+
+
+def record(rid, no, remark):
+    return {'id': rid, 'student_no': no, 'remark': remark, 'class_name': 'S3A', 'student_cname': ''}
+
+
+def job_of(*students):
+    return UploadJob('2025-09-06', 'ACA CMO183', '', tuple(StudentRow(*s) for s in students))
+
+
+def test_diff_records():
+    job = job_of(('S3A', '20071', '', '佳作', 5), ('S3A', '20072', '', '金獎', 6), ('S3A', '20073', '', '銀獎', 7))
+    records = [record(1, '20071', ' 佳作 '), record(2, '20072', '銅獎'), record(3, '20099', '佳作')]
+    diff = diff_records(job, records)
+    assert diff.unchanged == 1                                   # 空白差異不算變更
+    assert [s.student_id for s in diff.added] == ['20073']
+    assert [(s.student_id, old['id']) for s, old in diff.changed] == [('20072', 2)]
+    assert [r['id'] for r in diff.removed] == [3]
+    assert not diff.empty
+
+
+def test_duplicate_records_keep_matching_one():
+    job = job_of(('S3A', '20071', '', '佳作', 5))
+    diff = diff_records(job, [record(1, '20071', '金獎'), record(2, '20071', '佳作')])
+    assert diff.unchanged == 1 and not diff.changed
+    assert [r['id'] for r in diff.removed] == [1]
+
+
+def test_no_difference_is_empty():
+    job = job_of(('S3A', '20071', '', '佳作', 5))
+    assert diff_records(job, [record(1, '20071', '佳作')]).empty
+
+
+@pytest.fixture
+def sms():
+    state = fake_sms.FakeSmsState(2, 10)
+    server = fake_sms.start_server(state)
+    session = sms_http.SmsHttpSession(server.base_url)
+    assert session.login('schhs334', 'schhs334')
+    yield state, session
+    server.shutdown()
+
+
+def students_of(state, n):
+    rows = next(iter(state.students.values()))[:n]
+    return [(r['class_name'], r['student_no']) for r in rows]
+
+
+def test_apply_diff_reports_not_submitted_when_all_missing(sms):
+    state, session = sms
+    class_short = students_of(state, 1)[0][0]
+    job = job_of((class_short, '99999', '', '佳作', 5))
+    item_id, _ = session.resolve_activity(job.code)
+    stats = apply_diff(session, job, item_id, diff_records(job, []))
+    assert stats == {'created': 0, 'deleted': 0, 'missing': 1, 'submitted': False}
+    assert state.submissions == []
+
+
+def test_reconcile_creates_then_replaces_changed(sms):
+    state, session = sms
+    (c1, n1), (c2, n2) = students_of(state, 2)
+    job = job_of((c1, n1, '', '佳作', 5), (c2, n2, '', '金獎', 6))
+    assert reconcile(session, job, apply=True)['created'] == 2
+
+    changed = job_of((c1, n1, '', '佳作', 5), (c2, n2, '', '銀獎', 6))
+    stats = reconcile(session, changed, apply=True)
+    assert stats['created'] == 1 and stats['deleted'] == 1 and stats['submitted']
+    item_id, _ = session.resolve_activity(job.code)
+    remarks = {r['student_no']: r['remark'] for r in session.fetch_existing_records(job.date, item_id)}
+    assert remarks == {n1: '佳作', n2: '銀獎'}
+    assert reconcile(session, changed)['submitted']   # 已一致
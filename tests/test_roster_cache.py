@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""roster_cache.RosterCache：班級 / 名冊快取、有效期與作廢"""
+import time
+
+import pytest
+
+import roster_cache
+from roster_cache import RosterCache, class_short_of
+
+OPTIONS = [('', '請選擇'), ('682', '高三忠 (S3A)'), ('683', '高三孝 (S3B)')]
+ROSTER = {'20071': ('TAN AH KOW', '陳亞九', '101'), '20072': ('LIM MEI LING', '林美玲', '102')}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    c = RosterCache(str(tmp_path / 'roster.sqlite3'), ttl=100)
+    c.put_classes(OPTIONS)
+    c.put_roster('S3A', ROSTER, ('2207', '5.00'))
+    yield c
+    c.close()
+
+
+def later(monkeypatch, seconds):
+    now = time.time() + seconds
+    monkeypatch.setattr(roster_cache.time, 'time', lambda: now)
+
+
+def test_class_short_of():
+    assert class_short_of('高三忠 (S3A)') == 'S3A'
+    assert class_short_of('S3A') == 'S3A'
+
+
+def test_roundtrip_and_aliases(cache):
+    assert cache.classes()['S3A'] == ('682', '高三忠 (S3A)')
+    assert cache.class_value('s3a') == cache.class_value('高三忠') == '682'
+    assert cache.canonical_class('Ｓ３-a') == 'S3A'
+    assert cache.roster('S3A') == ROSTER
+    assert cache.roster('S3B') is None
+    assert cache.student('20072') == ('S3A', 'LIM MEI LING', '林美玲', '102')
+    assert cache.item_mark('2207') == '5.00'
+
+
+def test_put_roster_replaces_class(cache):
+    cache.put_roster('S3A', {'20071': ROSTER['20071']})
+    assert list(cache.roster('S3A')) == ['20071']
+    assert cache.student('20072') is None
+
+
+def test_expired_entries_are_ignored(cache, monkeypatch):
+    later(monkeypatch, 101)
+    assert cache.roster('S3A') is None
+    assert cache.student('20071') is None
+    assert cache.classes() == {}
+    assert cache.item_mark('2207') is None
+
+
+def test_resolver_expires_with_ttl(cache, monkeypatch):
+    assert cache.class_value('S3A') == '682'   # 先建立別名表
+    later(monkeypatch, 101)
+    assert cache.class_value('S3A') is None
+    assert cache.canonical_class('高三忠') is None
+
+    cache.put_classes(OPTIONS)                 # 重新爬取後恢復
+    assert cache.class_value('S3A') == '682'
+
+
+def test_old_item_marks_table_is_migrated(tmp_path):
+    import sqlite3
+    path = str(tmp_path / 'old.sqlite3')
+    db = sqlite3.connect(path)
+    db.execute('CREATE TABLE item_marks (item_id TEXT PRIMARY KEY, mark TEXT NOT NULL)')
+    db.execute("INSERT INTO item_marks VALUES ('2207', '5.00')")
+    db.commit()
+    db.close()
+
+    c = RosterCache(path, ttl=100)
+    try:
+        assert c.item_mark('2207') is None     # 舊資料無時間戳，視為過期
+        c.put_roster('S3A', ROSTER, ('2207', '6.00'))
+        assert c.item_mark('2207') == '6.00'
+    finally:
+        c.close()
+
+
+def test_invalidate_one_class(cache):
+    cache.put_roster('S3B', {'20233': ('LEE CHONG WEI', '李宗偉', '201')})
+    cache.invalidate('S3A')
+    assert cache.roster('S3A') is None
+    assert cache.class_value('S3A') is None   # 別名表也隨之重建
+    assert cache.roster('S3B') is not None
+
+
+def test_invalidate_all(cache):
+    cache.invalidate()
+    assert cache.classes() == {}
+    assert cache.roster('S3A') is None
+    assert cache.item_mark('2207') is None
+
+
+def test_default_path_is_resolved_at_call_time(tmp_path, monkeypatch):
+    monkeypatch.setattr(roster_cache, 'ROSTER_DB', str(tmp_path / 'redirected.sqlite3'))
+    c = RosterCache()
+    try:
+        assert c.path == str(tmp_path / 'redirected.sqlite3')
+    finally:
+        c.close()
+    assert (tmp_path / 'redirected.sqlite3').exists()
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""run_report.RunReport：階段 / 班級 / 學生 span、WebDriver 指令計數與輸出"""
+import csv
+import json
+
+import pytest
+
+from run_report import RunReport, summarize
+from sms_wait import StageTimer
+
+
+class Driver:
+    def __init__(self):
+        self.executed = []
+
+    def execute(self, command, params=None):
+        self.executed.append(command)
+        return {'value': None}
+
+
+def test_stages_classes_students_and_commands(tmp_path):
+    report = RunReport()
+    timer = StageTimer()
+    report.attach(timer)
+    driver = report.instrument(Driver())
+    report.job = '2025-09-06|ACA CMO183'
+
+    timer.start('[2/6] 日期與活動')
+    driver.execute('get')
+    timer.add_wait(0.25)
+    timer.start('[4/6] 選班與添加')
+    span = report.begin('class', 'S3A', students=2)
+    driver.execute('executeScript')
+    driver.execute('executeScript')
+    report.student('S3A', '20071', 'added')
+    report.student('S3A', '20072', 'missing')
+    report.end(span, 'partial')
+    report.amortize(span, ['20071', '20072'])
+    report.student('S3A', '20071', 'submitted', detail='ok')
+    timer.stop()
+
+    rows = {(r['kind'], r['name']): r for r in report.rows()}
+    stage = rows[('stage', '[2/6] 日期與活動')]
+    assert stage['commands'] == 1 and stage['wait'] == 0.25
+    assert stage['work'] == pytest.approx(max(0.0, stage['wall'] - 0.25), abs=1e-3)
+    assert rows[('stage', '[4/6] 選班與添加')]['commands'] == 2
+    klass = rows[('class', 'S3A')]
+    assert (klass['parent'], klass['outcome'], klass['commands'], klass['students']) == (
+        '[4/6] 選班與添加', 'partial', 2, 2)
+    student = rows[('student', '20071')]
+    assert (student['parent'], student['outcome'], student['detail'], student['commands']) == (
+        'S3A', 'submitted', 'ok', 1)
+    assert rows[('student', '20072')]['outcome'] == 'missing'
+
+    prefix = report.save(str(tmp_path / 'run'))
+    with open(prefix + '.json', encoding='utf-8') as f:
+        data = json.load(f)
+    assert data['commands'] == 3 and len(data['spans']) == 5
+    with open(prefix + '.csv', encoding='utf-8-sig', newline='') as f:
+        assert len(list(csv.DictReader(f))) == 5
+    assert any('最慢的班級' in line for line in summarize(data['spans']))
+
+
+def test_span_context_marks_errors():
+    report = RunReport()
+    try:
+        with report.span('class', 'S3B'):
+            report.begin('student', 'child')   # 未結束的子 span 一併結束
+            raise RuntimeError('boom')
+    except RuntimeError:
+        pass
+    assert [(s['name'], s['outcome']) for s in report.spans] == [('child', 'ok'), ('S3B', 'error')]
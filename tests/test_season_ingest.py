@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""season_ingest：整季統整表串流產生上傳工作"""
+from openpyxl import Workbook
+
+from season_ingest import iter_season_jobs
+
+
+def write_season(path):
+    wb = Workbook()
+    sheets = {
+        'SASMO': [('2025 SASMO数学比赛得奖名单',), ('日期：08/03/2025',), ('序', '姓名', '班级', '学号', '奖项'),
+                  (1, '陳亞九', 'S3A', 20071.0, '金獎'), (2, '林美玲', 's3a', '２００７２', '銀獎'),
+                  (3, '李宗偉', 'S3B', '٢٠٠٧٣', '銅獎')],   # 阿拉伯數字不是學號
+        'OMK': [('2025 OMK数学比赛',), ('序', '姓名', '班级', '学号', '奖项'), (1, '黃家偉', 'J1A', 20150, '佳作')],
+        'SASMO 補': [('2025 SASMO 補充名單',), ('序', '姓名', '班级', '学号', '奖项'),
+                    (1, '陳亞九', 'S3A', 20071, '金獎'), (2, '李宗偉', 'S3B', 20233, '銅獎')],
+    }
+    wb.remove(wb.active)
+    for title, rows in sheets.items():
+        ws = wb.create_sheet(title)
+        for row in rows:
+            ws.append(row)
+    wb.save(path)
+
+
+def test_streams_jobs_and_merges_same_event(tmp_path):
+    path = str(tmp_path / 'season.xlsx')
+    write_season(path)
+    events = {'SASMO': {'code': 'ACA CMO190'}, 'SASMO 補': {'code': 'ACA CMO190', 'date': '2025-03-08'}}
+    jobs = iter_season_jobs(path, events)
+
+    # OMK 讀完即產生；SASMO 要等到同代碼的「SASMO 補」讀完才合併產生
+    omk = next(jobs)
+    assert (omk.code, omk.source.split('!')[1]) == ('', 'OMK')
+    assert [s.student_id for s in omk.students] == ['20150']
+
+    sasmo = next(jobs)
+    assert (sasmo.code, sasmo.date) == ('ACA CMO190', '2025-03-08')
+    assert sasmo.source.endswith('!SASMO+SASMO 補')
+    assert [(s.class_short, s.student_id) for s in sasmo.students] == [
+        ('S3A', '20071'), ('S3A', '20072'), ('S3B', '20233')]
+    assert list(jobs) == []
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""session_store.SessionStore：Cookie 保存、還原、過期與失效"""
+import os
+import time
+
+import pytest
+
+import fake_sms
+import session_store
+import sms_http
+from session_store import SessionStore
+
+
+@pytest.fixture
+def state():
+    state = fake_sms.FakeSmsState(classes=1, students=1, activities=1)
+    server = fake_sms.start_server(state)
+    state.base_url = server.base_url
+    yield state
+    server.shutdown()
+
+
+def logins(state):
+    return sum(1 for method, route, _ in state.requests if method == 'POST' and 'login' in route)
+
+
+def test_save_load_roundtrip(tmp_path):
+    store = SessionStore(str(tmp_path / 'sessions.json'))
+    store.save('http://sms/index.php', 'u', [{'name': 'PHPSESSID', 'value': 'abc', 'path': '/', 'secure': True}])
+    assert store.load('http://sms/index.php', 'u') == [{'name': 'PHPSESSID', 'value': 'abc', 'path': '/'}]
+    assert store.load('http://sms/index.php', 'other') == []
+    assert store.load('http://other/index.php', 'u') == []
+    if os.name == 'posix':
+        assert os.stat(store.path).st_mode & 0o077 == 0   # 只有本人可讀
+
+    store.forget('http://sms/index.php', 'u')
+    assert store.load('http://sms/index.php', 'u') == []
+
+
+def test_expired_entries_are_not_returned(tmp_path, monkeypatch):
+    store = SessionStore(str(tmp_path / 'sessions.json'), max_age=60)
+    store.save('http://sms/index.php', 'u', [{'name': 'PHPSESSID', 'value': 'abc'}])
+    now = time.time() + 61
+    monkeypatch.setattr(session_store.time, 'time', lambda: now)
+    assert store.load('http://sms/index.php', 'u') == []
+
+
+def test_http_restore_skips_login(state, tmp_path):
+    store = SessionStore(str(tmp_path / 'sessions.json'))
+    first = sms_http.SmsHttpSession(state.base_url)
+    assert sms_http.login_with_session(first, 'schhs334', 'schhs334', store)
+    assert logins(state) == 1
+
+    second = sms_http.SmsHttpSession(state.base_url)
+    assert store.restore_http(second, 'schhs334')
+    assert sms_http.login_with_session(sms_http.SmsHttpSession(state.base_url), 'schhs334', 'schhs334', store)
+    assert logins(state) == 1
+    assert second.resolve_activity('ACA CMO183')[0] == '2207'   # 還原的 Session 可直接使用
+
+
+def test_invalid_session_is_forgotten(state, tmp_path):
+    store = SessionStore(str(tmp_path / 'sessions.json'))
+    assert sms_http.login_with_session(sms_http.SmsHttpSession(state.base_url), 'schhs334', 'schhs334', store)
+    state.sessions.clear()                      # 伺服器端 Session 過期
+
+    session = sms_http.SmsHttpSession(state.base_url)
+    assert not store.restore_http(session, 'schhs334')
+    assert store.load(state.base_url, 'schhs334') == []
+    assert len(list(session.cookies)) == 0
+    assert sms_http.login_with_session(session, 'schhs334', 'schhs334', store)
+    assert logins(state) == 2
+
+
+class FakeDriver:
+    """Cookie 正確時活動頁不會被導向登入頁"""
+
+    def __init__(self, valid):
+        self.valid = valid
+        self.cookies = []
+        self.current_url = ''
+
+    def get(self, url):
+        logged_in = any(c['value'] == self.valid for c in self.cookies)
+        self.current_url = url if logged_in else 'http://sms/index.php?r=site/login'
+
+    def add_cookie(self, cookie):
+        self.cookies.append(cookie)
+
+    def get_cookies(self):
+        return [dict(c, domain='sms') for c in self.cookies]
+
+
+def test_driver_restore(tmp_path):
+    store = SessionStore(str(tmp_path / 'sessions.json'))
+    assert not store.restore_driver(FakeDriver('abc'), 'u', 'http://sms/index.php')   # 沒有保存的 Cookie
+
+    store.save('http://sms/index.php', 'u', [{'name': 'PHPSESSID', 'value': 'abc', 'path': '/', 'domain': 'sms'}])
+    driver = FakeDriver('abc')
+    assert store.restore_driver(driver, 'u', 'http://sms/index.php')
+    assert driver.cookies == [{'name': 'PHPSESSID', 'value': 'abc', 'path': '/'}]   # 不帶 domain
+
+    assert not store.restore_driver(FakeDriver('other'), 'u', 'http://sms/index.php')
+    assert store.load('http://sms/index.php', 'u') == []    # 失效後刪除
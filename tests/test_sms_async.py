@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""sms_async.AsyncSmsClient：對 fake_sms 同時抓取全部班級、連線重用與速率上限"""
+import asyncio
+import time
+
+import pytest
+
+import fake_sms
+from activity_catalog import ActivityCatalog
+from rate_control import AimdController
+from roster_cache import RosterCache
+from sms_async import AsyncSmsClient, refresh_caches
+
+
+@pytest.fixture
+def server():
+    state = fake_sms.FakeSmsState(classes=5, students=8, activities=3)
+    server = fake_sms.start_server(state)
+    yield server
+    server.shutdown()
+
+
+def crawl(server, tmp_path, **kwargs):
+    async def go():
+        async with AsyncSmsClient(server.base_url, **kwargs) as client:
+            assert await client.login('schhs334', 'schhs334')
+            roster = RosterCache(str(tmp_path / 'roster.sqlite3'))
+            try:
+                stats = await refresh_caches(client, roster, ActivityCatalog(str(tmp_path / 'catalog.json')))
+                return stats, roster.classes(), {short: len(roster.roster(short) or {}) for short in roster.classes()}
+            finally:
+                roster.close()
+    return asyncio.run(go())
+
+
+def test_crawl_fills_caches_and_reuses_connections(server, tmp_path):
+    state = server.state
+    stats, classes, counts = crawl(server, tmp_path, concurrency=3, rate=0,
+                                   controller=AimdController(max_limit=3))
+    assert stats['classes'] == len(classes) == 5
+    assert stats['students'] == sum(counts.values()) == 40
+    assert set(counts.values()) == {8}
+    assert stats['activities'] >= 3
+    # 登入 + 活動頁 + 5 個班級，只開了最多 3 條 keep-alive 連線
+    assert stats['requests'] >= 7
+    assert stats['connections'] <= 3 and state.connections == stats['connections']
+
+
+def test_rate_is_a_ceiling_with_controller(server, tmp_path):
+    started = time.monotonic()
+    stats, _, _ = crawl(server, tmp_path, concurrency=6, rate=20, controller=AimdController(max_limit=6))
+    # 每秒最多 20 個請求：N 個請求至少需要 (N - 1) / 20 秒
+    assert time.monotonic() - started >= (stats['requests'] - 1) / 20 * 0.9
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""sms_capture：經錄製代理上傳、清理封存檔並重播（以 fake_sms 為上游）"""
+import gzip
+import json
+import shutil
+
+import pytest
+
+import bench_upload
+import fake_sms
+import session_store
+import sms_capture
+
+
+@pytest.fixture
+def recorded(tmp_path, monkeypatch):
+    archive = str(tmp_path / 'run.jsonl.gz')
+    excel = str(tmp_path / 'Upload.xlsx')
+    monkeypatch.setenv('SMS_CAPTURE', archive)
+    monkeypatch.delenv('SMS_CAPTURE_ANONYMIZE', raising=False)
+    monkeypatch.setenv('HEADLESS', '1')
+    monkeypatch.setenv('ROSTER_CACHE', '0')
+    saved_sessions = []
+    monkeypatch.setattr(session_store.SessionStore, 'save', lambda self, *args: saved_sessions.append(args))
+    state = fake_sms.FakeSmsState(2, 10)
+    server = fake_sms.start_server(state)
+
+    def prepare(path):
+        expected = bench_upload.build_workbook(path, state, 3)
+        shutil.copyfile(path, excel)
+        return expected
+
+    try:
+        _, _, expected = bench_upload.run_upload(server.base_url, 'http', prepare)
+    finally:
+        server.shutdown()
+    assert sum(state.submissions) == expected
+    return archive, excel, state, expected, saved_sessions
+
+
+def test_archive_is_sanitized(recorded):
+    archive, _, state, _, _ = recorded
+    with gzip.open(archive, 'rt', encoding='utf-8') as f:
+        text = f.read()
+    header = json.loads(text.splitlines()[0])
+    assert header['anonymized'] and header['requests'] > 0
+    assert 'schhs334' not in text
+    assert 'PHPSESSID' not in text
+    for s in state.by_internal_id.values():
+        # 假名冊的英文名（STUDENT 0001）可能是代號的前綴，以前後的引號 / 標籤比對
+        assert f'\\"{s["student_name"]}\\"' not in text and f'>{s["student_name"]}<' not in text
+        assert s['student_cname'] not in text
+
+
+def test_capture_does_not_save_sessions(recorded):
+    # 代理網址每次不同，錄製模式不保存 Session
+    assert recorded[4] == []
+
+
+def test_replay_serves_recorded_upload(recorded):
+    archive, excel, _, expected, _ = recorded
+    result = bench_upload.run_replay(archive, excel, 0, 'http')
+    assert result['students_submitted'] == expected
+    assert result['replay_missing'] == 0
+
+
+def test_request_key_ignores_credentials_and_cache_buster():
+    a = sms_capture.request_key('GET', '/sms/index.php?r=x&_=123', [('LoginForm[password]', 'a'), ('k', 'v')])
+    b = sms_capture.request_key('GET', '/sms/index.php?_=456&r=x', [('k', 'v'), ('LoginForm[password]', 'b')])
+    assert a == b
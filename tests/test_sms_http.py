@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""sms_http：無瀏覽器上傳後端對 fake_sms 的完整流程"""
+import pytest
+
+import fake_sms
+import sms_http
+from roster_cache import RosterCache
+from upload_journal import UploadJournal
+from upload_jobs import StudentRow, UploadJob
+
+
+@pytest.fixture
+def state():
+    state = fake_sms.FakeSmsState(classes=2, students=5, activities=3)
+    server = fake_sms.start_server(state)
+    state.base_url = server.base_url
+    yield state
+    server.shutdown()
+
+
+def job_for(state, picks, code='ACA CMO183'):
+    """picks：[(班級 value, 名單中第幾位, 備註)]；班級以中文名寫入工作表"""
+    labels = {value: label for value, label, _ in state.classes}
+    rows = []
+    for n, (value, i, award) in enumerate(picks):
+        student = state.students[value][i]
+        rows.append(StudentRow(labels[value].split(' (')[0], student['student_no'], '', award, n + 5))
+    return UploadJob('2025-09-06', code, '', tuple(rows))
+
+
+def upload(state, job, **kwargs):
+    session = sms_http.SmsHttpSession(state.base_url)
+    return sms_http.run_upload('schhs334', 'schhs334', job, session=session, **kwargs)
+
+
+def test_posts_all_students_in_one_form(state):
+    (v1, *_), (v2, *_) = state.classes
+    job = job_for(state, [(v1, 0, '金獎'), (v1, 3, '佳作'), (v2, 1, '銀獎')])
+    stats = upload(state, job)
+    assert stats == {'found': 3, 'missing': 0, 'submitted': True}
+    assert state.submissions == [3]
+    records = {r['student_no']: (r['item_id'], r['remark'], r['type_of_bonus'])
+               for r in state.find_records('2025-09-06', '2207')}
+    assert records == {s.student_id: ('2207', s.award, sms_http.DEFAULT_BONUS_TYPE) for s in job.students}
+
+
+def test_unknown_students_and_activity(state):
+    v1 = state.classes[0][0]
+    job = job_for(state, [(v1, 0, '金獎')])
+    job = job._replace(students=job.students + (StudentRow(job.students[0].class_short, '99999', '', '', 9),
+                                               StudentRow('X9Z', '20000', '', '', 10)))
+    stats = upload(state, job)
+    assert stats == {'found': 1, 'missing': 2, 'submitted': True}
+
+    assert upload(state, job._replace(code='ACA XXX999')) == {'found': 0, 'missing': 0, 'submitted': False}
+    assert state.submissions == [1]
+
+
+def test_resume_skips_journal_and_existing_records(state, tmp_path):
+    v1 = state.classes[0][0]
+    journal = UploadJournal(str(tmp_path / 'journal.jsonl'))
+    first = job_for(state, [(v1, 0, '金獎')])
+    assert upload(state, first, journal=journal)['submitted']
+
+    # 重跑同一活動（多一位）：已提交的不再送出
+    again = job_for(state, [(v1, 0, '金獎'), (v1, 1, '銀獎')])
+    assert upload(state, again, journal=journal)['found'] == 1
+    assert state.submissions == [1, 1]
+    assert journal.done_students(again.key) == {s.student_id for s in again.students}
+
+    # 沒有日誌時，SMS 上的既有紀錄也會被略過
+    assert upload(state, again) == {'found': 0, 'missing': 0, 'submitted': True}
+    assert state.submissions == [1, 1]
+
+
+def test_roster_cache_avoids_grid_requests(state, tmp_path):
+    (v1, *_), (v2, *_) = state.classes
+
+    def grid_requests():
+        return sum(1 for _, route, _ in state.requests if route.endswith('#student-grid'))
+
+    roster = RosterCache(str(tmp_path / 'roster.sqlite3'))
+    try:
+        assert upload(state, job_for(state, [(v1, 0, '金獎'), (v2, 0, '銀獎')]), roster=roster)['submitted']
+        assert grid_requests() == 2
+        stats = upload(state, job_for(state, [(v1, 2, '金獎'), (v2, 2, '銀獎')]), roster=roster)
+    finally:
+        roster.close()
+    assert stats == {'found': 2, 'missing': 0, 'submitted': True}
+    assert grid_requests() == 2   # 第二次全部由名冊快取取得內部 ID
+    assert len(state.find_records('2025-09-06', '2207')) == 4
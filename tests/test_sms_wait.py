@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""sms_wait：事件驅動等待與各階段的等待時間"""
+import pytest
+from selenium.common.exceptions import TimeoutException
+
+import sms_wait
+from sms_wait import StageTimer
+
+
+class ScriptDriver:
+    """execute_script 依序返回 answers（用完後重複最後一個）"""
+
+    def __init__(self, *answers):
+        self.answers = list(answers)
+        self.calls = []
+
+    def execute_script(self, script, *args):
+        self.calls.append(args)
+        return self.answers.pop(0) if len(self.answers) > 1 else self.answers[0]
+
+
+@pytest.fixture
+def timer(monkeypatch):
+    t = StageTimer()
+    monkeypatch.setattr(sms_wait, 'timer', t)
+    monkeypatch.setattr(sms_wait, 'POLL', 0.001)
+    return t
+
+
+def test_returns_as_soon_as_ready(timer):
+    timer.start('[2/6] 日期與活動')
+    driver = ScriptDriver(False, False, True)
+    assert sms_wait.wait_for_ajax_idle(driver, timeout=2)
+    assert len(driver.calls) == 3
+    timer.stop()
+    stage = timer.stages['[2/6] 日期與活動']
+    assert stage['waits'] == 1 and 0 < stage['wait'] <= stage['wall'] < 1
+
+
+def test_timeout_raises_and_is_still_counted(timer):
+    timer.start('[4/6] 選班與添加')
+    with pytest.raises(TimeoutException):
+        sms_wait.wait_for_replaced(ScriptDriver(False), 'student-grid', timeout=0.05)
+    assert timer.stages['[4/6] 選班與添加']['waits'] == 1
+    assert timer.stages['[4/6] 選班與添加']['wait'] >= 0.05
+
+
+def test_rows_and_select2_waits_pass_arguments(timer):
+    driver = ScriptDriver(True)
+    sms_wait.wait_for_row_added(driver, 101)
+    assert driver.calls[-1] == ('student-performance-m-grid', ['101'])
+    assert sms_wait.wait_for_select2_value(ScriptDriver(None, '2207')) == '2207'
+
+
+def test_report_lists_stages_in_order(timer):
+    timer.start('b')
+    timer.start('a')
+    lines = timer.report()
+    assert [line.split()[0] for line in lines[1:-1]] == ['b', 'a']
+    assert lines[-1].split()[0] == '總計'
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""student_match.StudentIndex：學號打錯與姓名比對"""
+from student_match import StudentIndex
+from upload_jobs import StudentRow
+
+
+def make_index() -> StudentIndex:
+    return StudentIndex.from_rosters({
+        'S3A': {
+            '20071': ('TAN AH KOW', '陳亞九', '101'),
+            '20072': ('LIM MEI LING', '林美玲', '102'),
+            '20150': ('WONG KAR WAI', '黃家偉', '103'),
+        },
+        'S3B': {
+            '20233': ('LEE CHONG WEI', '李宗偉', '201'),
+            '20234': ('WONG KAR WAI', '黃家偉', '202'),
+        },
+    })
+
+
+def test_exact_id_confirms_row():
+    index = make_index()
+    assert index.confirms(StudentRow('S3A', '20071', '陳亞九', '', 5))
+    assert not index.confirms(StudentRow('S3A', '20071', '李宗偉', '', 5))   # 打成別人的學號
+
+
+def test_transposed_digits():
+    best, _ = make_index().resolve(StudentRow('S3A', '20017', 'Tan Ah Kow', '', 5))
+    assert best is not None and best.student_no == '20071'
+    assert '學號相差一位' in best.reason
+
+
+def test_extra_digit():
+    best, _ = make_index().resolve(StudentRow('S3A', '200721', '林美玲', '', 5))
+    assert best is not None and best.student_no == '20072'
+
+
+def test_missing_digit():
+    best, _ = make_index().resolve(StudentRow('S3B', '2023', 'Lee Chong Wei', '', 5))
+    assert best is not None and best.student_no == '20233'
+
+
+def test_full_width_and_float_ids_are_normalized():
+    index = make_index()
+    assert index.lookup('S3A', '２００７１') is not None
+    assert index.lookup('S3A', 20071.0) is not None
+
+
+def test_ambiguous_name_is_not_auto_accepted():
+    # 同名學生分屬兩班、工作表沒有學號也沒有班級：兩個候選信心相同
+    best, candidates = make_index().resolve(StudentRow('', '', 'Wong Kar Wai', '', 5))
+    assert best is None
+    assert {c.student_no for c in candidates[:2]} == {'20150', '20234'}
+    assert candidates[0].confidence == candidates[1].confidence
+
+
+def test_class_ranks_same_name_first():
+    candidates = make_index().match('S3B', '', 'Wong Kar Wai')
+    assert [c.student_no for c in candidates[:2]] == ['20234', '20150']
+    assert candidates[0].confidence > candidates[1].confidence
+
+
+def test_sheet_class_aliases_are_canonicalized():
+    rosters = {'S3A': {'20071': ('TAN AH KOW', '陳亞九', '101')}}
+    index = StudentIndex.from_rosters(rosters, [('682', '高三忠 (S3A)')])
+    for spelling in ('高三忠', 's3a', 'Ｓ３-A'):
+        row = StudentRow(spelling, '20071', '陳亞九', '', 5)
+        assert index.confirms(row)
+        best, _ = index.resolve(row)
+        assert best is not None and best.confidence == 1.0 and '班級為' not in best.reason
+    # 沒有班級選項時，仍以大小寫 / 全形正規化對上名冊的簡寫
+    assert StudentIndex.from_rosters(rosters).confirms(StudentRow('s3a', '20071', '', '', 5))
+
+
+def test_from_cache_uses_cache_aliases(tmp_path):
+    from roster_cache import RosterCache
+    cache = RosterCache(str(tmp_path / 'roster.sqlite3'))
+    try:
+        cache.put_classes([('682', '高三忠 (S3A)')])
+        cache.put_roster('S3A', {'20071': ('TAN AH KOW', '陳亞九', '101')})
+        index = StudentIndex.from_cache(cache)
+    finally:
+        cache.close()
+    assert index.confirms(StudentRow('高三忠', '20071', '', '', 5))
+    assert index.lookup('高三忠', '20071')[1] == '20071'
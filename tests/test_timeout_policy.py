@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""timeout_policy：直方圖百分位數、等待上限與存檔衰減"""
+import json
+
+import pytest
+
+from timeout_policy import BOUNDS, DEFAULTS, LatencyHistogram, TimeoutPolicy
+
+
+def test_percentile_returns_bucket_upper_bound():
+    hist = LatencyHistogram()
+    for _ in range(99):
+        hist.observe(0.1)
+    hist.observe(5.0)
+    assert hist.percentile(0.5) >= 0.1
+    assert hist.percentile(0.5) < 0.13
+    assert hist.percentile(1.0) >= 5.0
+    assert LatencyHistogram().percentile(0.99) == 0.0
+
+
+def test_overflow_bucket():
+    hist = LatencyHistogram()
+    hist.observe(BOUNDS[-1] * 10)
+    assert hist.percentile(0.99) == BOUNDS[-1] * 1.25
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'timeout_policy.json')
+
+
+def test_defaults_until_enough_samples(path):
+    policy = TimeoutPolicy(path, min_samples=20)
+    for _ in range(19):
+        policy.record('login', 0.5)
+    assert policy.deadline('login') == DEFAULTS['login']
+    policy.record('login', 0.5)
+    assert policy.deadline('login') == policy.floor   # 0.5 × 1.5 + 1 < 2
+
+
+def test_deadline_tracks_slow_server_and_ceiling(path):
+    policy = TimeoutPolicy(path, min_samples=5)
+    for _ in range(10):
+        policy.record('submit', 6.0)
+    assert 10.0 <= policy.deadline('submit') <= policy.ceiling
+    for _ in range(100):
+        policy.record('submit', 100.0)
+    assert policy.deadline('submit') == policy.ceiling
+
+
+def test_failures_do_not_count_as_samples(path):
+    policy = TimeoutPolicy(path, min_samples=1)
+    policy.record('login', 3.0, ok=False)
+    assert policy.deadline('login') == DEFAULTS['login']
+    assert policy.histograms['login'].failures == 1
+
+
+def test_disabled_policy_uses_defaults(path):
+    policy = TimeoutPolicy(path, min_samples=1, enabled=False)
+    policy.record('login', 0.1)
+    assert policy.deadline('login') == DEFAULTS['login']
+
+
+def counts(path, op):
+    with open(path, encoding='utf-8') as f:
+        return sum(json.load(f)['operations'][op]['counts'])
+
+
+def test_decay_once_per_recording_run(path):
+    first = TimeoutPolicy(path, decay=0.5)
+    for _ in range(10):
+        first.record('login', 0.5)
+    first.save()
+    assert counts(path, 'login') == 10
+
+    # 只讀取、沒有記錄樣本的程序不改動檔案
+    for _ in range(3):
+        TimeoutPolicy(path, decay=0.5).save()
+    assert counts(path, 'login') == 10
+
+    second = TimeoutPolicy(path, decay=0.5)
+    assert second.histograms['login'].total == 10
+    second.record('login', 0.5)
+    second.save()
+    assert counts(path, 'login') == 6   # 10 × 0.5 + 1
+
+
+def test_save_merges_concurrent_runs(path):
+    a, b = TimeoutPolicy(path), TimeoutPolicy(path)
+    a.record('login', 0.5)
+    b.record('submit', 0.5)
+    a.save()
+    b.save()
+    assert counts(path, 'login') == pytest.approx(0.9)
+    assert counts(path, 'submit') == 1
+
+
+def test_reset_writes_empty_histograms(path):
+    policy = TimeoutPolicy(path, min_samples=1)
+    policy.record('login', 0.5)
+    policy.record('submit', 0.5)
+    policy.save()
+    policy.reset(['login'])
+    with open(path, encoding='utf-8') as f:
+        assert list(json.load(f)['operations']) == ['submit']
+    policy.reset()
+    with open(path, encoding='utf-8') as f:
+        assert json.load(f)['operations'] == {}
+    assert TimeoutPolicy(path, min_samples=1).deadline('submit') == DEFAULTS['submit']
+
+
+def test_path_from_env_at_save_time(tmp_path, monkeypatch):
+    policy = TimeoutPolicy()
+    monkeypatch.setenv('TIMEOUT_POLICY_FILE', str(tmp_path / 'bench.json'))
+    policy.record('login', 0.5)
+    policy.save()
+    assert (tmp_path / 'bench.json').exists()
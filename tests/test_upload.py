@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""upload.run_event：階段計時與執行報告（以名冊快取與假瀏覽器，不開 Chrome）"""
+import pytest
+
+import sms_wait
+import upload
+from roster_cache import RosterCache
+from run_report import RunReport
+from upload_jobs import StudentRow, UploadJob
+
+JOB = UploadJob('2025-09-06', 'ACA CMO183', '', (
+    StudentRow('高三忠', '20071', '', '佳作', 5),
+    StudentRow('S3B', '20233', '', '金獎', 6),
+))
+
+
+class FakeDriver:
+    current_url = upload.SMS_ACTIVITY_PAGE
+
+    def execute_script(self, script, *args):
+        return '2207' if 'StudentPerformanceM_item_id' in script else None
+
+    def find_element(self, *args):
+        raise RuntimeError('沒有這個元素')
+
+
+@pytest.fixture
+def roster(tmp_path):
+    cache = RosterCache(str(tmp_path / 'roster.sqlite3'))
+    cache.put_classes([('682', '高三忠 (S3A)'), ('683', '高三孝 (S3B)')])
+    cache.put_roster('S3A', {'20071': ('TAN AH KOW', '陳亞九', '101')}, ('2207', '5.00'))
+    cache.put_roster('S3B', {'20233': ('LEE CHONG WEI', '李宗偉', '201')})
+    yield cache
+    cache.close()
+
+
+@pytest.fixture
+def page(monkeypatch):
+    monkeypatch.setattr(upload, 'fill_date_and_activity', lambda *args, **kwargs: True)
+    monkeypatch.setattr(upload, 'read_existing_records', lambda driver: [])
+    monkeypatch.setattr(upload, 'add_students_from_cache', lambda driver, records: [r['student_id'] for r in records])
+    monkeypatch.setattr(upload, 'fill_performance_rows', lambda driver, remarks: {no: 'ok' for no in remarks})
+    monkeypatch.setattr(sms_wait, 'wait_for_ajax_idle', lambda driver, timeout=None: True)
+
+
+def test_early_return_stops_timer(monkeypatch):
+    monkeypatch.setattr(upload, 'fill_date_and_activity', lambda *args, **kwargs: False)
+    stats = upload.run_event(FakeDriver(), JOB)
+    assert stats == {'found': 0, 'missing': 0, 'submitted': False}
+    assert getattr(upload.timer._local, 'current', None) is None
+
+
+def test_report_uses_sheet_class_for_later_stages(roster, page):
+    report = RunReport()
+    stats = upload.run_event(FakeDriver(), JOB, roster, report=report)
+    assert stats['found'] == 2 and not stats['submitted']      # 假瀏覽器找不到提交按鈕
+    outcomes = {(s['parent'], s['name']): s['outcome'] for s in report.students.values()}
+    assert outcomes == {('高三忠', '20071'): 'submit_failed', ('S3B', '20233'): 'submit_failed'}
+    assert getattr(upload.timer._local, 'current', None) is None
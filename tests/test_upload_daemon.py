@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""upload_daemon：由 JSON 建立工作"""
+import pytest
+
+import upload
+import upload_daemon
+from upload_daemon import UploadDaemon, job_from_payload
+from upload_jobs import LoadedSheet, StudentRow, UploadJob
+
+
+def test_job_from_payload_normalizes_ids():
+    job = job_from_payload({'date': '2025-09-06', 'code': 'ACA CMO183', 'students': [
+        {'class_short': 'S3A ', 'student_id': 20071.0, 'award': '佳作'},
+        {'class_short': 'S3B', 'student_id': ' ２００１９'},
+    ]})
+    assert [(s.class_short, s.student_id) for s in job.students] == [('S3A', '20071'), ('S3B', '20019')]
+    assert job.key == '2025-09-06|ACA CMO183'
+
+
+def test_job_from_payload_requires_students():
+    with pytest.raises(ValueError):
+        job_from_payload({'date': '2025-09-06', 'code': 'ACA CMO183', 'students': []})
+
+
+def test_excel_without_students_is_rejected(monkeypatch):
+    empty = UploadJob('2025-09-06', 'ACA CMO183', '', ())
+    monkeypatch.setattr(upload, 'load_upload_sheet', lambda path, sheet=None: LoadedSheet(empty, {}))
+    with pytest.raises(ValueError):
+        job_from_payload({'excel': 'Upload.xlsx'})
+
+
+class FakeDriver:
+    def __init__(self):
+        self.pages = []
+
+    def get(self, url):
+        self.pages.append(url)
+
+
+def test_workers_keep_activity_page_warm(monkeypatch):
+    drivers, calls = [], []
+
+    def open_session(*args):
+        drivers.append(FakeDriver())
+        return drivers[-1]
+
+    def run_event(driver, job, roster, catalog, journal, warm=False):
+        calls.append((len(driver.pages), warm))
+        return {'found': len(job.students), 'missing': 0, 'submitted': True}
+
+    monkeypatch.setattr(upload_daemon, 'open_session', open_session)
+    monkeypatch.setattr(upload_daemon, 'close_session', lambda driver: None)
+    monkeypatch.setattr(upload, 'run_event', run_event)
+    daemon = UploadDaemon(workers=1)
+    daemon.start()
+    try:
+        job = UploadJob('2025-09-06', 'ACA CMO183', '', (StudentRow('S3A', '20071', '', '佳作', 5),))
+        first = daemon.wait(daemon.submit(job), 5)
+        second = daemon.wait(daemon.submit(job), 5)
+    finally:
+        daemon.stop()
+    assert first['status'] == second['status'] == 'done'
+    # 啟動時與每個工作之後都預先載入活動頁，run_event 不必重新載入
+    assert calls == [(1, True), (2, True)]
+    assert drivers[0].pages == [upload.SMS_ACTIVITY_PAGE] * 3
+    assert daemon.status()['workers'] == {1: 'idle'}
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""upload.load_upload_sheet 與 upload_jobs：單次讀取 Upload.xlsx 為不可變的工作"""
+from datetime import datetime
+
+from openpyxl import Workbook
+
+import upload
+from upload_jobs import normalize_student_id
+
+
+def write_upload(path, rows):
+    wb = Workbook()
+    ws = wb.active
+    ws['A1'] = datetime(2025, 9, 6)
+    ws['A2'] = 'ACA CMO183 '
+    for col, name in enumerate(['class', 'studentId', 'name', 'award'], start=1):
+        ws.cell(row=4, column=col, value=name)
+    for row in rows:
+        ws.append(row)
+    wb.save(path)
+
+
+def test_normalize_student_id():
+    assert normalize_student_id(20071.0) == '20071'
+    assert normalize_student_id(' ２００７１ ') == '20071'
+    assert normalize_student_id("'20071.0") == '20071'
+    assert normalize_student_id(None) == ''
+
+
+def test_sheet_is_read_once_into_job(tmp_path, monkeypatch):
+    path = str(tmp_path / 'Upload.xlsx')
+    write_upload(path, [
+        ('S3A', 20071, '陳亞九', '金獎'),
+        ('S3B', '２０２３３', '李宗偉', '銀獎'),
+        ('S3A', 20071.0, '陳亞九', '佳作'),     # 重複
+        ('S3A', None, '林美玲', '銅獎'),        # 缺少學號
+        (None, None, None, None),
+        ('S3A', 20072, None, None),
+    ])
+    opened = []
+    real = upload.load_workbook
+    monkeypatch.setattr(upload, 'load_workbook', lambda *a, **k: opened.append(a) or real(*a, **k))
+
+    loaded = upload.load_upload_sheet(path)
+    assert len(opened) == 1
+    job = loaded.job
+    assert (job.date, job.code, job.key) == ('2025-09-06', 'ACA CMO183', '2025-09-06|ACA CMO183')
+    assert [(s.class_short, s.student_id, s.award, s.row_idx) for s in job.students] == [
+        ('S3A', '20071', '金獎', 5), ('S3B', '20233', '銀獎', 6), ('S3A', '20072', '', 10)]
+    assert loaded.duplicates == ((7, 'S3A', '20071'),)
+    assert [(s.name, s.row_idx) for s in loaded.incomplete] == [('林美玲', 8)]
+    assert loaded.field_map == {'class': 1, 'studentid': 2, 'name': 3, 'award': 4}
+    assert job.by_class() == {'S3A': [(5, '20071'), (10, '20072')], 'S3B': [(6, '20233')]}
+    assert job.remarks() == {'20071': '金獎', '20233': '銀獎', '20072': ''}
+
+
+def test_missing_event_info(tmp_path):
+    path = str(tmp_path / 'Upload.xlsx')
+    wb = Workbook()
+    wb.active['A2'] = 'ACA CMO183'
+    wb.save(path)
+    assert upload.load_upload_sheet(path) is None
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""upload_journal.UploadJournal：重新載入日誌後的續傳狀態"""
+from upload_journal import UploadJournal
+
+KEY = '2025-09-06|ACA CMO183'
+
+
+def test_replay_restores_done_students(tmp_path):
+    path = str(tmp_path / 'journal.jsonl')
+    journal = UploadJournal(path)
+    journal.stage(KEY, '[4/6] 選班與添加')
+    journal.students(KEY, 'added', ['20071', '20072', '20073'])
+    journal.students(KEY, 'submitted', ['20071'])
+    journal.students(KEY, 'existing', ['20072'])
+    journal.students(KEY, 'missing', [])   # 空清單不寫入
+
+    replayed = UploadJournal(path)
+    assert replayed.done_students(KEY) == {'20071', '20072'}
+    assert replayed.progress(KEY)['students']['20073'] == 'added'
+    assert replayed.progress(KEY)['stages'] == ['[4/6] 選班與添加']
+    with open(path, encoding='utf-8') as f:
+        assert len(f.readlines()) == 4
+
+
+def test_submitted_is_not_overwritten(tmp_path):
+    path = str(tmp_path / 'journal.jsonl')
+    journal = UploadJournal(path)
+    journal.students(KEY, 'submitted', ['20071'])
+    journal.students(KEY, 'added', ['20071'])
+    assert UploadJournal(path).done_students(KEY) == {'20071'}
+
+
+def test_reset_and_truncated_last_line(tmp_path):
+    path = str(tmp_path / 'journal.jsonl')
+    journal = UploadJournal(path)
+    journal.students(KEY, 'submitted', ['20071'])
+    journal.reset(KEY)
+    journal.students('2025-09-07|ACA CMO184', 'submitted', ['20099'])
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"ts": 1, "key": "2025-09-0')   # 寫到一半中斷
+
+    replayed = UploadJournal(path)
+    assert replayed.done_students(KEY) == set()
+    assert replayed.done_students('2025-09-07|ACA CMO184') == {'20099'}
+    assert replayed.keys() == ['2025-09-07|ACA CMO184']
+
+
+def test_record_after_truncated_line_survives_replay(tmp_path):
+    path = str(tmp_path / 'journal.jsonl')
+    UploadJournal(path).students(KEY, 'submitted', ['20071'])
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"ts": 1, "key": "2025-09-0')   # 寫到一半中斷
+
+    resumed = UploadJournal(path)
+    resumed.students(KEY, 'submitted', ['20072'])
+
+    replayed = UploadJournal(path)
+    assert replayed.done_students(KEY) == {'20071', '20072'}
+    with open(path, encoding='utf-8') as f:
+        assert len(f.readlines()) == 2
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+依歷史耗時決定每個操作的等待上限，取代固定的 8 / 10 秒。
+
+每個操作（login、fill_date_and_activity、click_student_list_button、select_class、submit）
+完成時把耗時記入以等比區間分桶的直方圖，跨次執行保存在 timeout_policy.json：
+- 等待上限 = 直方圖的 p99 × 1.5 + 1 秒，限制在 2 秒（floor）到 30 秒（ceiling）之間
+- 樣本少於 20 筆時沿用原本的固定值
+- 每次有新樣本的執行存檔時，檔案中的舊樣本權重乘上 0.9 再加上本次的樣本，近期的執行影響較大
+  （只讀取上限、沒有記錄樣本的程序不會改動檔案）
+
+伺服器正常時，元素不存在等失敗在幾秒內就放棄；超過上限但頁面仍在載入或 AJAX 尚未完成時，
+視為伺服器變慢，延長等待到 ceiling，並把這次耗時記入直方圖，之後的上限隨之提高。
+
+TIMEOUT_POLICY=0 停用（全部使用固定值）；TIMEOUT_POLICY_FILE 可改用另一個檔案（量測、測試用）。
+
+用法：
+  python timeout_policy.py              # 各操作的樣本數、百分位數與目前的等待上限
+  python timeout_policy.py reset login  # 清除單一操作（不指定則全部）
+"""
+import atexit
+import bisect
+import json
+import os
+import sys
+import threading
+import time
+from typing import Optional, Callable, Dict, List
+
+
+POLICY_FILE = os.path.join(os.path.dirname(__file__), 'timeout_policy.json')
+ENABLED = os.getenv('TIMEOUT_POLICY', '1') != '0'
+
+# 原本的固定等待上限（樣本不足時使用）
+DEFAULTS = {
+    'login': 10.0,
+    'fill_date_and_activity': 8.0,
+    'click_student_list_button': 8.0,
+    'select_class': 8.0,
+    'submit': 8.0,
+}
+FALLBACK = 8.0
+
+# 0.05 秒起每格 ×1.25，到約 120 秒
+BOUNDS = [round(0.05 * 1.25 ** i, 4) for i in range(36)]
+
+BUSY_JS = """
+return document.readyState !== 'complete' ||
+       (typeof window.jQuery !== 'undefined' && window.jQuery.active > 0);
+"""
+
+
+class LatencyHistogram:
+    """以等比區間分桶的耗時直方圖（計數可為小數，以便衰減舊樣本）"""
+
+    def __init__(self, counts: Optional[List[float]] = None, failures: float = 0.0):
+        self.counts = list(counts) if counts and len(counts) == len(BOUNDS) + 1 else [0.0] * (len(BOUNDS) + 1)
+        self.failures = failures
+
+    @property
+    def total(self) -> float:
+        return sum(self.counts)
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(BOUNDS, seconds)] += 1
+
+    def percentile(self, p: float) -> float:
+        """返回 p 分位所在區間的上界（秒）"""
+        total = self.total
+        if total <= 0:
+            return 0.0
+        target, seen = p * total, 0.0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return BOUNDS[i] if i < len(BOUNDS) else BOUNDS[-1] * 1.25
+        return BOUNDS[-1] * 1.25
+
+    def decay(self, factor: float):
+        self.counts = [c * factor for c in self.counts]
+        self.failures *= factor
+
+    def to_dict(self) -> Dict:
+        return {'counts': [round(c, 3) for c in self.counts], 'failures': round(self.failures, 3)}
+
+
+class TimeoutPolicy:
+    """各操作的等待上限（執行緒安全，結束時自動存檔）"""
+
+    def __init__(self, path: Optional[str] = None, percentile: float = 0.99, factor: float = 1.5,
+                 margin: float = 1.0, floor: float = 2.0, ceiling: float = 30.0,
+                 min_samples: int = 20, decay: float = 0.9, enabled: bool = ENABLED):
+        self._path = path
+        self.percentile = percentile
+        self.factor = factor
+        self.margin = margin
+        self.floor = floor
+        self.ceiling = ceiling
+        self.min_samples = min_samples
+        self.decay = decay
+        self.enabled = enabled
+        self.histograms: Dict[str, LatencyHistogram] = self._read()
+        self._new: Dict[str, LatencyHistogram] = {}   # 本次執行記錄、尚未存檔的樣本
+        self._lock = threading.Lock()
+
+    @property
+    def path(self) -> str:
+        """存檔位置：建構時指定的路徑 → TIMEOUT_POLICY_FILE → timeout_policy.json（存檔時才決定）"""
+        return self._path or os.getenv('TIMEOUT_POLICY_FILE') or POLICY_FILE
+
+    def _read(self) -> Dict[str, LatencyHistogram]:
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return {op: LatencyHistogram(h.get('counts'), h.get('failures', 0.0))
+                for op, h in data.get('operations', {}).items()}
+
+    def _write(self, histograms: Dict[str, LatencyHistogram]):
+        data = {'updated': time.strftime('%Y-%m-%d %H:%M:%S'), 'bounds': BOUNDS,
+                'operations': {op: h.to_dict() for op, h in sorted(histograms.items())}}
+        tmp = self.path + '.tmp'
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print(f'⚠ 無法寫入 {self.path}: {e}')
+
+    def save(self):
+        """
+        把本次的樣本併入檔案：重新讀取檔案（其他程序可能已更新），舊樣本衰減一次後加上本次樣本
+
+        沒有新樣本時不寫入，衰減只隨「有記錄的執行」發生，與讀取檔案的程序數無關
+        """
+        with self._lock:
+            if not self._new:
+                return
+            merged = self._read()
+            for hist in merged.values():
+                hist.decay(self.decay)
+            for op, new in self._new.items():
+                hist = merged.setdefault(op, LatencyHistogram())
+                hist.counts = [a + b for a, b in zip(hist.counts, new.counts)]
+                hist.failures += new.failures
+            self._new = {}
+            self.histograms = merged
+            self._write(merged)
+
+    def reset(self, ops: Optional[List[str]] = None):
+        """清除指定操作（None 為全部）的樣本並寫入檔案"""
+        with self._lock:
+            histograms = self._read()
+            for op in (ops or list(histograms) + list(self.histograms)):
+                histograms.pop(op, None)
+                self.histograms.pop(op, None)
+                self._new.pop(op, None)
+            self._write(histograms)
+
+    # ---- 上限與紀錄 ----------------------------------------------------
+
+    def deadline(self, op: str, default: Optional[float] = None) -> float:
+        """op 的等待上限（秒）"""
+        default = default if default is not None else DEFAULTS.get(op, FALLBACK)
+        if not self.enabled:
+            return default
+        with self._lock:
+            hist = self.histograms.get(op)
+            if hist is None or hist.total < self.min_samples:
+                return default
+            p = hist.percentile(self.percentile)
+        return round(min(self.ceiling, max(self.floor, p * self.factor + self.margin)), 2)
+
+    def record(self, op: str, seconds: float, ok: bool = True):
+        """記錄一次完成的耗時；ok=False 只計入失敗次數"""
+        with self._lock:
+            for table in (self.histograms, self._new):
+                hist = table.get(op)
+                if hist is None:
+                    hist = table[op] = LatencyHistogram()
+                if ok:
+                    hist.observe(seconds)
+                else:
+                    hist.failures += 1
+
+    def track(self, op: str, timeout: Optional[float] = None) -> '_Tracker':
+        """
+        with policy.track('login') as t: ... t.until(driver, condition) ...
+
+        timeout 有指定時使用該值（不學習上限，但仍記錄耗時）
+        """
+        return _Tracker(self, op, timeout if timeout is not None else self.deadline(op))
+
+    # ---- 報告 ----------------------------------------------------------
+
+    def rows(self) -> List[Dict]:
+        ops = sorted(set(DEFAULTS) | set(self.histograms))
+        rows = []
+        for op in ops:
+            hist = self.histograms.get(op, LatencyHistogram())
+            rows.append({'op': op, 'samples': round(hist.total, 1), 'failures': round(hist.failures, 1),
+                         'p50': hist.percentile(0.5), 'p95': hist.percentile(0.95), 'p99': hist.percentile(0.99),
+                         'default': DEFAULTS.get(op, FALLBACK), 'deadline': self.deadline(op)})
+        return rows
+
+    def summary(self) -> List[str]:
+        lines = [f"  {'操作':<28}{'樣本':>7}{'失敗':>6}{'p50':>7}{'p95':>7}{'p99':>7}{'固定':>6}{'上限':>7}"]
+        for r in self.rows():
+            lines.append(f"  {r['op']:<28}{r['samples']:>7}{r['failures']:>6}{r['p50']:>7.2f}{r['p95']:>7.2f}"
+                         f"{r['p99']:>7.2f}{r['default']:>6.0f}{r['deadline']:>7.2f}")
+        return lines
+
+
+class _Tracker:
+    """一次操作：提供等待上限、帶延長的 until()，結束時記錄耗時"""
+
+    def __init__(self, policy: TimeoutPolicy, op: str, timeout: float):
+        self.policy = policy
+        self.op = op
+        self.timeout = timeout
+        self.ok = True
+        self.started = 0.0
+
+    def fail(self):
+        """操作沒有拋出例外但失敗"""
+        self.ok = False
+
+    def wait(self, driver, wait_fn: Callable[[float], object]):
+        """
+        執行 wait_fn(timeout)；超過上限但頁面仍在載入 / AJAX 未完成時，
+        以剩餘到 ceiling 的時間再執行一次
+        """
+        from selenium.common.exceptions import TimeoutException
+        started = time.perf_counter()
+        try:
+            return wait_fn(self.timeout)
+        except TimeoutException:
+            remaining = self.policy.ceiling - (time.perf_counter() - started)
+            if remaining <= 0 or not self._busy(driver):
+                raise
+            print(f'  ⚠ {self.op} 超過 {self.timeout:.1f} 秒，伺服器仍在處理，延長等待')
+            return wait_fn(remaining)
+
+    def until(self, driver, condition: Callable, message: str = ''):
+        """WebDriverWait(driver, timeout).until(condition)，可延長（見 wait）"""
+        from selenium.webdriver.support.ui import WebDriverWait
+        import sms_wait
+        return self.wait(driver, lambda timeout: WebDriverWait(
+            driver, timeout, poll_frequency=sms_wait.POLL).until(condition, message))
+
+    @staticmethod
+    def _busy(driver) -> bool:
+        try:
+            return bool(driver.execute_script(BUSY_JS))
+        except Exception:
+            return False
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.policy.record(self.op, time.perf_counter() - self.started, self.ok and exc_type is None)
+        return False
+
+
+policy = TimeoutPolicy()
+atexit.register(policy.save)
+
+
+def main():
+    args = sys.argv[1:]
+    if args and args[0] == 'reset':
+        policy.reset(args[1:] or None)
+        print('✓ 已清除')
+        return
+    print(f'等待上限 = p{policy.percentile * 100:.0f} × {policy.factor} + {policy.margin} 秒，'
+          f'介於 {policy.floor}–{policy.ceiling} 秒（樣本少於 {policy.min_samples} 筆時使用固定值）')
+    for line in policy.summary():
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -16,47 +16,73 @@
   SMS_USERNAME, SMS_PASSWORD
 可選：
   HEADLESS=1  # 無頭模式
+  SMS_BACKEND=http  # 不開瀏覽器，改用 HTTP 直接提交（見 sms_http.py）
+  SMS_BASE_URL=http://127.0.0.1:8765/sms/index.php  # 改連本機假伺服器（見 fake_sms.py）
+  ROSTER_CACHE=0  # 停用班級名冊快取（見 roster_cache.py）
+  PREFLIGHT_FORCE=1  # 上傳前檢查有錯誤時仍繼續（見 preflight.py）
+  DRIVER_PROFILE=1  # 統計每個 WebDriver 指令（見 driver_profiler.py）
+  DRIVER_BUDGET=15  # 每位學生的 WebDriver 指令上限，超過時顯示 ✗
+  TIMEOUT_POLICY=0  # 停用依歷史耗時學習的等待上限，改回固定的 8 / 10 秒（見 timeout_policy.py）
+  SMS_CAPTURE=captures/run.jsonl.gz  # 錄製這次的頁面、AJAX 與 POST 供離線重播（見 sms_capture.py）
+  SMS_CAPTURE_ANONYMIZE=0  # 錄製時保留學生姓名（預設以代號取代）
+
+修改已上傳的活動（只提交差異）請用 reconcile.py。
 """
 import os
 import json
-import time
-import sys
-from collections import defaultdict
-from datetime import datetime
+from contextlib import nullcontext
 from typing import Optional, Dict, List
 
 from openpyxl import load_workbook
-from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.support.ui import WebDriverWait, Select
+from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
 
+import class_resolver
+import driver_launch
+import rate_control
+import sms_wait
+from timeout_policy import policy as timeouts
+from sms_wait import timer
+from upload_jobs import LoadedSheet, StudentRow, UploadJob, format_date, normalize_student_id
 
-SMS_LOGIN = "http://sms.chhsban.edu.my/sms/index.php?r=site/login"
-SMS_ACTIVITY_PAGE = "http://sms.chhsban.edu.my/sms/index.php?r=transaction/studentPerformance/create"
+
+SMS_BASE_URL = os.getenv('SMS_BASE_URL', "http://sms.chhsban.edu.my/sms/index.php")
+SMS_LOGIN = f"{SMS_BASE_URL}?r=site/login"
+SMS_ACTIVITY_PAGE = f"{SMS_BASE_URL}?r=transaction/studentPerformance/create"
 EXCEL_FILE = os.path.join(os.path.dirname(__file__), "Upload.xlsx")
 SETTING_FILE = os.path.join(os.path.dirname(__file__), "setting.json")
 
 
-def load_field_mapping():
-    """從 Excel 第 4 行讀取欄位名稱，返回 {field_name: column_index}"""
+def use_base_url(base_url: str):
+    """改用另一個 SMS 網址（本機假伺服器、錄製代理或重播伺服器）"""
+    global SMS_BASE_URL, SMS_LOGIN, SMS_ACTIVITY_PAGE
+    SMS_BASE_URL = base_url
+    SMS_LOGIN = f"{base_url}?r=site/login"
+    SMS_ACTIVITY_PAGE = f"{base_url}?r=transaction/studentPerformance/create"
+
+
+def load_field_mapping(excel_file: Optional[str] = None, header_row: Optional[tuple] = None):
+    """
+    從 Excel 第 4 行讀取欄位名稱，返回 {field_name: column_index}
+
+    header_row: 已讀取的第 4 行內容（提供時不再開啟 Excel）
+    """
     try:
-        excel_file = EXCEL_FILE
-        if not os.path.exists(excel_file):
-            print(f'⚠ 找不到 Excel，嘗試從 setting.json 讀取...')
-            raise FileNotFoundError('Excel not found')
-        
-        # 優先從 Excel 第 4 行讀取標題
-        wb = load_workbook(excel_file, data_only=False)
-        ws = wb.active
+        if header_row is None:
+            excel_file = excel_file or EXCEL_FILE
+            if not os.path.exists(excel_file):
+                print(f'⚠ 找不到 Excel，嘗試從 setting.json 讀取...')
+                raise FileNotFoundError('Excel not found')
+
+            # 優先從 Excel 第 4 行讀取標題
+            wb = load_workbook(excel_file, read_only=True)
+            header_row = next(wb.active.iter_rows(min_row=4, max_row=4, values_only=True), ())
+            wb.close()
         
         mapping = {}
-        for col_idx in range(1, ws.max_column + 1):
-            cell_value = ws.cell(row=4, column=col_idx).value
+        for col_idx, cell_value in enumerate(header_row, start=1):
             if cell_value:
                 field_name = str(cell_value).strip().lower()
                 mapping[field_name] = col_idx
@@ -64,11 +90,9 @@ def load_field_mapping():
         
         if mapping:
             print(f'  ✓ 從 Excel 第 4 行讀取欄位對應: {mapping}')
-            wb.close()
             return mapping
         else:
             print(f'⚠ Excel 第 4 行為空，嘗試從 setting.json 讀取...')
-            wb.close()
             raise ValueError('Row 4 is empty')
     
     except Exception as e:
@@ -97,44 +121,31 @@ def load_field_mapping():
 
 
 def setup_driver(headless: bool = False):
-    """初始化 Selenium WebDriver"""
-    options = Options()
-    if headless:
-        options.add_argument('--headless=new')
-    options.add_argument('--disable-gpu')
-    options.add_argument('--no-sandbox')
-    options.add_argument('--disable-blink-features=AutomationControlled')
-    options.add_experimental_option("excludeSwitches", ["enable-automation"])
-    options.add_experimental_option('useAutomationExtension', False)
-
-    driver = webdriver.Chrome(
-        service=Service(ChromeDriverManager().install()), 
-        options=options
-    )
-    driver.set_window_size(1200, 900)
-    return driver
-
-
-def login(driver, username: str, password: str, timeout: int = 10) -> bool:
-    """登入 SMS"""
+    """初始化 Selenium WebDriver（離線 chromedriver、精簡設定、重用資料夾，見 driver_launch.py）"""
+    return driver_launch.launch(headless=headless)
+
+
+def login(driver, username: str, password: str, timeout: Optional[float] = None) -> bool:
+    """登入 SMS（timeout 預設由 timeout_policy 依歷史耗時決定）"""
     print('[1/6] 連接登入頁面...')
     driver.get(SMS_LOGIN)
+    if 'login' not in driver.current_url.lower():
+        # 重用的瀏覽器資料夾仍保留登入 Cookie，登入頁直接導回首頁
+        print('✓ 已登入（沿用瀏覽器資料夾的 Session）')
+        return True
     try:
-        WebDriverWait(driver, timeout).until(
-            EC.presence_of_element_located((By.ID, 'LoginForm_username'))
-        )
-        print('  填入帳號與密碼...')
-        driver.find_element(By.ID, 'LoginForm_username').send_keys(username)
-        driver.find_element(By.ID, 'LoginForm_password').send_keys(password)
-
-        print('  提交表單...')
-        driver.find_element(By.XPATH, "//button[@type='submit']").click()
-
-        print('  等待登入完成...')
-        WebDriverWait(driver, timeout).until(
-            lambda d: 'login' not in d.current_url.lower()
-        )
-        time.sleep(1)
+        with timeouts.track('login', timeout) as t:
+            t.until(driver, EC.presence_of_element_located((By.ID, 'LoginForm_username')))
+            print('  填入帳號與密碼...')
+            driver.find_element(By.ID, 'LoginForm_username').send_keys(username)
+            driver.find_element(By.ID, 'LoginForm_password').send_keys(password)
+
+            print('  提交表單...')
+            driver.find_element(By.XPATH, "//button[@type='submit']").click()
+
+            print('  等待登入完成...')
+            t.until(driver, lambda d: 'login' not in d.current_url.lower())
+            sms_wait.wait_for_ajax_idle(driver, t.timeout)
         print('✓ 已登入')
         return True
     except Exception as e:
@@ -142,28 +153,45 @@ def login(driver, username: str, password: str, timeout: int = 10) -> bool:
         return False
 
 
-def fill_date_and_activity(driver, date_str: str, activity_code: str, timeout: int = 8) -> bool:
-    """填寫日期與活動代碼"""
+def login_with_session(driver, username: str, password: str, store=None) -> bool:
+    """先還原保存的登入 Session（session_store.SessionStore），無效時才完整登入並保存"""
+    if store is not None and store.restore_driver(driver, username):
+        print('✓ 已還原登入 Session，略過登入')
+        return True
+    if not login(driver, username, password):
+        return False
+    if store is not None:
+        store.save_driver(driver, username)
+    return True
+
+
+def fill_date_and_activity(driver, date_str: str, activity_code: str, timeout: Optional[float] = None,
+                           catalog=None, reload: bool = True) -> bool:
+    """
+    填寫日期與活動代碼（catalog: activity_catalog.ActivityCatalog）
+
+    reload=False 時沿用已預先載入的活動頁（常駐服務在閒置時載入），不在活動頁上才重新載入
+    """
     print('[2/6] 進入活動頁面並填寫基本資料...')
-    driver.get(SMS_ACTIVITY_PAGE)
-    time.sleep(2)
+    if reload or driver.current_url != SMS_ACTIVITY_PAGE:
+        driver.get(SMS_ACTIVITY_PAGE)
 
     try:
-        # 填寫日期 (A1 → ID: StudentPerformanceM_date)
-        print(f'  填寫日期: {date_str}')
-        date_field = WebDriverWait(driver, timeout).until(
-            EC.presence_of_element_located((By.ID, 'StudentPerformanceM_date'))
-        )
-        date_field.clear()
-        date_field.send_keys(date_str)
-        time.sleep(0.5)
-
-        # 填寫活動代碼 (A2 → Select2: StudentPerformanceM_item_id)
-        print(f'  選擇活動: {activity_code}')
-        if not select_activity(driver, activity_code):
-            print('⚠ 活動選擇失敗，但嘗試繼續')
-
-        time.sleep(1)
+        with timeouts.track('fill_date_and_activity', timeout) as t:
+            # 填寫日期 (A1 → ID: StudentPerformanceM_date)
+            print(f'  填寫日期: {date_str}')
+            date_field = t.until(driver, EC.presence_of_element_located((By.ID, 'StudentPerformanceM_date')))
+            sms_wait.wait_for_ajax_idle(driver, t.timeout)
+            date_field.clear()
+            date_field.send_keys(date_str)
+
+            # 填寫活動代碼 (A2 → Select2: StudentPerformanceM_item_id)
+            print(f'  選擇活動: {activity_code}')
+            if not select_activity(driver, activity_code, t.timeout, catalog=catalog):
+                print('⚠ 活動選擇失敗，但嘗試繼續')
+
+            # 選擇活動會觸發 changeGridStudent() 的 AJAX
+            sms_wait.wait_for_ajax_idle(driver, t.timeout)
         print('✓ 基本資料已填寫')
         return True
 
@@ -172,9 +200,30 @@ def fill_date_and_activity(driver, date_str: str, activity_code: str, timeout: i
         return False
 
 
-def select_activity(driver, activity_code: str) -> bool:
-    """透過 Select2 選擇活動"""
+SET_ACTIVITY_JS = """
+var select = $('#StudentPerformanceM_item_id');
+select.val(arguments[0]);
+select.select2('data', {id: arguments[0], text: arguments[1]});
+select.trigger('change');
+return true;
+"""
+
+
+def select_activity(driver, activity_code: str, timeout: int = 8, catalog=None) -> bool:
+    """透過 Select2 選擇活動；有活動索引時直接以 value 設定"""
     try:
+        if catalog is not None:
+            # 查無代碼時以目前頁面的選項更新索引
+            from activity_catalog import driver_refresher
+            activity = catalog.lookup(activity_code, refresher=driver_refresher(driver))
+            if activity is None:
+                print(f'⚠ 活動索引中找不到: {activity_code}')
+                return False
+            driver.execute_script(SET_ACTIVITY_JS, activity.value, activity.name)
+            sms_wait.wait_for_select2_value(driver, timeout=timeout)
+            print(f'  活動: {activity.name}（item_id={activity.value}）')
+            return True
+
         # 嘗試方法 1: Select2 搜尋
         script = f"""
         var select = $('#StudentPerformanceM_item_id');
@@ -188,13 +237,14 @@ def select_activity(driver, activity_code: str) -> bool:
         return true;
         """
         driver.execute_script(script)
-        time.sleep(1)
 
-        # 嘗試點擊搜尋結果
+        # 嘗試點擊搜尋結果（結果出現即點擊，不再固定等待）
         try:
-            result = driver.find_element(By.CSS_SELECTOR, '.select2-result-label')
+            result = WebDriverWait(driver, 2, poll_frequency=sms_wait.POLL).until(
+                EC.element_to_be_clickable((By.CSS_SELECTOR, '.select2-result-label'))
+            )
             result.click()
-            time.sleep(1)
+            sms_wait.wait_for_select2_value(driver, timeout=timeout)
             return True
         except:
             pass
@@ -216,7 +266,7 @@ def select_activity(driver, activity_code: str) -> bool:
         """
         result = driver.execute_script(script2)
         if result:
-            time.sleep(1)
+            sms_wait.wait_for_select2_value(driver, timeout=timeout)
             return True
 
         print('⚠ 活動搜尋失敗')
@@ -226,19 +276,17 @@ def select_activity(driver, activity_code: str) -> bool:
         return False
 
 
-def click_student_list_button(driver, timeout: int = 8) -> bool:
+def click_student_list_button(driver, timeout: Optional[float] = None) -> bool:
     """點擊學生名單按鈕"""
     print('[3/6] 點擊學生名單按鈕...')
     try:
-        btn = WebDriverWait(driver, timeout).until(
-            EC.element_to_be_clickable((By.ID, 'yw4'))
-        )
-        btn.click()
-        print('  等待班級選擇下拉出現...')
-        WebDriverWait(driver, timeout).until(
-            EC.presence_of_element_located((By.ID, 'class_id'))
-        )
-        time.sleep(1)
+        with timeouts.track('click_student_list_button', timeout) as t:
+            btn = t.until(driver, EC.element_to_be_clickable((By.ID, 'yw4')))
+            btn.click()
+            print('  等待班級選擇下拉出現...')
+            t.until(driver, EC.visibility_of_element_located((By.ID, 'class_id')))
+            # showModal() 會呼叫 changeGridStudentList() 載入第一個班級
+            sms_wait.wait_for_ajax_idle(driver, t.timeout)
         print('✓ 學生名單已打開')
         return True
     except Exception as e:
@@ -246,34 +294,30 @@ def click_student_list_button(driver, timeout: int = 8) -> bool:
         return False
 
 
-def select_class(driver, class_short: str, timeout: int = 8) -> bool:
-    """選擇班級"""
+def select_class(driver, class_short: str, timeout: Optional[float] = None) -> bool:
+    """選擇班級（以 class_resolver 的別名表解析，依 value 單次選擇並等待表格更新）"""
     try:
-        sel = WebDriverWait(driver, timeout).until(
-            EC.presence_of_element_located((By.ID, 'class_id'))
-        )
-        select = Select(sel)
-
-        # 匹配班級簡寫（括號內或尾部）
-        matched_value = None
-        for opt in sel.find_elements(By.TAG_NAME, 'option'):
-            text = opt.text.strip()
-            if f'({class_short})' in text or text.endswith(class_short):
-                matched_value = opt.get_attribute('value')
-                break
-
-        if not matched_value:
+        with timeouts.track('select_class', timeout) as t:
+            resolver = class_resolver.for_driver(driver, t.timeout)
+            matched_value = resolver.resolve(class_short)
+            if not matched_value:
+                t.fail()
+                reason = '（有歧義）' if resolver.is_ambiguous(class_short) else ''
+                print(f'⚠ 找不到班級: {class_short}{reason}')
+                return False
+
+            # 已是目前班級時不會觸發 onchange；否則等待 changeGridStudentList() 以 AJAX 替換 #student-grid
+            # （延長等待時再次呼叫會得到 'same'，改為等待 AJAX 完成）
+            # 沒有送出請求的選班不計入 grid 耗時，否則接近 0 的樣本會拉低基準
+            busy = nullcontext() if class_resolver.is_selected(driver, matched_value) else rate_control.slot('grid')
+            with busy:
+                selected = t.wait(driver, lambda wait: class_resolver.select(driver, matched_value, wait))
+            if not selected:
+                t.fail()
+        if not selected:
             print(f'⚠ 找不到班級: {class_short}')
             return False
-
-        select.select_by_value(matched_value)
         print(f'  已選擇班級: {class_short}')
-
-        # 等待表格載入
-        WebDriverWait(driver, timeout).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, 'table.table tbody tr'))
-        )
-        time.sleep(0.8)
         return True
 
     except Exception as e:
@@ -281,291 +325,649 @@ def select_class(driver, class_short: str, timeout: int = 8) -> bool:
         return False
 
 
-def find_student_in_table(driver, student_id: str) -> Optional[Dict]:
-    """在表格中查找學生並返回資料及操作按鈕"""
-    try:
-        rows = driver.find_elements(By.CSS_SELECTOR, 'table.table tbody tr')
-        for r in rows:
-            cols = r.find_elements(By.TAG_NAME, 'td')
-            if not cols or len(cols) < 5:
-                continue
-            stu_no = cols[0].text.strip()
-            if stu_no == str(student_id):
-                # cols[0]=學號, cols[1]=英文名, cols[2]=中文名, cols[3]=班級, cols[4]=操作（含按鈕）
-                name_en = cols[1].text.strip()
-                
-                # 尋找該列的「添加」按鈕
-                try:
-                    btn = r.find_element(By.CSS_SELECTOR, 'a.btn[onclick*="addToEkstra"]')
-                    return {
-                        'student_no': stu_no,
-                        'name_en': name_en,
-                        'button': btn
-                    }
-                except:
-                    print(f'    ⚠ 找到學生 {student_id}，但找不到操作按鈕')
-                    return None
-        return None
-    except Exception as e:
-        print(f'✗ 表格查詢錯誤: {e}')
-        return None
+SNAPSHOT_GRID_JS = """
+var rows = document.querySelectorAll('#student-grid tbody tr');
+if (!rows.length) rows = document.querySelectorAll('table.table tbody tr');
+var out = {};
+for (var i = 0; i < rows.length; i++) {
+    var btn = rows[i].querySelector('a[onclick*="addToEkstra"]');
+    var cells = rows[i].getElementsByTagName('td');
+    if (!btn || cells.length < 5) continue;
+    var no = (btn.getAttribute('data-student_no') || cells[0].textContent).trim();
+    out[no] = [
+        (btn.getAttribute('data-student_name') || cells[1].textContent).trim(),
+        (btn.getAttribute('data-student_cname') || cells[2].textContent).trim(),
+        btn.getAttribute('data-student_id') || ''
+    ];
+}
+return out;
+"""
 
+ADD_BATCH_JS = """
+var ids = arguments[0], done = [];
+var parent = document.querySelector('#student-performance-m-grid tbody');
+for (var i = 0; i < ids.length; i++) {
+    var exists = false;
+    if (parent) {
+        var trs = parent.getElementsByTagName('tr');
+        for (var j = 0; j < trs.length; j++) {
+            if (trs[j].className.trim() === ids[i]) { exists = true; break; }
+        }
+    }
+    // 已在名單中就不再點擊（避免 addToEkstra 跳出重複 alert）
+    if (!exists) {
+        var btn = document.querySelector('a[onclick*="addToEkstra"][data-student_id="' + ids[i] + '"]');
+        if (!btn) continue;
+        btn.click();
+    }
+    done.push(ids[i]);
+}
+return done;
+"""
 
-def main():
-    if not os.path.exists(EXCEL_FILE):
-        print(f'✗ 找不到 Excel: {EXCEL_FILE}')
-        return
 
-    # 帳號密碼（寫死）
-    username = 'schhs334'
-    password = 'schhs334'
+ADD_FROM_CACHE_JS = """
+var records = arguments[0], done = [];
+var parent = document.querySelector('#student-performance-m-grid tbody');
+for (var i = 0; i < records.length; i++) {
+    var r = records[i];
+    if (!(parent && parent.querySelector('tr[class="' + r.student_id + '"]'))) {
+        // 以快取資料重建「添加」按鈕的 data-* 屬性，直接呼叫頁面的 addToEkstra
+        var a = document.createElement('a');
+        for (var k in r) a.setAttribute('data-' + k, r[k]);
+        window.addToEkstra(a);
+    }
+    done.push(r.student_id);
+}
+return done;
+"""
 
-    headless = bool(os.getenv('HEADLESS'))
+GRID_MARK_JS = """
+var btn = document.querySelector('#student-grid a[onclick*="addToEkstra"]');
+return btn ? btn.getAttribute('data-mark_item') : null;
+"""
 
-    # 讀取欄位對應
-    print('[0/6] 讀取設定和 Excel 資料...')
-    field_map = load_field_mapping()
-    
-    # 讀取 Excel
-    print('[0/6] 讀取 Excel 資料...')
-    wb = load_workbook(EXCEL_FILE)
-    ws = wb.active
 
-    # 讀取事件資訊
-    date_val = ws['A1'].value
-    activity_code = ws['A2'].value
+def snapshot_student_grid(driver) -> Dict[str, tuple]:
+    """以單次 execute_script 取得目前班級表格，返回 {學號: (英文名, 中文名, 內部 ID)}"""
+    data = driver.execute_script(SNAPSHOT_GRID_JS) or {}
+    return {no: tuple(v) for no, v in data.items()}
+
+
+def add_students_batch(driver, internal_ids: List[str], timeout: int = 8) -> List[str]:
+    """以單次 execute_script 觸發多位學生的 addToEkstra，並等待全部出現在父頁表格"""
+    with rate_control.slot('add'):
+        added = driver.execute_script(ADD_BATCH_JS, [str(i) for i in internal_ids]) or []
+        if added:
+            sms_wait.wait_for_rows_added(driver, added, timeout=timeout)
+    return added
+
+
+def add_students_from_cache(driver, records: List[Dict[str, str]], timeout: int = 8) -> List[str]:
+    """
+    不開啟學生名單，以名冊快取的資料直接呼叫 addToEkstra
+
+    Args:
+        records: [{'student_id', 'student_no', 'student_name', 'student_cname',
+                   'class_name', 'class_id', 'mark_item'}]
+    """
+    with rate_control.slot('add'):
+        added = driver.execute_script(ADD_FROM_CACHE_JS, records) or []
+        if added:
+            sms_wait.wait_for_rows_added(driver, added, timeout=timeout)
+    return added
+
+
+FILL_ROWS_JS = """
+var remarks = arguments[0], bonus = arguments[1], results = {};
+var rows = document.querySelectorAll('#student-performance-m-grid tbody tr');
+if (!rows.length) rows = document.querySelectorAll('table.table tbody tr');
+var fire = function (el, type) { el.dispatchEvent(new Event(type, {bubbles: true})); };
+for (var i = 0; i < rows.length; i++) {
+    var cells = rows[i].getElementsByTagName('td');
+    if (cells.length < 5) continue;
+    var no = cells[0].textContent.trim();
+    if (!remarks.hasOwnProperty(no) || results[no] === 'ok') continue;
+    var id = (rows[i].className || '').trim();
+    var prefix = 'StudentPerformanceM[inputperformance][' + id + ']';
+    var sel = id ? document.querySelector('select[name="' + prefix + '[type_of_bonus]"]') : null;
+    var area = id ? document.getElementById('StudentPerformanceM_inputperformance_' + id + '_remark') : null;
+    if (!sel) { results[no] = 'no_select'; continue; }
+    sel.value = bonus;
+    fire(sel, 'change');
+    if (!area) { results[no] = 'no_remark'; continue; }
+    area.value = remarks[no];
+    fire(area, 'input');
+    fire(area, 'change');
+    results[no] = 'ok';
+}
+for (var k in remarks) if (!results.hasOwnProperty(k)) results[k] = 'not_on_page';
+return results;
+"""
 
-    if not date_val or not activity_code:
-        print('✗ Excel A1 或 A2 為空')
-        return
+EXISTING_RECORDS_JS = """
+var out = [];
+var rows = document.querySelectorAll('#student-performance-m-grid tbody tr');
+for (var i = 0; i < rows.length; i++) {
+    var cells = rows[i].getElementsByTagName('td');
+    if (cells.length && rows[i].querySelector('a[onclick*="delValue"]')) out.push(cells[0].textContent.trim());
+}
+return out;
+"""
 
-    # 轉換日期格式
-    try:
-        if isinstance(date_val, str):
-            date_str = date_val
-        else:
-            # 若為 datetime 物件，轉為 yyyy-MM-dd
-            date_str = date_val.strftime('%Y-%m-%d')
-    except Exception as e:
-        print(f'✗ 日期轉換失敗: {e}')
-        return
+FILL_STATUS_TEXT = {
+    'no_select': '找不到「奪勵分數類型」選單（可能是舊資料）',
+    'no_remark': '找不到備註欄位',
+    'not_on_page': '不在頁面表格中',
+}
 
-    print(f'  日期: {date_str}, 活動: {activity_code}')
 
-    # 讀取學生清單（Row 5+）
-    # Row 4 是標題列
-    students_by_class = defaultdict(list)  # class_short -> [(row_idx, student_id), ...]
-    seen_pairs = set()  # 用來去重：(class, student_id)
+def read_existing_records(driver) -> List[str]:
+    """返回父頁表格中 SMS 已有紀錄（帶 delValue 刪除鈕）的學號"""
+    return driver.execute_script(EXISTING_RECORDS_JS) or []
 
-    class_col = field_map.get('class', field_map.get('Class', 1))
-    student_id_col = field_map.get('studentid', field_map.get('studentId', field_map.get('student_id', 2)))
-    
-    print(f'  班級欄: {class_col}, 學號欄: {student_id_col}')
 
-    for row_idx in range(5, ws.max_row + 1):
-        class_val = ws.cell(row=row_idx, column=class_col).value
-        id_val = ws.cell(row=row_idx, column=student_id_col).value
+def fill_performance_rows(driver, remarks: Dict[str, str], bonus_type: str = '1') -> Dict[str, str]:
+    """
+    以單次 execute_script 為所有學生選擇「奪勵分數類型」並填寫備註
 
-        if not id_val:
-            continue
+    Args:
+        remarks: {學號: 備註}
+        bonus_type: type_of_bonus 的值（"1" = 校外學藝）
 
-        class_short = str(class_val).strip() if class_val else ''
-        if not class_short:
-            continue
+    Returns:
+        {學號: 'ok' | 'no_select' | 'no_remark' | 'not_on_page'}
+    """
+    payload = {str(k): '' if v is None else str(v) for k, v in remarks.items()}
+    return driver.execute_script(FILL_ROWS_JS, payload, bonus_type) or {}
 
-        student_id = str(id_val).strip()
-        pair = (class_short, student_id)
-        
-        # 去重：只保留第一次出現
-        if pair in seen_pairs:
-            print(f'  [去重] 跳過重複的 {class_short} - {student_id}（第 {row_idx} 行）')
-            continue
-        
-        seen_pairs.add(pair)
-        students_by_class[class_short].append((row_idx, student_id))
 
-    if not students_by_class:
-        print('✗ Excel 中無學生資料')
-        return
+def load_upload_sheet(excel_file: Optional[str] = None, sheet_name: Optional[str] = None) -> Optional[LoadedSheet]:
+    """
+    以唯讀模式單次讀取 Upload.xlsx 格式的工作表（A1 日期、A2 活動代碼、第 4 行標題、第 5 行起學生）
 
-    print(f'✓ 讀取到 {len(students_by_class)} 個班級，共 {sum(len(v) for v in students_by_class.values())} 位學生')
+    Returns:
+        LoadedSheet(job, field_map, duplicates, incomplete)；之後各步驟只使用此記憶體結構，不再開啟 Excel
+        學號讀取時經 normalize_student_id 正規化；缺少學號或班級的列記入 incomplete
+    """
+    excel_file = excel_file or EXCEL_FILE
+    print('[0/6] 讀取 Excel 資料...')
+    wb = load_workbook(excel_file, read_only=True)
+    try:
+        ws = wb[sheet_name] if sheet_name else wb.active
+        rows = ws.iter_rows(values_only=True)
+        head = [next(rows, ()) for _ in range(4)]  # 第 1–4 行
 
-    # 初始化瀏覽器
-    driver = setup_driver(headless=headless)
-    found_count = 0
-    missing_count = 0
+        # 讀取事件資訊
+        date_val = head[0][0] if head[0] else None
+        activity_code = head[1][0] if head[1] else None
+        field_map = load_field_mapping(header_row=head[3])
 
-    try:
-        # 登入
-        if not login(driver, username, password):
-            return
+        if not date_val or not activity_code:
+            print('✗ Excel A1 或 A2 為空')
+            return None
 
-        # 填寫日期與活動
-        if not fill_date_and_activity(driver, date_str, str(activity_code)):
-            return
+        # 轉換日期格式
+        try:
+            date_str = format_date(date_val)
+        except Exception as e:
+            print(f'✗ 日期轉換失敗: {e}')
+            return None
+
+        print(f'  日期: {date_str}, 活動: {activity_code}')
+
+        # 讀取學生清單（Row 5+），欄位索引轉為 0 起算
+        class_idx = field_map.get('class', field_map.get('Class', 1)) - 1
+        student_id_idx = field_map.get('studentid', field_map.get('studentId', field_map.get('student_id', 2))) - 1
+        award_idx = field_map.get('award', field_map.get('Award', 4)) - 1
+        name_idx = field_map.get('name', 3) - 1
+        print(f'  班級欄: {class_idx + 1}, 學號欄: {student_id_idx + 1}')
+
+        def cell(row, idx):
+            return row[idx] if 0 <= idx < len(row) else None
+
+        students = []
+        duplicates = []
+        incomplete = []
+        seen_pairs = set()  # 用來去重：(class, student_id)
+        for row_idx, row in enumerate(rows, start=5):
+            id_val = normalize_student_id(cell(row, student_id_idx))
+            class_val = cell(row, class_idx)
+            class_short = str(class_val).strip() if class_val else ''
+            if not id_val or not class_short:
+                # 缺少學號（或班級）的列不上傳，但保留下來供 student_match.py 比對
+                name = cell(row, name_idx) or ''
+                if name or class_short or id_val:
+                    print(f'  ⚠ 第 {row_idx} 行缺少{"學號" if not id_val else "班級"}，略過')
+                    incomplete.append(StudentRow(class_short, id_val, str(name).strip(),
+                                                 str(cell(row, award_idx) or ''), row_idx))
+                continue
+
+            student_id = id_val
+            pair = (class_short, student_id)
+
+            # 去重：只保留第一次出現
+            if pair in seen_pairs:
+                print(f'  [去重] 跳過重複的 {class_short} - {student_id}（第 {row_idx} 行）')
+                duplicates.append((row_idx, class_short, student_id))
+                continue
+
+            seen_pairs.add(pair)
+            name = cell(row, name_idx) or ''
+            award = cell(row, award_idx) or ''
+            students.append(StudentRow(class_short, student_id, str(name), str(award), row_idx))
+    finally:
+        wb.close()
+
+    source = os.path.basename(excel_file) + (f'!{sheet_name}' if sheet_name else '')
+    job = UploadJob(date_str, str(activity_code).strip(), '', tuple(students), source)
+    return LoadedSheet(job, field_map, tuple(duplicates), tuple(incomplete))
 
-        # 點擊學生名單
-        if not click_student_list_button(driver):
-            return
 
-        # [4/6] 逐班級查詢學生
-        print('[4/6] 逐班級查詢學生英文名...')
-        class_count = 0
+def read_upload_job(excel_file: Optional[str] = None, sheet_name: Optional[str] = None) -> Optional[UploadJob]:
+    """讀取 Upload.xlsx 格式的工作表，返回 UploadJob"""
+    loaded = load_upload_sheet(excel_file, sheet_name)
+    return loaded.job if loaded else None
 
-        for class_short, entries in sorted(students_by_class.items()):
-            class_count += 1
-            print(f'\n  [{class_count}/{len(students_by_class)}] 班級: {class_short}（{len(entries)} 位）')
+
+def run_event(driver, job: UploadJob, roster=None, catalog=None, journal=None, report=None,
+              warm: bool = False) -> Dict:
+    """
+    在已登入的瀏覽器中完成一個活動：填寫日期與活動、添加學生、填寫備註、提交
+
+    Args:
+        roster: roster_cache.RosterCache；已快取的班級不再開啟學生名單選班查詢
+        catalog: activity_catalog.ActivityCatalog；以活動代碼直接設定 item_id
+        journal: upload_journal.UploadJournal；記錄進度，已提交的學生重跑時跳過
+        report: run_report.RunReport；記錄班級與學生的 span（階段 span 由 timer 轉送）
+        warm: 瀏覽器已停在剛載入、尚未填寫的活動頁（upload_daemon 預先載入），不再重新載入
+
+    Returns:
+        {'found': 成功添加數, 'missing': 未找到數, 'submitted': 是否已提交}
+    """
+    try:
+        return _run_event(driver, job, roster, catalog, journal, report, warm)
+    finally:
+        timer.stop()  # 中途返回或出錯時也結束最後一個階段
+
+
+def _run_event(driver, job: UploadJob, roster, catalog, journal, report, warm: bool) -> Dict:
+    stats = {'found': 0, 'missing': 0, 'submitted': False}
+    if report is not None:
+        report.job = job.key
+    class_of = {s.student_id: s.class_short for s in job.students}
+
+    def student_outcome(class_short: Optional[str], student_ids, outcome: str, **attrs):
+        """class_short 為 None 時以工作表中的班級記錄"""
+        if report is not None:
+            for sid in student_ids:
+                report.student(class_short or class_of.get(str(sid), ''), sid, outcome, **attrs)
+
+    def stage(name: str):
+        timer.start(name)
+        if journal is not None:
+            journal.stage(job.key, name)
+
+    def skip_done(done: set, reason: str) -> UploadJob:
+        remaining = tuple(s for s in job.students if s.student_id not in done)
+        if len(remaining) < len(job.students):
+            print(f'  [續傳] {len(job.students) - len(remaining)} 位{reason}，剩 {len(remaining)} 位')
+        return job._replace(students=remaining)
+
+    if journal is not None:
+        job = skip_done(journal.done_students(job.key), '已提交')
+        if not job.students:
+            print(f'✓ {job.key} 已全部提交，跳過')
+            stats['submitted'] = True
+            return stats
+
+    # 填寫日期與活動
+    stage('[2/6] 日期與活動')
+    if not fill_date_and_activity(driver, job.date, job.code, catalog=catalog, reload=not warm):
+        return stats
+    item_id = driver.execute_script(
+        "var el = document.getElementById('StudentPerformanceM_item_id'); return el ? el.value : '';") or ''
+
+    # 同一日期 + 活動在 SMS 上已有紀錄的學生不再添加（避免重複提交）
+    existing = set(read_existing_records(driver)) & {s.student_id for s in job.students}
+    if existing:
+        if journal is not None:
+            journal.students(job.key, 'existing', sorted(existing))
+        for s in job.students:
+            if s.student_id in existing:
+                student_outcome(s.class_short, [s.student_id], 'existing')
+        job = skip_done(existing, '在 SMS 上已有紀錄')
+        if not job.students:
+            stats['submitted'] = True
+            return stats
+    students_by_class = job.by_class()
+    remarks = job.remarks()
+
+    # 點擊學生名單（全部班級都已快取時不需要開啟）
+    stage('[3/6] 學生名單')
+    modal_open = False
+
+    # [4/6] 逐班級查詢學生
+    print('[4/6] 逐班級查詢學生英文名...')
+    stage('[4/6] 選班與添加')
+    class_count = 0
+    added_nos = []
+
+    for class_short, entries in sorted(students_by_class.items()):
+        class_count += 1
+        print(f'\n  [{class_count}/{len(students_by_class)}] 班級: {class_short}（{len(entries)} 位）')
+        class_span = report.begin('class', class_short, students=len(entries)) if report is not None else None
+
+        # 名冊快取以班級簡寫為鍵；工作表寫「高三忠」或「s3a」時先轉為 S3A
+        cache_key = (roster.canonical_class(class_short) or class_short) if roster is not None else class_short
+        cached = roster.roster(cache_key) if roster is not None else None
+        class_value = roster.class_value(cache_key) if roster is not None else None
+        mark = roster.item_mark(item_id) if roster is not None else None
+        if cached is not None and class_value and mark is not None:
+            # 名冊快取命中：以學號 O(1) 查找，直接以快取資料添加
+            print('    （使用名冊快取）')
+            grid = cached
+        else:
+            if not modal_open:
+                if not click_student_list_button(driver):
+                    return stats
+                modal_open = True
 
             # 選擇班級
             if not select_class(driver, class_short):
                 print(f'    跳過班級 {class_short}')
-                missing_count += len(entries)
+                stats['missing'] += len(entries)
+                student_outcome(class_short, [sid for _, sid in entries], 'missing')
+                if class_span is not None:
+                    report.end(class_span, 'skipped')
                 continue
 
-            # 逐個查找該班學生
-            for row_idx, student_id in entries:
-                result = find_student_in_table(driver, student_id)
-                if result:
-                    name_en = result['name_en']
-                    btn = result['button']
-                    print(f'    ✓ {student_id} → {name_en}')
-                    
-                    # 點擊「添加」按鈕
-                    try:
-                        btn.click()
-                        time.sleep(0.8)  # 延長延遲，讓 JavaScript 完成
-                        print(f'      已添加到名單')
-                        
-                        # ...不再寫入英文名到 Excel...
-                        found_count += 1
-                    except Exception as e:
-                        print(f'      ⚠ 點擊按鈕失敗: {e}')
-                        missing_count += 1
+            # 一次擷取整班表格，之後以學號 O(1) 查找
+            grid = snapshot_student_grid(driver)
+            if roster is not None and grid:
+                resolver = class_resolver.for_driver(driver)
+                if not class_value:
+                    roster.put_classes(resolver.options)
+                cache_key = resolver.canonical(class_short) or cache_key
+                roster.put_roster(cache_key, grid, (item_id, driver.execute_script(GRID_MARK_JS) or ''))
+
+        to_add, no_of, not_found = [], {}, []
+        for row_idx, student_id in entries:
+            info = grid.get(str(student_id))
+            if info:
+                name_en, _, internal_id = info
+                print(f'    ✓ {student_id} → {name_en}')
+                to_add.append(internal_id)
+                no_of[internal_id] = str(student_id)
+            else:
+                print(f'    ⚠ {student_id} 未找到')
+                stats['missing'] += 1
+                not_found.append(student_id)
+        if journal is not None:
+            journal.students(job.key, 'missing', not_found)
+        student_outcome(class_short, not_found, 'missing')
+
+        # 一次觸發該班所有「添加」
+        added = []
+        if to_add:
+            try:
+                if grid is cached:
+                    by_id = {v[2]: (no, v) for no, v in cached.items()}
+                    added = add_students_from_cache(driver, [
+                        {'student_id': iid, 'student_no': by_id[iid][0], 'student_name': by_id[iid][1][0],
+                         'student_cname': by_id[iid][1][1], 'class_name': class_short,
+                         'class_id': class_value, 'mark_item': mark}
+                        for iid in to_add
+                    ])
                 else:
-                    print(f'    ⚠ {student_id} 未找到')
-                    missing_count += 1
-
-        # [5/6] 關閉 Modal，返回上一頁
-        print(f'\n[5/6] 關閉學生名單...')
+                    added = add_students_batch(driver, to_add)
+                print(f'      已添加 {len(added)} 位到名單')
+                stats['found'] += len(added)
+                stats['missing'] += len(to_add) - len(added)
+                added_nos.extend(no_of[i] for i in added if i in no_of)
+                if journal is not None:
+                    journal.students(job.key, 'added', [no_of[i] for i in added if i in no_of])
+                student_outcome(class_short, [no_of[i] for i in added if i in no_of], 'added')
+                student_outcome(class_short, [no_of[i] for i in to_add if i not in added], 'add_failed')
+            except Exception as e:
+                print(f'      ⚠ 批次添加失敗: {e}')
+                stats['missing'] += len(to_add)
+                student_outcome(class_short, no_of.values(), 'add_failed')
+
+        if class_span is not None:
+            report.end(class_span, 'partial' if not_found or len(added) < len(to_add) else 'ok')
+            report.amortize(class_span, [sid for _, sid in entries])
+
+    # [5/6] 關閉 Modal，返回上一頁
+    print(f'\n[5/6] 關閉學生名單...')
+    stage('[5/6] 關閉名單')
+    if not modal_open:
+        print('✓ 未開啟學生名單')
+    else:
         try:
             # 尋找 Modal 關閉按鈕（class="close"）
             close_btn = driver.find_element(By.CSS_SELECTOR, '#studentModal a.close')
             close_btn.click()
-            time.sleep(1)
+            WebDriverWait(driver, 8, poll_frequency=sms_wait.POLL).until(
+                EC.invisibility_of_element_located((By.ID, 'studentModal'))
+            )
             print('✓ Modal 已關閉，回到上一頁')
         except Exception as e:
             print(f'⚠ 關閉 Modal 失敗，嘗試用 Escape 鍵: {e}')
             try:
                 driver.find_element(By.TAG_NAME, 'body').send_keys(Keys.ESCAPE)
-                time.sleep(1)
+                WebDriverWait(driver, 8, poll_frequency=sms_wait.POLL).until(
+                    EC.invisibility_of_element_located((By.ID, 'studentModal'))
+                )
             except:
                 pass
 
-        # [5.5/6] 步驟 9.5 和 9.6：為每位學生填寫「奪勵分數類型」和「備註」
-        print('\n[5.5/6] 填寫奪勵分數類型和備註...')
-        time.sleep(1)  # 等待頁面加載完成
-        
+    # [5.5/6] 步驟 9.5 和 9.6：為每位學生填寫「奪勵分數類型」和「備註」
+    print('\n[5.5/6] 填寫奪勵分數類型和備註...')
+    stage('[5.5/6] 填寫備註')
+    sms_wait.wait_for_ajax_idle(driver)
+
+    try:
+        # 只處理本次添加的學生：學號 → 備註（award 欄）索引已在讀取 Excel 時建立
+        added_remarks = {student_no: remarks.get(student_no, '') for student_no in added_nos}
+        print(f'  本次添加的學生: {set(added_remarks)}')
+
+        # 單次 execute_script 完成所有「校外學藝」選擇與備註填寫
+        results = fill_performance_rows(driver, added_remarks)
+        processed_count = 0
+        for student_no, status in results.items():
+            if status == 'ok':
+                processed_count += 1
+                print(f'  ✓ {student_no} 已選擇「校外學藝」並填寫備註: {added_remarks[student_no]}')
+            else:
+                print(f'  ⚠ {student_no} {FILL_STATUS_TEXT.get(status, status)}')
+
+        print(f'✓ 已完成填寫 {processed_count} 位學生的奪勵分數類型和備註')
+        if journal is not None:
+            journal.students(job.key, 'filled', [no for no, status in results.items() if status == 'ok'])
+        for student_no in added_nos:
+            status = results.get(student_no, 'not_found')
+            student_outcome(None, [student_no], 'filled' if status == 'ok' else 'fill_failed', detail=status)
+    
+    except Exception as e:
+        print(f'⚠ 步驟 9.5/9.6 出錯: {e}')
+
+    # [6/6] 點擊「創建」按鈕
+    print('\n[6/6] 提交表單...')
+    stage('[6/6] 提交')
+    try:
+        with timeouts.track('submit') as t:
+            submit_btn = t.until(driver, EC.element_to_be_clickable((By.ID, 'yw7')))
+            with rate_control.slot('submit'):
+                submit_btn.click()
+                # 等待表單送出後頁面重新載入
+                t.until(driver, EC.staleness_of(submit_btn))
+                sms_wait.wait_for_ajax_idle(driver, t.timeout)
+        stats['submitted'] = True
+        if journal is not None:
+            journal.students(job.key, 'submitted', added_nos)
+        student_outcome(None, added_nos, 'submitted')
+        print('✓ 已提交')
+    except Exception as e:
+        print(f'⚠ 提交失敗: {e}')
+        student_outcome(None, added_nos, 'submit_failed')
+    return stats
+
+
+def main():
+    capture = os.getenv('SMS_CAPTURE')
+    if not capture:
+        return _main()
+    # 經本機錄製代理連線，結束時寫出封存檔
+    import sms_capture
+    upstream = SMS_BASE_URL
+    anonymize = os.getenv('SMS_CAPTURE_ANONYMIZE', '1') != '0'
+    if not anonymize:
+        print('⚠ SMS_CAPTURE_ANONYMIZE=0：封存檔會保留學生真實姓名，請勿分享')
+    recorder = sms_capture.start_recorder(capture, upstream, anonymize=anonymize)
+    use_base_url(recorder.base_url)
+    try:
+        # 代理每次使用隨機埠：不保存 / 還原登入 Session（避免以代理網址存下正式 Cookie），
+        # 也讓封存檔一定包含重播所需的登入流程
+        return _main(sessions=False)
+    finally:
+        use_base_url(upstream)
+        recorder.shutdown()
+        print(f'✓ 已錄製 {recorder.capture.count} 個請求 → {recorder.capture.save()}')
+
+
+def _main(sessions: bool = True):
+    from run_report import RunReport, safe_console
+    safe_console()
+    report = RunReport().attach(timer)
+
+    if not os.path.exists(EXCEL_FILE):
+        print(f'✗ 找不到 Excel: {EXCEL_FILE}')
+        return
+
+    # 帳號密碼（寫死）
+    username = 'schhs334'
+    password = 'schhs334'
+
+    headless = bool(os.getenv('HEADLESS'))
+    backend = os.getenv('SMS_BACKEND', 'selenium').strip().lower()  # selenium | http
+
+    # 讀取欄位對應與學生資料
+    print('[0/6] 讀取設定和 Excel 資料...')
+    timer.start('[0/6] 讀取 Excel')
+    loaded = load_upload_sheet(EXCEL_FILE)
+    if loaded is None:
+        return
+    job = loaded.job
+    if loaded.duplicates:
+        print(f'  [去重] 共跳過 {len(loaded.duplicates)} 筆重複資料')
+    if not job.students:
+        print('✗ Excel 中無學生資料')
+        return
+
+    students_by_class = job.by_class()
+    print(f'✓ 讀取到 {len(students_by_class)} 個班級，共 {len(job.students)} 位學生')
+
+    # 登入 Session 保存（瀏覽器與 HTTP 共用，有效時略過登入）
+    from session_store import SessionStore
+    store = SessionStore() if sessions else None
+
+    # 開啟瀏覽器前先以活動索引檢查 A2（查無時以 HTTP 重新擷取一次）
+    from activity_catalog import ActivityCatalog, http_refresher
+    catalog = ActivityCatalog()
+    activity = catalog.lookup(job.code, refresh=False)
+    if activity is None:
+        import sms_http
         try:
-            # 建立一個集合，只包含我們剛才添加的學生學號
-            added_students_set = set()
-            for class_short, entries in students_by_class.items():
-                for _, student_id in entries:
-                    added_students_set.add(str(student_id))
-            
-            print(f'  本次添加的學生: {added_students_set}')
-            
-            # 抓取頁面表格中的所有行
-            table_rows = driver.find_elements(By.CSS_SELECTOR, 'table.table tbody tr')
-            print(f'  頁面表格總共 {len(table_rows)} 行（包含舊資料）')
-            
-            processed_count = 0
-            for row in table_rows:
-                try:
-                    cols = row.find_elements(By.TAG_NAME, 'td')
-                    if not cols or len(cols) < 5:
-                        continue
-                    
-                    # 從表格第 1 欄（cols[0]）抓取學號
-                    student_no_from_page = cols[0].text.strip()
-                    
-                    # 只處理我們本次添加的學生
-                    if student_no_from_page not in added_students_set:
-                        continue
-                    
-                    processed_count += 1
-                    print(f'  處理學號: {student_no_from_page}')
-                    
-                    # 在 Excel 中查找相同學號的行
-                    excel_remark = None
-                    for row_idx in range(5, ws.max_row + 1):
-                        excel_student_id = ws.cell(row=row_idx, column=student_id_col).value
-                        if str(excel_student_id).strip() == student_no_from_page:
-                            # 備註欄位是 'award' 欄位
-                            award_col = field_map.get('award', field_map.get('Award', 4))
-                            excel_remark = ws.cell(row=row_idx, column=award_col).value or ""
-                            print(f'    ✓ 匹配到 Excel 行 {row_idx}，備註: {excel_remark}')
-                            break
-                    
-                    if excel_remark is None:
-                        print(f'    ⚠ 在 Excel 中未找到學號 {student_no_from_page}')
-                        continue
-                    
-                    # 從表格行的 class 屬性提取內部 ID
-                    tr_class = row.get_attribute('class')
-                    internal_id = tr_class.strip() if tr_class else None
-                    
-                    if not internal_id:
-                        print(f'    ⚠ 無法獲取內部 ID')
-                        continue
-                    
-                    # 9.5: 選擇「校外學藝」
-                    try:
-                        select_elem = driver.find_element(
-                            By.CSS_SELECTOR,
-                            f'select[name="StudentPerformanceM[inputperformance][{internal_id}][type_of_bonus]"]'
-                        )
-                        select_obj = Select(select_elem)
-                        select_obj.select_by_value("1")  # "1" = 校外學藝
-                        print(f'    ✓ 已選擇「校外學藝」')
-                    except Exception as e:
-                        print(f'    ⚠ 選擇「校外學藝」失敗: {e}')
-                    
-                    # 9.6: 填寫備註
-                    try:
-                        textarea_elem = driver.find_element(
-                            By.ID,
-                            f'StudentPerformanceM_inputperformance_{internal_id}_remark'
-                        )
-                        textarea_elem.clear()
-                        textarea_elem.send_keys(str(excel_remark))
-                        print(f'    ✓ 已填寫備註: {excel_remark}')
-                    except Exception as e:
-                        print(f'    ⚠ 填寫備註失敗: {e}')
-                
-                except Exception as e:
-                    print(f'  ⚠ 處理行時出錯: {e}')
-            
-            print(f'✓ 已完成填寫 {processed_count} 位學生的奪勵分數類型和備註')
-        
+            probe = sms_http.SmsHttpSession(SMS_BASE_URL)
+            restored = store is not None and store.restore_http(probe, username)
+            checked = restored or probe.login(username, password)
+            if checked and store is not None:
+                store.save_http(probe, username)
+            if checked:
+                activity = catalog.lookup(job.code, refresher=http_refresher(probe))
         except Exception as e:
-            print(f'⚠ 步驟 9.5/9.6 出錯: {e}')
+            print(f'  ⚠ 無法更新活動索引: {e}')
+            checked = False
+        if activity is None and checked:
+            print(f'✗ 找不到活動代碼: {job.code}（請檢查 Excel A2）')
+            return
+    if activity is not None:
+        print(f'✓ 活動: {activity.name}（item_id={activity.value}）')
+
+    # 上傳日誌：中斷後重跑時跳過已提交的學生
+    from upload_journal import UploadJournal
+    journal = UploadJournal()
+
+    # 名冊快取（ROSTER_CACHE=0 停用；python roster_cache.py warm 可預先建立）
+    roster = None
+    if os.getenv('ROSTER_CACHE', '1') != '0':
+        from roster_cache import RosterCache
+        roster = RosterCache()
+
+    # 上傳前檢查：以名冊快取與活動索引一次列出所有問題（PREFLIGHT_FORCE=1 強制上傳）
+    from preflight import check_job, print_report
+    checked = check_job(job, roster, catalog, loaded.duplicates, loaded.incomplete)
+    print_report(checked)
+    if not checked.ok:
+        if os.getenv('PREFLIGHT_FORCE') != '1':
+            print('✗ 請修正以上錯誤後再上傳（PREFLIGHT_FORCE=1 可略過檢查強制上傳）')
+            return
+        print('⚠ PREFLIGHT_FORCE=1，忽略錯誤繼續上傳')
 
-        # [6/6] 點擊「創建」按鈕
-        print('\n[6/6] 提交表單...')
+    # HTTP 後端：不開瀏覽器，直接 POST 表單
+    if backend == 'http':
+        import sms_http
+        report.job = job.key
+        timer.start('[1-6/6] HTTP 上傳')
         try:
-            submit_btn = WebDriverWait(driver, 8).until(
-                EC.element_to_be_clickable((By.ID, 'yw7'))
-            )
-            submit_btn.click()
-            print('✓ 已提交')
-            time.sleep(2)
-        except Exception as e:
-            print(f'⚠ 提交失敗: {e}')
+            stats = sms_http.run_upload(username, password, job,
+                                        session=sms_http.SmsHttpSession(SMS_BASE_URL), roster=roster,
+                                        journal=journal, store=store)
+        finally:
+            timer.stop()
+        print(f'\n完成')
+        print(f"  成功填寫並提交: {stats['found'] if stats['submitted'] else 0}")
+        print(f"  未找到: {stats['missing']}")
+        print(f'\n各階段耗時：')
+        for line in report.summary():
+            print(line)
+        print(f'  報告: {report.save()}.json / .csv')
+        return
+
+    # 初始化瀏覽器
+    driver = report.instrument(setup_driver(headless=headless))
+    profiler = None
+    if os.getenv('DRIVER_PROFILE') or os.getenv('DRIVER_BUDGET'):
+        from driver_profiler import DriverProfiler
+        profiler = DriverProfiler()
+        profiler.wrap(driver)
+
+    try:
+        # 登入
+        timer.start('[1/6] 登入')
+        if not login_with_session(driver, username, password, store):
+            return
+
+        stats = run_event(driver, job, roster, catalog, journal, report)
 
         # 統計
         print(f'\n完成')
-        print(f'  成功填寫並提交: {found_count}')
-        print(f'  未找到: {missing_count}')
+        print(f"  成功填寫並提交: {stats['found']}")
+        print(f"  未找到: {stats['missing']}")
+        print(f'\n各階段耗時：')
+        for line in report.summary():
+            print(line)
+        print(f'  報告: {report.save()}.json / .csv')
+        if profiler is not None:
+            print(f'\nWebDriver 指令：')
+            for line in profiler.report():
+                print(line)
+            print(f'  呼叫堆疊: {profiler.write_folded()}')
+            budget = os.getenv('DRIVER_BUDGET')
+            over = profiler.over_budget(len(job.students), float(budget)) if budget else None
+            if over:
+                print(f'✗ {over}')
         print(f'\n✓ 流程結束，請在瀏覽器中檢查結果')
         
         # 保留瀏覽器窗口
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+常駐上傳服務：預先啟動並登入 N 個瀏覽器，透過本機 HTTP 接收上傳工作，排隊處理並返回結構化結果。
+每個活動只需花在填表上的時間，不必再等待 Chrome 啟動與登入。
+
+啟動：
+  python upload_daemon.py serve --workers 2 --port 8766
+
+送出工作：
+  python upload_daemon.py submit Upload.xlsx            # 等待完成並印出結果
+  python upload_daemon.py submit 活動.xlsx --sheet 工作表 --no-wait
+
+HTTP 介面（只監聽 127.0.0.1）：
+  POST /jobs          {"excel": "路徑", "sheet": null} 或
+                      {"date": "2024-11-24", "code": "ACA CMO183",
+                       "students": [{"class_short": "S3B", "student_id": "20019", "award": "佳作"}]}
+                      加 ?wait=1 則等到完成才回應
+  GET  /jobs/<id>     工作狀態與結果
+  GET  /status        worker 與佇列狀態，以及共用的 rate_control 並行上限
+"""
+import argparse
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Dict, List
+from urllib.parse import urlparse, parse_qsl
+from urllib.request import Request, urlopen
+
+import rate_control
+import upload
+from batch_upload import open_session, close_session
+from upload_jobs import StudentRow, UploadJob, normalize_student_id
+
+
+DEFAULT_PORT = 8766
+
+
+def job_from_payload(payload: Dict) -> UploadJob:
+    """由 JSON 內容建立 UploadJob（excel 路徑或直接列出學生）"""
+    if payload.get('excel'):
+        loaded = upload.load_upload_sheet(payload['excel'], payload.get('sheet'))
+        if loaded is None:
+            raise ValueError(f"無法讀取 {payload['excel']}")
+        if not loaded.job.students:
+            raise ValueError(f"{payload['excel']} 沒有學生資料")
+        return loaded.job
+    students = tuple(
+        StudentRow(str(s['class_short']).strip(), normalize_student_id(s['student_id']),
+                   str(s.get('name', '')), str(s.get('award', '')), int(s.get('row_idx', 0)))
+        for s in payload.get('students', [])
+    )
+    if not payload.get('date') or not payload.get('code') or not students:
+        raise ValueError('需要 date、code 與 students')
+    return UploadJob(str(payload['date']), str(payload['code']), str(payload.get('name', '')),
+                     students, str(payload.get('source', 'daemon')))
+
+
+class UploadDaemon:
+    """持有已登入的瀏覽器並依序處理佇列中的工作"""
+
+    def __init__(self, workers: int = 1, retries: int = 1, headless: bool = True,
+                 username: str = 'schhs334', password: str = 'schhs334', roster=None, catalog=None, journal=None):
+        self.workers = max(1, workers)
+        self.retries = retries
+        self.headless = headless
+        self.username = username
+        self.password = password
+        self.roster = roster
+        self.catalog = catalog
+        self.journal = journal
+        self.jobs: Dict[str, Dict] = {}
+        self.worker_state: Dict[int, str] = {}
+        self._queue = queue.Queue()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._done = threading.Condition(self._lock)
+        self._threads: List[threading.Thread] = []
+
+    def start(self):
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, args=(i + 1,), daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self):
+        for _ in self._threads:
+            self._queue.put(None)
+        for t in self._threads:
+            t.join()
+
+    def submit(self, job: UploadJob) -> str:
+        with self._lock:
+            job_id = str(next(self._ids))
+            self.jobs[job_id] = {
+                'id': job_id, 'key': job.key, 'source': job.source, 'students': len(job.students),
+                'status': 'queued', 'queued_at': time.time(), 'attempts': 0, 'worker': None,
+                'found': 0, 'missing': 0, 'submitted': False, 'seconds': None, 'error': '',
+            }
+        self._queue.put((job_id, job))
+        return job_id
+
+    def result(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[Dict]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._done:
+            while self.jobs.get(job_id, {}).get('status') in ('queued', 'running'):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._done.wait(remaining)
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def status(self) -> Dict:
+        with self._lock:
+            counts = {}
+            for job in self.jobs.values():
+                counts[job['status']] = counts.get(job['status'], 0) + 1
+            status = {'workers': dict(self.worker_state), 'queued': self._queue.qsize(), 'jobs': counts}
+        controller = rate_control.installed()
+        if controller is not None:
+            status['rate'] = controller.current()
+        return status
+
+    def _update(self, job_id: str, **fields):
+        with self._done:
+            self.jobs[job_id].update(fields)
+            self._done.notify_all()
+
+    def _set_state(self, worker_id: int, state: str):
+        with self._lock:
+            self.worker_state[worker_id] = state
+
+    def _open(self, worker_id: int):
+        self._set_state(worker_id, 'starting')
+        driver = open_session(self.headless, self.username, self.password)
+        self._warm_up(driver)
+        self._set_state(worker_id, 'idle')
+        print(f'[W{worker_id}] ✓ 瀏覽器已就緒')
+        return driver
+
+    @staticmethod
+    def _warm_up(driver) -> bool:
+        """閒置時預先載入空白的活動頁，下一個工作直接填寫（run_event(warm=True)）"""
+        try:
+            driver.get(upload.SMS_ACTIVITY_PAGE)
+            return True
+        except Exception as e:
+            print(f'⚠ 預先載入活動頁失敗: {e}')
+            return False
+
+    def _worker(self, worker_id: int):
+        driver, warm = None, False
+        try:
+            driver = self._open(worker_id)
+            warm = True
+        except Exception as e:
+            print(f'[W{worker_id}] ⚠ 預先啟動失敗，收到工作時再試: {e}')
+            self._set_state(worker_id, 'down')
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            job_id, job = item
+            with self._lock:
+                attempts = self.jobs[job_id]['attempts'] + 1
+            self._update(job_id, status='running', attempts=attempts, worker=worker_id)
+            self._set_state(worker_id, f'running {job_id}')
+            started = time.perf_counter()
+            stats, error = {'found': 0, 'missing': 0, 'submitted': False}, ''
+            try:
+                if driver is None:
+                    driver = self._open(worker_id)
+                    warm = True
+                stats = upload.run_event(driver, job, self.roster, self.catalog, self.journal, warm=warm)
+                if not stats['submitted']:
+                    error = '未提交'
+            except Exception as e:
+                error = str(e) or type(e).__name__
+
+            if error and driver is not None:
+                # 丟棄可能已損壞的 Session，下次換新的瀏覽器
+                close_session(driver)
+                driver = None
+            # 活動頁已填過，趁閒置重新載入，下一個工作不必等待
+            warm = driver is not None and self._warm_up(driver)
+            self._set_state(worker_id, 'idle' if driver is not None else 'down')
+            if error and attempts <= self.retries:
+                print(f'[W{worker_id}] ⚠ 工作 {job_id} 失敗（{error}），重新排隊')
+                self._update(job_id, status='queued', error=error)
+                self._queue.put((job_id, job))
+                continue
+            self._update(job_id, status='failed' if error else 'done', error=error,
+                         found=stats['found'], missing=stats['missing'], submitted=stats['submitted'],
+                         seconds=round(time.perf_counter() - started, 2))
+            print(f"[W{worker_id}] {'✗' if error else '✓'} 工作 {job_id} {job.key}")
+        if driver is not None:
+            close_session(driver)
+
+
+class DaemonHandler(BaseHTTPRequestHandler):
+    server_version = 'UploadDaemon/1.0'
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def daemon(self) -> UploadDaemon:
+        return self.server.daemon
+
+    def _json(self, data, status: int = 200):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = urlparse(self.path).path.rstrip('/')
+        if path == '/status':
+            self._json(self.daemon.status())
+        elif path.startswith('/jobs/'):
+            job = self.daemon.result(path.rsplit('/', 1)[1])
+            self._json(job or {'error': '找不到工作'}, 200 if job else 404)
+        else:
+            self._json({'error': '找不到路徑'}, 404)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path.rstrip('/') != '/jobs':
+            self._json({'error': '找不到路徑'}, 404)
+            return
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            job = job_from_payload(json.loads(self.rfile.read(length).decode('utf-8') or '{}'))
+        except (ValueError, KeyError, TypeError) as e:
+            self._json({'error': str(e)}, 400)
+            return
+        job_id = self.daemon.submit(job)
+        if dict(parse_qsl(url.query)).get('wait') in ('1', 'true'):
+            self._json(self.daemon.wait(job_id))
+        else:
+            self._json(self.daemon.result(job_id), 202)
+
+
+def serve(daemon: UploadDaemon, host: str = '127.0.0.1', port: int = DEFAULT_PORT) -> ThreadingHTTPServer:
+    """啟動 worker 與 HTTP 介面（背景執行緒），返回 server"""
+    server = ThreadingHTTPServer((host, port), DaemonHandler)
+    server.daemon_threads = True
+    server.daemon = daemon
+    daemon.start()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def submit(payload: Dict, port: int = DEFAULT_PORT, wait: bool = True) -> Dict:
+    """送出工作到本機的常駐服務"""
+    url = f"http://127.0.0.1:{port}/jobs{'?wait=1' if wait else ''}"
+    req = Request(url, data=json.dumps(payload, ensure_ascii=False).encode('utf-8'),
+                  headers={'Content-Type': 'application/json'})
+    with urlopen(req) as resp:
+        return json.loads(resp.read().decode('utf-8'))
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='常駐上傳服務')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_serve = sub.add_parser('serve', help='啟動服務')
+    p_serve.add_argument('--workers', type=int, default=1)
+    p_serve.add_argument('--retries', type=int, default=1)
+    p_serve.add_argument('--port', type=int, default=DEFAULT_PORT)
+    p_submit = sub.add_parser('submit', help='送出 Upload.xlsx 格式的活動')
+    p_submit.add_argument('excel', nargs='?', default=upload.EXCEL_FILE)
+    p_submit.add_argument('--sheet')
+    p_submit.add_argument('--port', type=int, default=DEFAULT_PORT)
+    p_submit.add_argument('--no-wait', action='store_true')
+    args = parser.parse_args(argv)
+
+    if args.command == 'submit':
+        result = submit({'excel': os.path.abspath(args.excel), 'sheet': args.sheet}, args.port, not args.no_wait)
+        print(json.dumps(result, ensure_ascii=False, indent=1))
+        return
+
+    from activity_catalog import ActivityCatalog
+    from roster_cache import RosterCache
+    from upload_journal import UploadJournal
+
+    daemon = UploadDaemon(
+        workers=args.workers, retries=args.retries,
+        headless=os.getenv('HEADLESS', '1') != '0',
+        username=os.getenv('SMS_USERNAME', 'schhs334'),
+        password=os.getenv('SMS_PASSWORD', 'schhs334'),
+        roster=RosterCache() if os.getenv('ROSTER_CACHE', '1') != '0' else None,
+        catalog=ActivityCatalog(),
+        journal=UploadJournal(),
+    )
+    if args.workers > 1:
+        # 多個瀏覽器共用一個 AIMD 控制器，SMS 變慢時自動減少同時進行的操作
+        rate_control.install(rate_control.AimdController(max_limit=args.workers))
+    server = serve(daemon, port=args.port)
+    print(f'✓ 常駐服務已啟動: http://127.0.0.1:{args.port}/jobs（{args.workers} 個瀏覽器），Ctrl+C 結束')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print('\n結束中...')
+    finally:
+        server.shutdown()
+        daemon.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+上傳工作（一個活動 + 其學生）的資料結構，供 upload.py、batch_upload.py 等共用。
+
+  UploadJob(date='2024-11-24', code='ACA CMO183', name='', students=(StudentRow(...), ...), source='Upload.xlsx')
+"""
+import unicodedata
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, List, NamedTuple, Tuple
+
+
+class StudentRow(NamedTuple):
+    """一位學生的上傳資料（row_idx 為來源 Excel 行號，無則為 0）"""
+    class_short: str
+    student_id: str
+    name: str = ''
+    award: str = ''
+    row_idx: int = 0
+
+
+class UploadJob(NamedTuple):
+    """一個活動的上傳工作"""
+    date: str
+    code: str
+    name: str = ''
+    students: Tuple[StudentRow, ...] = ()
+    source: str = ''
+
+    @property
+    def key(self) -> str:
+        """穩定的活動識別：日期 + 活動代碼"""
+        return f'{self.date}|{self.code}'
+
+    def by_class(self) -> Dict[str, List[Tuple[int, str]]]:
+        """返回 {班級簡寫: [(row_idx, 學號), ...]}，與 upload.main() 的 students_by_class 相同"""
+        grouped = defaultdict(list)
+        for s in self.students:
+            grouped[s.class_short].append((s.row_idx, s.student_id))
+        return dict(grouped)
+
+    def remarks(self) -> Dict[str, str]:
+        """返回 {學號: 備註（award）}，同一學號以第一次出現為準"""
+        out = {}
+        for s in self.students:
+            out.setdefault(s.student_id, s.award)
+        return out
+
+
+class LoadedSheet(NamedTuple):
+    """
+    單次讀取 Excel 的結果：上傳工作、欄位對應與去重報告 [(row_idx, 班級, 學號)]
+
+    incomplete：有姓名或班級但缺少學號的列（不會上傳，可交給 student_match.py 比對）
+    """
+    job: UploadJob
+    field_map: Dict[str, int]
+    duplicates: Tuple[Tuple[int, str, str], ...] = ()
+    incomplete: Tuple[StudentRow, ...] = ()
+
+
+def normalize_student_id(value) -> str:
+    """學號正規化：20071.0 / '20071.0' / 全形數字 / 前後空白 → '20071'"""
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    text = unicodedata.normalize('NFKC', str(value)).strip().lstrip("'").replace(' ', '')
+    if text.endswith('.0') and text[:-2].isdigit():
+        text = text[:-2]
+    return text
+
+
+def format_date(value) -> str:
+    """將 Excel 日期（datetime 或字串）轉為 yyyy-MM-dd"""
+    if isinstance(value, (datetime, date)):
+        return value.strftime('%Y-%m-%d')
+    return str(value).strip()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+上傳日誌（append-only JSONL）：以活動識別（日期|活動代碼，UploadJob.key）記錄每個階段與每位學生的結果，
+中斷後重新執行時跳過已提交的學生與班級。
+
+每行一筆：
+  {"ts": 1730000000.0, "key": "2024-11-24|ACA CMO183", "kind": "stage", "stage": "[4/6] 選班與添加"}
+  {"ts": ..., "key": ..., "kind": "students", "status": "added", "student_ids": ["20019", ...]}
+
+status：added / missing / filled / submitted / existing（SMS 上已有紀錄）
+
+SMS 的表單在送出前不會保存，因此「已添加但未提交」的學生重跑時仍需重新添加；
+已提交（或在 SMS 既有紀錄中找到）的學生則不會再處理。
+
+用法：
+  python upload_journal.py                           # 列出各活動進度
+  python upload_journal.py reset "2024-11-24|ACA CMO183"
+"""
+import json
+import os
+import sys
+import threading
+import time
+from typing import Optional, Dict, Iterable, List
+
+
+JOURNAL_FILE = os.path.join(os.path.dirname(__file__), "upload_journal.jsonl")
+
+DONE_STATUSES = ('submitted', 'existing')
+
+
+class UploadJournal:
+    """可續傳的上傳日誌"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or JOURNAL_FILE
+        self._lock = threading.Lock()
+        self._progress: Dict[str, Dict] = {}
+        self._replay()
+
+    def _replay(self):
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return
+        if data and not data.endswith(b'\n'):
+            # 寫到一半中斷的最後一行：截掉，否則下一筆 record() 會接在殘片後面而一起被丟棄
+            data = data[:data.rfind(b'\n') + 1]
+            os.truncate(self.path, len(data))
+        for line in data.decode('utf-8', errors='replace').splitlines():
+            try:
+                self._apply(json.loads(line))
+            except ValueError:
+                continue
+
+    def _apply(self, entry: Dict):
+        key = entry.get('key', '')
+        if entry.get('kind') == 'reset':
+            self._progress.pop(key, None)
+            return
+        prog = self._progress.setdefault(key, {'stages': [], 'students': {}, 'updated': 0.0})
+        prog['updated'] = entry.get('ts', 0.0)
+        if entry.get('kind') == 'stage':
+            prog['stages'].append(entry.get('stage', ''))
+        elif entry.get('kind') == 'students':
+            for student_id in entry.get('student_ids', []):
+                # 已提交的狀態不會被之後的 added / filled 覆蓋
+                if prog['students'].get(student_id) not in DONE_STATUSES:
+                    prog['students'][student_id] = entry.get('status', '')
+
+    def record(self, key: str, kind: str, **fields):
+        """追加一筆紀錄（立即 flush + fsync，當機也不會遺失）"""
+        entry = {'ts': round(time.time(), 3), 'key': key, 'kind': kind, **fields}
+        line = json.dumps(entry, ensure_ascii=False) + '\n'
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self._apply(entry)
+
+    def stage(self, key: str, stage: str):
+        self.record(key, 'stage', stage=stage)
+
+    def students(self, key: str, status: str, student_ids: Iterable[str], **fields):
+        ids = [str(i) for i in student_ids]
+        if ids:
+            self.record(key, 'students', status=status, student_ids=ids, **fields)
+
+    def reset(self, key: str):
+        """作廢某活動的進度（之後重跑會重新處理全部學生）"""
+        self.record(key, 'reset')
+
+    def done_students(self, key: str) -> set:
+        """已提交或在 SMS 上已有紀錄的學號"""
+        with self._lock:
+            students = self._progress.get(key, {}).get('students', {})
+            return {sid for sid, status in students.items() if status in DONE_STATUSES}
+
+    def progress(self, key: str) -> Dict:
+        """返回 {'stages': [...], 'students': {學號: 狀態}, 'updated': ts}"""
+        with self._lock:
+            prog = self._progress.get(key, {'stages': [], 'students': {}, 'updated': 0.0})
+            return {'stages': list(prog['stages']), 'students': dict(prog['students']),
+                    'updated': prog['updated']}
+
+    def keys(self) -> List[str]:
+        with self._lock:
+            return list(self._progress)
+
+
+def main():
+    journal = UploadJournal()
+    args = sys.argv[1:]
+    if len(args) == 2 and args[0] == 'reset':
+        journal.reset(args[1])
+        print(f'✓ 已重設 {args[1]}')
+        return
+    for key in journal.keys():
+        prog = journal.progress(key)
+        counts = {}
+        for status in prog['students'].values():
+            counts[status] = counts.get(status, 0) + 1
+        last = prog['stages'][-1] if prog['stages'] else '-'
+        when = time.strftime('%Y-%m-%d %H:%M', time.localtime(prog['updated']))
+        print(f'  {key:<28} {when}  最後階段 {last}  {counts}')
+
+
+if __name__ == '__main__':
+    main()